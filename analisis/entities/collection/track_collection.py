@@ -1,7 +1,34 @@
-from typing import Dict, Mapping
-from analisis.entities.tracks.track_detail import TrackDetailBase
+import json
+from itertools import repeat
+from typing import Any, Dict, Mapping, Optional, Type
+
+import numpy as np
+
+from analisis.entities.collection.track_columns import COLUMN_SPECS, TrackColumns
+from analisis.entities.tracks.track_detail import (TrackBallDetail,
+                                                   TrackDetailBase,
+                                                   TrackPlayerDetail)
 from analisis.entities.utils.singleton import Singleton
 
+# Atributo de TrackDetailBase -> columna de TrackColumns
+FIELD_COLUMNS: Dict[str, str] = {
+    "bbox": "bbox",
+    "position": "position",
+    "position_adjusted": "position_adjusted",
+    "position_transformed": "position_transformed",
+    "speed_km_per_hour": "speed",
+    "covered_distance": "distance",
+    "track_id": "track_id",
+    "class_id": "class_id",
+    "team": "team",
+    "has_ball": "has_ball",
+}
+
+ENTITY_DETAILS: Dict[str, Type[TrackDetailBase]] = {
+    "players": TrackPlayerDetail,
+    "ball": TrackBallDetail,
+}
+
 
 class TrackCollection(metaclass=Singleton):
     """
@@ -9,7 +36,13 @@ class TrackCollection(metaclass=Singleton):
     dentro de un video o secuencia de imágenes, diferenciados por tipo:
     jugadores ("players") y balón ("ball").
 
-    Estructura interna de `self.tracks`:
+    Los datos se guardan en formato columnar: `self.columns[entity_type]` es
+    un `TrackColumns` con un arreglo NumPy por atributo (frame, track_id,
+    bbox, posiciones, velocidad, distancia, equipo, posesión), de modo que
+    las etapas del análisis pueden leer y escribir todas las detecciones con
+    operaciones vectorizadas (`get_column`, `set_column`, `update_tracks`).
+
+    Vista de compatibilidad `self.tracks`:
         self.tracks: Dict[str, Dict[int, Dict[int, TrackDetailBase]]]
 
         - str  : Tipo de entidad ("players" o "ball").
@@ -17,21 +50,41 @@ class TrackCollection(metaclass=Singleton):
         - int  : ID del track (track_id).
         - value: Objeto `TrackDetailBase` que contiene la información del track.
 
+    La vista se materializa la primera vez que se accede y se mantiene
+    sincronizada con `add_track`/`update_track`; una escritura columnar la
+    invalida y se vuelve a construir en el siguiente acceso.
+
     Esta clase sigue el patrón Singleton, asegurando que solo exista una
     instancia de `TrackCollection` en toda la aplicación.
     """
 
     def __init__(self):
         """
-        Inicializa la colección de tracks con dos llaves principales:
-        - "players": Diccionario para almacenar los tracks de jugadores.
-        - "ball"   : Diccionario para almacenar los tracks del balón.
+        Inicializa la colección con un almacén columnar por tipo de entidad:
+        - "players": Tracks de jugadores.
+        - "ball"   : Tracks del balón.
         """
         super().__init__()
-        self.tracks: Dict[str, Dict[int, Dict[int, TrackDetailBase]]] = {
-            "players": {},
-            "ball": {}
+        self.columns: Dict[str, TrackColumns] = {
+            entity_type: TrackColumns() for entity_type in ENTITY_DETAILS
         }
+        # Color representativo de cada equipo (team -> BGR)
+        self.team_colors: Dict[int, np.ndarray] = {}
+        # Atributos sin columna con valor distinto al por defecto: entidad -> fila -> campos
+        self._extras: Dict[str, Dict[int, Dict[str, Any]]] = {
+            entity_type: {} for entity_type in ENTITY_DETAILS
+        }
+        self._view: Optional[Dict[str, Dict[int, Dict[int, TrackDetailBase]]]] = None
+
+    @property
+    def tracks(self) -> Dict[str, Dict[int, Dict[int, TrackDetailBase]]]:
+        """Vista anidada entidad → frame → track_id → TrackDetailBase."""
+        if self._view is None:
+            self._view = {
+                entity_type: self._materialize(entity_type)
+                for entity_type in self.columns
+            }
+        return self._view
 
     def exists_track_in_collection(
             self,
@@ -58,6 +111,7 @@ class TrackCollection(metaclass=Singleton):
             track_detail: TrackDetailBase) -> None:
         """
         Agrega un track a la colección para una entidad y frame específico.
+        Si el track ya existe en ese frame no se modifica.
 
         Args:
             entity_type (str): Tipo de entidad ("players" o "ball").
@@ -67,14 +121,17 @@ class TrackCollection(metaclass=Singleton):
         Raises:
             ValueError: Si el tipo de entidad no es válido.
         """
-        if entity_type not in self.tracks:
-            raise ValueError(f"Tipo de entidad '{entity_type}' no reconocido.")
+        columns = self._get_columns(entity_type)
+        track_id = track_detail.track_id if track_detail.track_id is not None else -1
+        if columns.find_row(frame_num, track_id) >= 0:
+            return
 
-        # Inserta el track en la jerarquía: entidad → frame → track_id → track_detail
+        row = int(columns.append(frame_num, track_id)[0])
+        self._write_detail(entity_type, row, track_detail)
 
-        self.tracks[entity_type] \
-            .setdefault(frame_num, {}) \
-            .setdefault(track_detail.track_id or -1, track_detail)
+        if self._view is not None:
+            self._view[entity_type].setdefault(frame_num, {})[track_id] = \
+                self._materialize_row(entity_type, row)
 
     def update_track(
             self,
@@ -94,46 +151,265 @@ class TrackCollection(metaclass=Singleton):
         Raises:
             ValueError: Si el tipo de entidad no es válido.
         """
-        if entity_type not in self.tracks:
-            raise ValueError(f"Tipo de entidad '{entity_type}' no reconocido.")
-
-        collection = self.tracks[entity_type]
-        # Se pasa el __dict__ para propagar dinámicamente todos los atributos del track
-        if self.exists_track_in_collection(collection, frame_num, track_id):
-            self._update_track_in_collection(collection, frame_num, track_id, track_detail)
+        columns = self._get_columns(entity_type)
+        row = columns.find_row(frame_num, track_id)
+        if row >= 0:
+            self._update_track_in_collection(entity_type, frame_num, track_id, row, track_detail)
         else:
             self.add_track(entity_type, frame_num, track_detail)
 
+    def update_tracks(
+            self,
+            entity_type: str,
+            frame_nums,
+            track_ids,
+            **values) -> np.ndarray:
+        """
+        Versión vectorizada de `update_track`: actualiza los tracks que ya
+        existen y agrega los que faltan.
+
+        Args:
+            entity_type (str): Tipo de entidad ("players" o "ball").
+            frame_nums: Número de frame de cada track (o un escalar común).
+            track_ids: ID de cada track.
+            **values: Arreglos por columna (ej: bbox=(N, 4)).
+
+        Returns:
+            np.ndarray: Filas afectadas, en el orden de `track_ids`.
+        """
+        columns = self._get_columns(entity_type)
+        track_ids = np.asarray(track_ids, dtype=np.int64).reshape(-1)
+        frame_nums = np.broadcast_to(np.asarray(frame_nums, dtype=np.int64), track_ids.shape)
+        rows = columns.find_rows(frame_nums, track_ids)
+
+        missing = rows < 0
+        if missing.any():
+            rows[missing] = columns.append(frame_nums[missing], track_ids[missing])
+        for name, column_values in values.items():
+            columns.set(name, column_values, rows)
+
+        self._view = None
+        return rows
+
+    def get_column(self, entity_type: str, name: str) -> np.ndarray:
+        """Devuelve la columna `name` de una entidad como vista NumPy."""
+        return self._get_columns(entity_type).column(name)
+
+    def set_column(
+            self,
+            entity_type: str,
+            name: str,
+            values,
+            rows: Optional[np.ndarray] = None) -> None:
+        """Escribe una columna completa (o las filas indicadas) de una entidad."""
+        self._get_columns(entity_type).set(name, values, rows)
+        self._view = None
+
+    def rows_for_frame(self, entity_type: str, frame_num: int) -> np.ndarray:
+        """Filas de una entidad que pertenecen a un frame."""
+        return self._get_columns(entity_type).rows_for_frame(frame_num)
+
+    def rows_for_frames(self, entity_type: str, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """Filas de los frames en [start, stop), agrupadas por frame en orden."""
+        index = self._get_columns(entity_type).frame_index()
+        first = np.searchsorted(index.keys, start, side="left")
+        last = len(index.keys) if stop is None else np.searchsorted(index.keys, stop, side="left")
+        return index.order[index.offsets[first]:index.offsets[last]]
+
+    def frame_records(
+            self,
+            entity_type: str,
+            rows: Optional[np.ndarray] = None) -> Dict[int, Dict[int, Dict[str, Any]]]:
+        """
+        Arma {frame: {track_id: dict}} donde cada dict es igual a `to_json()`
+        del TrackDetail correspondiente, pero directo de las columnas, sin
+        crear objetos pydantic. Es la base de la serialización en bloque
+        (ver `json_transform`).
+
+        Args:
+            entity_type (str): Tipo de entidad.
+            rows (np.ndarray | None): Filas a incluir, agrupadas por frame
+                (p. ej. de `rows_for_frames`); None incluye todas.
+        """
+        columns = self._get_columns(entity_type)
+        rows = np.arange(columns.size) if rows is None else np.asarray(rows)
+        detail_cls = ENTITY_DETAILS[entity_type]
+        values = self._column_values(entity_type, rows)
+
+        field_values = []
+        for name, field in detail_cls.model_fields.items():
+            if name in values:
+                field_values.append(values[name])
+            elif name == "team_color":
+                default_color = field.get_default(call_default_factory=True)
+                default_color = None if default_color is None else np.asarray(default_color).tolist()
+                colors = {team: np.asarray(color).tolist() for team, color in self.team_colors.items()}
+                field_values.append([colors.get(team, default_color) for team in values["team"]])
+            else:
+                field_values.append(repeat(field.get_default(call_default_factory=True)))
+
+        records = list(map(dict, map(zip, repeat(list(detail_cls.model_fields)), zip(*field_values))))
+        extras = self._extras[entity_type]
+        if extras:
+            for record, row in zip(records, rows.tolist()):
+                if row in extras:
+                    record.update(extras[row])
+
+        frames: Dict[int, Dict[int, Dict[str, Any]]] = {}
+        current, last_frame = None, None
+        for frame_num, track_id, record in zip(
+                columns.column("frame")[rows].tolist(), columns.column("track_id")[rows].tolist(), records):
+            if frame_num != last_frame:
+                current = frames.setdefault(frame_num, {})
+                last_frame = frame_num
+            current[track_id] = record
+        return frames
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Estado completo de la colección como arreglos planos ("players/bbox",
+        "team_colors/teams", ...), para guardarlo con `np.savez` y
+        recuperarlo con `load_arrays`.
+        """
+        arrays: Dict[str, np.ndarray] = {}
+        for entity_type, columns in self.columns.items():
+            for name in COLUMN_SPECS:
+                arrays[f"{entity_type}/{name}"] = columns.column(name).copy()
+        teams = sorted(self.team_colors)
+        arrays["team_colors/teams"] = np.asarray(teams, dtype=np.int64)
+        arrays["team_colors/colors"] = np.asarray(
+            [np.asarray(self.team_colors[team], dtype=np.float64) for team in teams]).reshape(-1, 3)
+        arrays["extras"] = np.asarray(json.dumps({
+            entity_type: {str(row): fields for row, fields in extras.items()}
+            for entity_type, extras in self._extras.items()
+        }, default=str))
+        return arrays
+
+    def load_arrays(self, arrays: Mapping[str, np.ndarray]) -> None:
+        """Reemplaza el contenido de la colección por el de `to_arrays`."""
+        self.clear()
+        for entity_type, columns in self.columns.items():
+            values = {name: arrays[f"{entity_type}/{name}"] for name in COLUMN_SPECS}
+            frames, track_ids = values.pop("frame"), values.pop("track_id")
+            if len(track_ids):
+                columns.append(frames, track_ids, **values)
+        self.team_colors.update(
+            (int(team), color) for team, color in zip(arrays["team_colors/teams"], arrays["team_colors/colors"]))
+        for entity_type, extras in json.loads(str(arrays["extras"])).items():
+            self._extras[entity_type].update((int(row), fields) for row, fields in extras.items())
+
+    def clear(self) -> None:
+        """Vacía la colección para reutilizarla con otro video."""
+        for entity_type, columns in self.columns.items():
+            columns.clear()
+            self._extras[entity_type].clear()
+        self.team_colors.clear()
+        self._view = None
+
+    def _get_columns(self, entity_type: str) -> TrackColumns:
+        if entity_type not in self.columns:
+            raise ValueError(f"Tipo de entidad '{entity_type}' no reconocido.")
+        return self.columns[entity_type]
+
     def _update_track_in_collection(
             self,
-            collection: Mapping[int, Mapping[int, TrackDetailBase]],
+            entity_type: str,
             frame_num: int,
             track_id: int,
+            row: int,
             track_detail: TrackDetailBase
     ) -> None:
         """
-        Actualiza un track específico dentro de una colección dada.
+        Actualiza un track específico dentro de la colección.
 
         Args:
-            collection (Mapping[int, Mapping[int, TrackDetailBase]]): Colección organizada por frame y track_id.
+            entity_type (str): Tipo de entidad ("players" o "ball").
             frame_num (int): Número de frame en el que se encuentra el track.
             track_id (int): Identificador del track.
-            **kwargs: Atributos clave-valor para actualizar en el track.
+            row (int): Fila del track en el almacén columnar.
+            track_detail (TrackDetailBase): Objeto con los datos a actualizar.
 
         Nota:
-            - Si el frame o el track_id no existen, no se hace nada.
-            - Se asume que `TrackDetailBase` o sus derivados implementan un método `update`.
+            - Solo se copian los atributos distintos de None, igual que
+              `TrackDetailBase.update`.
+            - Si la vista está materializada, el objeto correspondiente se
+              actualiza en el lugar.
         """
-        print(
-            f"Attempting to update track in collection for frame {frame_num} and track ID {track_id}")
-        if frame_num not in collection:
-            return
+        self._write_detail(entity_type, row, track_detail)
 
-        print(f"Frame {frame_num} found. Checking for track ID {track_id}...")
-        frames = collection[frame_num]
-        if track_id not in frames:
-            return
+        if self._view is not None:
+            tracks_in_frame = self._view[entity_type].setdefault(frame_num, {})
+            current = tracks_in_frame.get(track_id)
+            if current is None:
+                tracks_in_frame[track_id] = self._materialize_row(entity_type, row)
+            elif current is not track_detail:
+                current.__dict__.update(self._materialize_row(entity_type, row).__dict__)
+
+    def _write_detail(self, entity_type: str, row: int, track_detail: TrackDetailBase) -> None:
+        columns = self.columns[entity_type]
+        for field, value in track_detail.__dict__.items():
+            if value is None or field == "track_id":
+                continue
+            column = FIELD_COLUMNS.get(field)
+            if column is not None:
+                if isinstance(value, tuple):
+                    value = value[:2]
+                columns.set(column, value, row)
+            elif field == "team_color":
+                team = getattr(track_detail, "team", None)
+                if team is not None:
+                    self.team_colors[team] = np.asarray(value)
+            else:
+                default = type(track_detail).model_fields[field].default
+                if value != default:
+                    self._extras[entity_type].setdefault(row, {})[field] = value
+
+    def _materialize(self, entity_type: str) -> Dict[int, Dict[int, TrackDetailBase]]:
+        columns = self.columns[entity_type]
+        frames = columns.column("frame").tolist()
+        track_ids = columns.column("track_id").tolist()
+        values = self._column_values(entity_type, np.arange(columns.size))
+
+        view: Dict[int, Dict[int, TrackDetailBase]] = {}
+        for row, (frame_num, track_id) in enumerate(zip(frames, track_ids)):
+            fields = {field: column_values[row] for field, column_values in values.items()}
+            view.setdefault(frame_num, {})[track_id] = self._build_detail(entity_type, row, fields)
+        return view
+
+    def _materialize_row(self, entity_type: str, row: int) -> TrackDetailBase:
+        values = self._column_values(entity_type, np.array([row]))
+        fields = {field: column_values[0] for field, column_values in values.items()}
+        return self._build_detail(entity_type, row, fields)
+
+    def _column_values(self, entity_type: str, rows: np.ndarray) -> Dict[str, list]:
+        """Convierte las columnas de las filas dadas en listas de valores Python."""
+        columns = self.columns[entity_type]
+        detail_fields = ENTITY_DETAILS[entity_type].model_fields
+        values: Dict[str, list] = {}
+        for field, column in FIELD_COLUMNS.items():
+            if field not in detail_fields:
+                continue
+            data = columns.column(column)[rows]
+            if data.dtype.kind == "f":
+                missing = np.isnan(data) if data.ndim == 1 else np.isnan(data).any(axis=1)
+            elif data.dtype.kind == "b":
+                missing = np.zeros(len(data), dtype=bool)
+            else:
+                missing = data == -1
+            column_values = data.tolist()
+            if field in ("position", "position_adjusted"):
+                column_values = list(map(tuple, column_values))
+            # Los faltantes suelen ser pocos: se corrigen solo esas filas
+            for i in np.flatnonzero(missing).tolist():
+                column_values[i] = None
+            values[field] = column_values
+        return values
 
-        # Recupera el track y aplica los cambios
-        track = frames[track_id]
-        track.update(**track_detail.__dict__)
+    def _build_detail(self, entity_type: str, row: int, fields: Dict[str, Any]) -> TrackDetailBase:
+        detail_cls = ENTITY_DETAILS[entity_type]
+        extras = self._extras[entity_type].get(row)
+        if extras:
+            fields.update(extras)
+        if detail_cls is TrackPlayerDetail and fields.get("team") in self.team_colors:
+            fields["team_color"] = self.team_colors[fields["team"]]
+        return detail_cls.model_construct(**fields)
@@ -0,0 +1,227 @@
+from typing import Dict, NamedTuple, Optional
+
+import numpy as np
+
+# Columna -> (dtype, forma por fila, valor "vacío")
+COLUMN_SPECS: Dict[str, tuple] = {
+    "frame": (np.int32, (), -1),
+    "track_id": (np.int32, (), -1),
+    "class_id": (np.int16, (), -1),
+    "bbox": (np.float32, (4,), np.nan),
+    "position": (np.float32, (2,), np.nan),
+    "position_adjusted": (np.float32, (2,), np.nan),
+    "position_transformed": (np.float32, (2,), np.nan),
+    "speed": (np.float32, (), np.nan),
+    "distance": (np.float32, (), np.nan),
+    "team": (np.int8, (), -1),
+    "has_ball": (np.bool_, (), False),
+}
+
+
+class GroupIndex(NamedTuple):
+    """
+    Índice CSR de filas agrupadas por una columna (frame o track_id).
+
+    - keys   : Valores únicos de la columna, ordenados.
+    - offsets: keys[i] ocupa order[offsets[i]:offsets[i + 1]].
+    - order  : Filas ordenadas por la columna (orden estable).
+    """
+    keys: np.ndarray
+    offsets: np.ndarray
+    order: np.ndarray
+
+    def rows(self, i: int) -> np.ndarray:
+        return self.order[self.offsets[i]:self.offsets[i + 1]]
+
+
+class TrackColumns:
+    """
+    Almacén columnar de las detecciones de un tipo de entidad.
+
+    Cada detección es una fila; cada atributo es un arreglo NumPy de
+    `COLUMN_SPECS`. Los arreglos crecen por duplicación de capacidad y
+    `self.size` indica cuántas filas son válidas. Los valores faltantes se
+    representan con NaN (flotantes) o -1 (enteros).
+
+    Las búsquedas por (frame, track_id) aprovechan que los trackers agregan
+    filas en orden de frame; si ese orden se rompe se usa un índice ordenado
+    que se reconstruye bajo demanda.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.size = 0
+        self._capacity = 0
+        self._data: Dict[str, np.ndarray] = {}
+        self._frame_sorted = True
+        self._version = 0
+        self._indexes: Dict[str, tuple] = {}
+        self._reserve(capacity)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _reserve(self, capacity: int) -> None:
+        if capacity <= self._capacity:
+            return
+        capacity = max(capacity, self._capacity * 2)
+        for name, (dtype, shape, empty) in COLUMN_SPECS.items():
+            array = np.full((capacity, *shape), empty, dtype=dtype)
+            if name in self._data:
+                array[:self.size] = self._data[name][:self.size]
+            self._data[name] = array
+        self._capacity = capacity
+
+    def column(self, name: str) -> np.ndarray:
+        """Devuelve una vista (sin copia) de las filas válidas de la columna."""
+        return self._data[name][:self.size]
+
+    def set(self, name: str, values, rows: Optional[np.ndarray] = None) -> None:
+        """
+        Escribe valores en una columna de forma vectorizada.
+
+        Args:
+            name (str): Nombre de la columna.
+            values: Valores a escribir (escalar o arreglo compatible).
+            rows (np.ndarray | None): Filas destino; None escribe todas.
+        """
+        if name in ("frame", "track_id"):
+            raise ValueError(f"La columna '{name}' forma parte de la clave y no se puede modificar.")
+        if rows is None:
+            self._data[name][:self.size] = values
+        else:
+            self._data[name][rows] = values
+
+    def append(self, frames, track_ids, **columns) -> np.ndarray:
+        """
+        Agrega filas nuevas sin comprobar duplicados.
+
+        Args:
+            frames: Número de frame de cada fila (o un escalar para todas).
+            track_ids: ID de track de cada fila.
+            **columns: Valores iniciales de otras columnas.
+
+        Returns:
+            np.ndarray: Índices de las filas agregadas.
+        """
+        track_ids = np.asarray(track_ids, dtype=np.int32).reshape(-1)
+        count = len(track_ids)
+        frames = np.broadcast_to(np.asarray(frames, dtype=np.int32), (count,))
+        if count == 0:
+            return np.empty(0, dtype=np.int64)
+
+        if self._frame_sorted:
+            last_frame = self._data["frame"][self.size - 1] if self.size else frames[0]
+            self._frame_sorted = bool(
+                frames[0] >= last_frame and np.all(frames[1:] >= frames[:-1]))
+
+        self._reserve(self.size + count)
+        rows = np.arange(self.size, self.size + count)
+        self._data["frame"][rows] = frames
+        self._data["track_id"][rows] = track_ids
+        self.size += count
+        for name, values in columns.items():
+            self.set(name, values, rows)
+        self._version += 1
+        return rows
+
+    def find_rows(self, frames, track_ids) -> np.ndarray:
+        """
+        Busca las filas de los pares (frame, track_id) dados.
+
+        Returns:
+            np.ndarray: Índice de fila de cada par, o -1 si no existe.
+        """
+        track_ids = np.asarray(track_ids, dtype=np.int64).reshape(-1)
+        frames = np.broadcast_to(np.asarray(frames, dtype=np.int64), track_ids.shape)
+        if self.size == 0 or len(track_ids) == 0:
+            return np.full(len(track_ids), -1, dtype=np.int64)
+
+        query_frames = np.unique(frames)
+        if self._frame_sorted and len(query_frames) <= 8:
+            # Caso habitual durante el tracking: pocas consultas sobre frames
+            # recientes; evita reconstruir el índice global tras cada append
+            result = np.full(len(track_ids), -1, dtype=np.int64)
+            for frame_num in query_frames:
+                selected = np.flatnonzero(frames == frame_num)
+                rows = self.rows_for_frame(frame_num)
+                if len(rows) == 0:
+                    continue
+                frame_track_ids = self._data["track_id"][rows]
+                order = np.argsort(frame_track_ids)
+                positions = np.minimum(
+                    np.searchsorted(frame_track_ids[order], track_ids[selected]), len(rows) - 1)
+                found = frame_track_ids[order][positions] == track_ids[selected]
+                result[selected[found]] = rows[order[positions[found]]]
+            return result
+
+        keys = (frames << 32) | (track_ids & 0xFFFFFFFF)
+        sorted_keys, order = self._cached_index("key", self._build_key_index)
+        positions = np.searchsorted(sorted_keys, keys)
+        positions = np.minimum(positions, len(sorted_keys) - 1)
+        found = sorted_keys[positions] == keys
+        return np.where(found, order[positions], -1)
+
+    def find_row(self, frame_num: int, track_id: int) -> int:
+        """Versión escalar de `find_rows`; usa el orden por frame si existe."""
+        if self._frame_sorted:
+            rows = self.rows_for_frame(frame_num)
+            matches = rows[self._data["track_id"][rows] == track_id]
+            return int(matches[0]) if len(matches) else -1
+        return int(self.find_rows(frame_num, track_id)[0])
+
+    def rows_for_frame(self, frame_num: int) -> np.ndarray:
+        """Filas que pertenecen a un frame."""
+        if self._frame_sorted:
+            frames = self.column("frame")
+            # La clave con el mismo dtype evita que NumPy convierta toda la columna
+            key = frames.dtype.type(frame_num)
+            low = np.searchsorted(frames, key, side="left")
+            high = np.searchsorted(frames, key, side="right")
+            return np.arange(low, high)
+        index = self.frame_index()
+        i = np.searchsorted(index.keys, frame_num)
+        if i < len(index.keys) and index.keys[i] == frame_num:
+            return index.rows(i)
+        return np.empty(0, dtype=np.int64)
+
+    def frame_index(self) -> GroupIndex:
+        """Índice de filas agrupadas por frame."""
+        return self._cached_index("frame", lambda: self._group_by("frame"))
+
+    def track_index(self) -> GroupIndex:
+        """Índice de filas agrupadas por track_id, en orden de frame dentro de cada track."""
+        return self._cached_index("track_id", lambda: self._group_by("track_id"))
+
+    def _cached_index(self, name: str, build):
+        cached = self._indexes.get(name)
+        if cached is None or cached[0] != self._version:
+            cached = (self._version, build())
+            self._indexes[name] = cached
+        return cached[1]
+
+    def _build_key_index(self):
+        keys = (self.column("frame").astype(np.int64) << 32) \
+            | (self.column("track_id").astype(np.int64) & 0xFFFFFFFF)
+        order = np.argsort(keys, kind="stable")
+        return keys[order], order
+
+    def _group_by(self, name: str) -> GroupIndex:
+        values = self.column(name)
+        if name == "frame":
+            order = np.arange(self.size) if self._frame_sorted \
+                else np.argsort(values, kind="stable")
+        else:
+            order = np.lexsort((self.column("frame"), values))
+        sorted_values = values[order]
+        starts = np.flatnonzero(np.r_[True, sorted_values[1:] != sorted_values[:-1]]) \
+            if self.size else np.empty(0, dtype=np.int64)
+        offsets = np.append(starts, self.size)
+        return GroupIndex(keys=sorted_values[starts], offsets=offsets, order=order)
+
+    def clear(self) -> None:
+        self.size = 0
+        self._frame_sorted = True
+        self._version += 1
+        self._indexes.clear()
+        for name, (_, _, empty) in COLUMN_SPECS.items():
+            self._data[name][:] = empty
@@ -7,7 +7,9 @@ import supervision as sv
 from cv2.typing import MatLike
 from analisis.entities.collection.track_collection import TrackCollection
 from analisis.entities.tracks.track_detail import TrackDetailBase, TrackPlayerDetail
-from analisis.infraestructure.services import (get_bbox_width, get_center_of_bbox)
+from analisis.infraestructure.batch_size_tuner import BatchSizeTuner
+from analisis.infraestructure.services import (blend_rectangle, cumulative_ball_control,
+                                               get_bbox_width, get_center_of_bbox)
 from ultralytics.models import YOLO
 from ultralytics.engine.results import Results
 
@@ -29,8 +31,8 @@ class Tracker(ABC):
             tracks_collection: TrackCollection) -> None:
         raise NotImplementedError
 
-    def detect_frames(self, frames: list[MatLike]):
-        batch_size = 20
+    def detect_frames(self, frames: list[MatLike], batch_size: int | None = None):
+        batch_size = batch_size or BatchSizeTuner().batch_size
         detections: list[Results] = []
         for i in range(0, len(frames), batch_size):
             detections_batch = self.model.predict(
@@ -99,49 +101,36 @@ class Tracker(ABC):
 
         return frame
 
-    def draw_team_ball_control(self, frame, frame_num, team_ball_control):
-        # Draw a semi-transparent rectaggle
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (1350, 850), (1900, 970), (255, 255, 255), -1)
-        alpha = 0.4
-        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-
-        team_ball_control_till_frame = team_ball_control[:frame_num + 1]
-        # Get the number of time each team had ball control
-        team_1_num_frames = team_ball_control_till_frame[team_ball_control_till_frame == 1].shape[0]
-        team_2_num_frames = team_ball_control_till_frame[team_ball_control_till_frame == 2].shape[0]
-        print("Team 1 ball control, ", team_1_num_frames)
-        print("Team 2 ball control, ", team_2_num_frames)
-        team_1 = team_1_num_frames / (team_1_num_frames + team_2_num_frames)
-        team_2 = team_2_num_frames / (team_1_num_frames + team_2_num_frames)
-
-        cv2.putText(
-            frame,
-            f"Team 1 Ball Control: {
-                team_1 * 100:.2f}%",
-            (1400,
-             900),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            1,
-            (0,
-             0,
-             0),
-            3)
-        cv2.putText(
-            frame,
-            f"Team 2 Ball Control: {
-                team_2 * 100:.2f}%",
-            (1400,
-             950),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            1,
-            (0,
-             0,
-             0),
-            3)
+    def draw_player(self, frame, bbox, color, track_id, has_ball: bool = False):
+        """Elipse con el número del jugador, y triángulo rojo si tiene la pelota."""
+        frame = self.draw_ellipse(frame, bbox, color, track_id)
+        if has_ball:
+            frame = self.draw_triangle(frame, bbox, (0, 0, 255))
+        return frame
 
+    def draw_ball_control(self, frame, team_1: float, team_2: float):
+        """Recuadro con el porcentaje de posesión de cada equipo (fracciones en [0, 1])."""
+        blend_rectangle(frame, (1350, 850), (1900, 970), (255, 255, 255), 0.4)
+        cv2.putText(frame, f"Team 1 Ball Control: {team_1 * 100:.2f}%", (1400, 900),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 3)
+        cv2.putText(frame, f"Team 2 Ball Control: {team_2 * 100:.2f}%", (1400, 950),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 3)
         return frame
 
+    def draw_team_ball_control(self, frame, frame_num, team_ball_control):
+        """
+        Posesión acumulada hasta `frame_num`. Recorre los frames anteriores:
+        para un video completo usar `cumulative_ball_control` una vez.
+        """
+        team_ball_control_till_frame = np.asarray(team_ball_control[:frame_num + 1])
+        team_1_num_frames = np.count_nonzero(team_ball_control_till_frame == 1)
+        team_2_num_frames = np.count_nonzero(team_ball_control_till_frame == 2)
+        total = team_1_num_frames + team_2_num_frames
+        return self.draw_ball_control(
+            frame,
+            team_1_num_frames / total if total else 0.0,
+            team_2_num_frames / total if total else 0.0)
+
     def draw_annotations(
             self,
             video_frames: list[MatLike],
@@ -155,6 +144,8 @@ class Tracker(ABC):
         """
 
         output_video_frames = []
+        # Posesión acumulada de todos los frames de una vez
+        ball_control = cumulative_ball_control(team_ball_control)
 
         for frame_num, frame in enumerate(video_frames):
             # Copia defensiva del frame
@@ -179,10 +170,8 @@ class Tracker(ABC):
                 if not isinstance(team_color, (list, tuple)) or len(team_color) < 3:
                     team_color = (0, 0, 255)
 
-                frame = self.draw_ellipse(frame, player.bbox, team_color, track_id)
-
-                if getattr(player, "has_ball", False):
-                    frame = self.draw_triangle(frame, player.bbox, (0, 0, 255))
+                frame = self.draw_player(
+                    frame, player.bbox, team_color, track_id, getattr(player, "has_ball", False))
 
             # --- Dibujar balón ---
             for _, ball in ball_dict.items():
@@ -191,7 +180,7 @@ class Tracker(ABC):
                 frame = self.draw_triangle(frame, ball.bbox, (0, 255, 0))
 
             # --- Dibujar control de balón ---
-            frame = self.draw_team_ball_control(frame, frame_num, team_ball_control)
+            frame = self.draw_ball_control(frame, *ball_control[frame_num])
 
             output_video_frames.append(frame)
 
@@ -1,18 +1,23 @@
-import pickle
 from abc import abstractmethod
 from pathlib import Path
-from typing import List, Type
+from typing import Iterable, List, Type
 
+import numpy as np
 import supervision as sv
 from cv2.typing import MatLike
 from analisis.entities.collection.track_collection import TrackCollection
 from analisis.entities.utils.singleton import AbstractSingleton
-from analisis.infraestructure.services import (get_center_of_bbox)
+from analisis.infraestructure.batch_size_tuner import BatchSizeTuner
+from analisis.infraestructure.inference_roi import InferenceRoi
+from analisis.infraestructure.stage_profiler import StageProfiler
+from analisis.infraestructure.structured_logging import get_logger
 from ultralytics.engine.results import Results
 from ultralytics.models import YOLO
 
 from .tracker import Tracker
 
+log = get_logger("tracking")
+
 
 class TrackerServiceBase(metaclass=AbstractSingleton):
     def __init__(self, model_path: str):
@@ -20,18 +25,35 @@ class TrackerServiceBase(metaclass=AbstractSingleton):
         from analisis.infraestructure.trackers.services import \
             TrackerFactory
 
+        self.model_path = model_path
         self.model = YOLO(model=model_path, task='obb', verbose=True)
         self.tracker = sv.ByteTrack()
         self.tracker_factory = TrackerFactory(self.model)
         self.tracker_path = "bytetrack.yaml"
+        # Tamaño de lote calibrado por proceso (ver BatchSizeTuner)
+        self.batch_tuner = BatchSizeTuner()
+        # Lotes ya inferidos que pueden esperar al tracking (0 = sin pipeline)
+        self.pipeline_depth = 2
+        # Recorte/reducción de los frames antes del modelo (None = frame completo)
+        self.inference_roi: InferenceRoi | None = None
+        self.confidence = 0.1
+        self.profiler = StageProfiler()
+        # Nombres de clase del modelo; se actualizan con los de cada resultado
+        self.class_names: dict[int, str] = dict(getattr(self.model, "names", None) or {})
+
+    @property
+    def batch_size(self) -> int:
+        return self.batch_tuner.batch_size
+
+    @batch_size.setter
+    def batch_size(self, value: int) -> None:
+        self.batch_tuner.batch_size = value
 
     @abstractmethod
     def get_object_tracks(
         self,
-        frames: list[MatLike],
-        tracks_collection: TrackCollection,
-        read_from_stub: bool = False,
-        stub_path: str = ""
+        frames: Iterable[MatLike],
+        tracks_collection: TrackCollection
     ):
         raise NotImplementedError
 
@@ -44,7 +66,7 @@ class TrackerServiceBase(metaclass=AbstractSingleton):
             self.tracker_factory.register(key, tracker_cls)
             self.tracker_factory.create(key)
         except TrackerFactoryError as e:
-            print(f"Error creating tracker '{key}': {e}")
+            log.error("tracker_not_created", tracker=key, error=str(e))
 
     def get_tracker(self, key: str) -> Tracker:
         # Import locally to avoid circular import
@@ -60,39 +82,49 @@ class TrackerServiceBase(metaclass=AbstractSingleton):
         return list(self.tracker_factory.get_trackers().values())
 
     def add_position_to_tracks(self, tracks_collection: TrackCollection):
-        for entity_type, frames in tracks_collection.tracks.items():
-            for frame_num, tracks_in_frames in frames.items():
-                for track_id, track_detail in tracks_in_frames.items():
-                    bbox = track_detail.bbox
-                    position = get_center_of_bbox(bbox)
-                    track_detail.position = position
-                    tracks_collection.update_track(
-                        entity_type=entity_type,
-                        frame_num=frame_num,
-                        track_id=track_id,
-                        track_detail=track_detail
-                    )
-
-    def read_tracks_from_stub(self, stub_path: str) -> dict:
-        tracks: dict = {"players": [], "ball": []}
-        if stub_path and Path(stub_path).exists():
-            with open(stub_path, 'rb') as f:
-                tracks = pickle.load(f)
-            return tracks
-        print("Tracks are: ", tracks)
-        return tracks
-
-    def save_tracks_to_stub(self, tracks: dict, stub_path: str):
-        if stub_path:
-            with open(stub_path, 'wb') as f:
-                pickle.dump(tracks, f)
+        for entity_type in tracks_collection.columns:
+            bbox = tracks_collection.get_column(entity_type, "bbox")
+            # Centro del bbox truncado a enteros, igual que get_center_of_bbox
+            position = np.trunc((bbox[:, :2] + bbox[:, 2:]) / 2)
+            tracks_collection.set_column(entity_type, "position", position)
+
+    def inference_params(self) -> dict:
+        """Parámetros que cambian las detecciones; forman parte de la clave de caché."""
+        return {
+            "confidence": self.confidence,
+            "task": getattr(self.model, "task", None),
+            # El backend exportado (ONNX, OpenVINO) puede diferir numéricamente
+            "model_file": Path(self.model_path).name,
+            **(self.inference_roi.params() if self.inference_roi is not None else {}),
+        }
+
+    def inference_frames(self, frames: List[MatLike]) -> List[MatLike]:
+        """Frames tal como entran al modelo, recortados si hay `inference_roi`."""
+        if self.inference_roi is None:
+            return frames
+        return self.inference_roi.prepare(frames)
+
+    def warmup(self, frame: MatLike, batch_size: int | None = None) -> None:
+        """
+        Ejecuta el modelo una vez con un lote de relleno para que la carga
+        perezosa del backend y la reserva de memoria no caigan en el primer trabajo.
+        """
+        batch_size = batch_size or self.batch_size
+        frame = self.inference_frames([frame])[0]
+        self.detect_frames([frame] * batch_size, batch_size=batch_size)
+
+    def reset(self) -> None:
+        """Descarta el estado de seguimiento del video anterior."""
+        self.tracker = sv.ByteTrack()
 
     def detect_frames(
             self,
             frames: List[MatLike],
-            batch_size: int = 20,
-            conf: float = 0.1) -> list[Results]:
+            batch_size: int | None = None,
+            conf: float | None = None) -> list[Results]:
         """Divide los frames en lotes y obtiene detecciones con el modelo YOLO."""
+        batch_size = batch_size or self.batch_size
+        conf = self.confidence if conf is None else conf
         detections: list[Results] = []
         for i in range(0, len(frames), batch_size):
             batch = frames[i:i + batch_size]
@@ -0,0 +1 @@
+from .analysis_options import AnalysisOptions
@@ -0,0 +1,26 @@
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class AnalysisOptions(BaseModel):
+    """
+    Opciones de un trabajo de análisis, enviadas junto con el video.
+
+    Con `detection_stride` > 1 el detector solo corre en los keyframes (uno
+    cada `detection_stride` frames); en los frames intermedios las cajas se
+    propagan con el modelo de movimiento de cada track. Los umbrales agregan
+    keyframes extra cuando la propagación deja de ser confiable.
+    """
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
+    # 1 = detectar en todos los frames
+    detection_stride: int = Field(default=1, ge=1, le=30)
+    # Desplazamiento acumulado de cámara (px) desde el último keyframe que fuerza uno nuevo
+    max_camera_motion: Optional[float] = Field(default=None, gt=0)
+    # Confianza media mínima de un keyframe; por debajo, el siguiente lote arranca con un keyframe
+    min_detection_confidence: Optional[float] = Field(default=None, gt=0, le=1)
+
+    @property
+    def keyframe_mode(self) -> bool:
+        return self.detection_stride > 1
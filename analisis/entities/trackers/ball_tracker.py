@@ -1,8 +1,6 @@
-from typing import Dict, Hashable
-import pandas as pd
+import numpy as np
 import supervision as sv
 from analisis.entities.collection.track_collection import TrackCollection
-from analisis.entities.tracks.track_detail import TrackBallDetail, TrackDetailBase
 from analisis.entities.interfaces import Tracker
 
 
@@ -24,14 +22,13 @@ class BallTracker(Tracker):
         ball_mask = class_ids == cls_names_inv['ball']
 
         if ball_mask is not None and track_ids is not None and track_ids.any() and ball_mask.any():
-            ball_bbox = bbox[ball_mask][0].tolist()
+            ball_bbox = bbox[ball_mask][:1]
             ball_id = 1
-            track = TrackBallDetail(bbox=ball_bbox, track_id=int(ball_id))
-            tracks_collection.update_track(
-                frame_num=frame_num,
-                track_id=int(ball_id),
-                track_detail=track,
-                entity_type="ball")
+            tracks_collection.update_tracks(
+                entity_type="ball",
+                frame_nums=frame_num,
+                track_ids=[ball_id],
+                bbox=ball_bbox)
 
         # for frame_detection in detection_supervision:
         #     bbox = frame_detection[0].tolist()
@@ -40,63 +37,30 @@ class BallTracker(Tracker):
         #     if cls_id == cls_names_inv['ball']:
         #         tracks["ball"][frame_num][1] = {"bbox": bbox}
 
-    def interpolate_ball_positions(
-            self,
-            ball_tracks: Dict[int, Dict[int, TrackDetailBase]]
-    ) -> Dict[Hashable, Dict[int, Dict[str, list]]]:
+    def interpolate_ball_positions(self, tracks_collection: TrackCollection) -> int:
         """
-    Interpola posiciones del balón entre frames perdidos.
+        Interpola las cajas del balón que quedaron sin valor (NaN) a partir
+        de las detecciones de los frames vecinos, sobre la columna `bbox`
+        de la colección; antes y después de la primera y la última detección
+        se repite la caja más cercana.
 
-    Args:
-        ball_tracks: dict con estructura {frame_num: {track_id: TrackBallDetail}}
-        max_gap: máximo número de frames consecutivos sin detección que se interpolan
-    """
-    #     positions = {
-    #     frame: track[1].bbox
-    #     for frame, track in ball_tracks.items()
-    #     if 1 in track and track[1].bbox is not None
-    # }
-        
-        ball_positions = {}
-        frame_indices = []
-        for frame_num, tracks_in_frame in ball_tracks.items():
-            for track_id, track in tracks_in_frame.items():
-                ball_positions[frame_num] = track.bbox
-                frame_indices.append(frame_num)
+        Args:
+            tracks_collection (TrackCollection): Colección con los tracks del balón.
 
-        # DataFrame con índice de frames
-        df_ball = pd.DataFrame.from_dict(
-            ball_positions, orient="index", columns=["x1", "y1", "x2", "y2"]
-        ).sort_index()
-
-        # Interpolación
-        df_ball = df_ball.interpolate(limit_direction="both")
-
-        # Reconstruir como dict indexado por frame
-        interpolated_tracks = {
-            frame: {1: {"bbox": row.tolist()}}
-            for frame, row in df_ball.iterrows()
-        }
-        return interpolated_tracks
-
-        # ball_positions= []
-        # for frame_num, tracks_in_frame in ball_tracks.items():
-        #     for tracks in tracks_in_frame.values():
-        #         print("Bbox is of type: ", type(tracks.bbox))
-        #         ball_positions.append(tracks.bbox)
-
-        # # Create a DataFrame to handle missing values
-        # df_ball = pd.DataFrame(
-        #     ball_positions,
-        #     columns=['x1', 'y1', 'x2', 'y2']
-        # )
-
-        # # Interpolate middle gaps, then fill leading/trailing NaNs
-        # df_ball = df_ball.interpolate(limit_direction='both')
-
-        # ball_positions = [
-        #     {1: {"bbox": row}}
-        #     for row in df_ball.to_numpy().tolist()
-        # ]
-
-        # return ball_positions
+        Returns:
+            int: Filas completadas.
+        """
+        bboxes = tracks_collection.get_column("ball", "bbox")
+        missing = np.isnan(bboxes).any(axis=1)
+        if not missing.any() or missing.all():
+            return 0
+
+        frames = tracks_collection.get_column("ball", "frame")
+        known = np.flatnonzero(~missing)
+        known = known[np.argsort(frames[known], kind="stable")]
+        rows = np.flatnonzero(missing)
+        interpolated = np.stack(
+            [np.interp(frames[rows], frames[known], bboxes[known, i]) for i in range(bboxes.shape[1])],
+            axis=1)
+        tracks_collection.set_column("ball", "bbox", interpolated.astype(bboxes.dtype), rows)
+        return len(rows)
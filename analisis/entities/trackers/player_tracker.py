@@ -1,7 +1,5 @@
-from pathlib import Path
 import supervision as sv
 from analisis.entities.collection.track_collection import TrackCollection
-from analisis.entities.tracks.track_detail import TrackPlayerDetail
 from analisis.entities.interfaces import Tracker
 
 class PlayerTracker(Tracker):
@@ -26,14 +24,11 @@ class PlayerTracker(Tracker):
             player_bboxes = bbox[player_mask]
             player_ids = track_ids[player_mask]
 
-            for bbox, track_id in zip(player_bboxes, player_ids):
-                print("Track ID is: ", track_id)
-                track = TrackPlayerDetail(bbox=bbox.tolist(), track_id=int(track_id))
-                tracks_collection.update_track(
-                    entity_type="players",
-                    frame_num=frame_num,
-                    track_id=int(track_id),
-                    track_detail=track)
+            tracks_collection.update_tracks(
+                entity_type="players",
+                frame_nums=frame_num,
+                track_ids=player_ids,
+                bbox=player_bboxes)
 
         # for frame_detection in detection_with_tracks:
         #     bbox = frame_detection[0].tolist()
@@ -18,7 +18,8 @@ class TrackDetailBase(BaseModel):
         Actualiza los atributos de la instancia según el tipo de dato recibido.
         No concatena tuplas ni listas salvo que sea necesario (por ejemplo en bbox).
         """
-        valid_fields = self.model_dump().keys()
+        # Solo los nombres: model_dump() convertiría toda la instancia en cada llamada
+        valid_fields = type(self).model_fields
         clean_data = {k: v for k, v in kwargs.items() if k in valid_fields and v is not None}
 
         for k, v in clean_data.items():
@@ -1,8 +1,95 @@
-from typing import Dict
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional
+
+import orjson
+
+from analisis.entities.collection.track_collection import TrackCollection
 from analisis.entities.tracks.track_detail import TrackDetailBase
 
+# Claves enteras (frame, track_id) y arreglos NumPy sin conversión previa
+JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def json_default(value):
+    """Respaldo para lo que orjson no serializa solo (escalares NumPy, arreglos no contiguos)."""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(value) -> bytes:
+    return orjson.dumps(value, default=json_default, option=JSON_OPTIONS)
+
+
 def player_tracks_to_json(player_tracks: Dict[int, TrackDetailBase]) -> Dict[int, dict]:
     return {track_id: track.to_json() for track_id, track in player_tracks.items()}
 
 def player_frames_to_json(player_frames: Dict[int, Dict[int, TrackDetailBase]]) -> Dict[int, Dict[int, dict]]:
-    return {frame_num: player_tracks_to_json(tracks) for frame_num, tracks in player_frames.items()}
\ No newline at end of file
+    return {frame_num: player_tracks_to_json(tracks) for frame_num, tracks in player_frames.items()}
+
+
+def tracks_to_frames(
+        tracks_collection: TrackCollection,
+        entity_type: str = "players",
+        start: int = 0,
+        stop: Optional[int] = None) -> Dict[int, Dict[int, dict]]:
+    """
+    Igual que `player_frames_to_json(tracks_collection.tracks[entity_type])`
+    para los frames en [start, stop), pero armado directo de las columnas.
+    """
+    rows = tracks_collection.rows_for_frames(entity_type, start, stop)
+    return tracks_collection.frame_records(entity_type, rows)
+
+
+def tracks_to_json_bytes(
+        tracks_collection: TrackCollection,
+        entity_type: str = "players",
+        start: int = 0,
+        stop: Optional[int] = None) -> bytes:
+    """
+    Serializa en una llamada los tracks de un rango de frames (o de todo el
+    video) al mismo JSON que `player_frames_to_json`: {frame: {track_id: {...}}}.
+    """
+    return dumps(tracks_to_frames(tracks_collection, entity_type, start, stop))
+
+
+def iter_tracks_json(
+        tracks_collection: TrackCollection,
+        entity_types: Iterable[str] = ("players", "ball"),
+        chunk_frames: int = 1000) -> Iterator[bytes]:
+    """
+    Versión en streaming: produce {"players": {...}, "ball": {...}} en
+    trozos de `chunk_frames` frames, así la memoria no depende del largo
+    del video.
+
+    Yields:
+        bytes: Fragmentos consecutivos de un único documento JSON.
+    """
+    yield b"{"
+    for entity_number, entity_type in enumerate(entity_types):
+        if entity_number:
+            yield b","
+        yield dumps(entity_type) + b":{"
+        frames = tracks_collection.get_column(entity_type, "frame")
+        last_frame = int(frames.max()) if len(frames) else -1
+        first_chunk = True
+        for start in range(0, last_frame + 1, chunk_frames):
+            chunk = tracks_to_json_bytes(tracks_collection, entity_type, start, start + chunk_frames)
+            if chunk == b"{}":
+                continue
+            # Se quitan las llaves del trozo para unirlo al objeto de la entidad
+            yield (b"" if first_chunk else b",") + chunk[1:-1]
+            first_chunk = False
+        yield b"}"
+    yield b"}"
+
+
+def write_tracks_json(
+        tracks_collection: TrackCollection,
+        file: BinaryIO,
+        entity_types: Iterable[str] = ("players", "ball"),
+        chunk_frames: int = 1000) -> int:
+    """Escribe `iter_tracks_json` en un archivo binario. Devuelve los bytes escritos."""
+    written = 0
+    for chunk in iter_tracks_json(tracks_collection, entity_types, chunk_frames):
+        written += file.write(chunk)
+    return written
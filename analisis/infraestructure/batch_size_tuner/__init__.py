@@ -0,0 +1,2 @@
+from .batch_size_tuner import (DEFAULT_BATCH_SIZE, DEFAULT_CANDIDATES,
+                               BatchSizeTuner)
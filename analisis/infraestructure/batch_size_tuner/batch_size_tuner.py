@@ -0,0 +1,169 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import psutil
+from cv2.typing import MatLike
+
+from analisis.entities.utils.singleton import Singleton
+from analisis.infraestructure.structured_logging import get_logger
+
+DEFAULT_BATCH_SIZE = 20
+DEFAULT_CANDIDATES = (1, 2, 4, 8, 16, 32)
+MB = 1024 * 1024
+
+log = get_logger("inference")
+
+
+class BatchSizeTuner(metaclass=Singleton):
+    """
+    Tamaño de lote de inferencia del proceso, calibrado para la máquina.
+
+    `calibrate` mide los frames/seg de cada tamaño candidato y elige el más
+    rápido que no supere el presupuesto de memoria (RSS del proceso); otro
+    proceso del mismo host puede reusar ese resultado con `use_calibration`. Durante
+    el análisis, `observe` se llama después de cada lote y reduce el tamaño
+    a la mitad si el RSS pasa el presupuesto; `reset` vuelve al calibrado al
+    empezar otro trabajo.
+    """
+
+    def __init__(
+            self,
+            initial_batch_size: int = DEFAULT_BATCH_SIZE,
+            candidates: Iterable[int] = DEFAULT_CANDIDATES,
+            memory_budget_mb: Optional[float] = None,
+            memory_fraction: float = 0.7,
+            min_batch_size: int = 1,
+            processes: int = 1):
+        """
+        Args:
+            initial_batch_size (int): Tamaño usado si no se calibra.
+            candidates (Iterable[int]): Tamaños a probar en la calibración.
+            memory_budget_mb (float | None): RSS máximo del proceso; si se
+                omite se usa el RSS actual más la parte de este proceso de
+                `memory_fraction` de la memoria disponible al momento de calibrar.
+            memory_fraction (float): Fracción de la memoria disponible usada
+                para el presupuesto automático.
+            min_batch_size (int): Límite inferior al reducir.
+            processes (int): Procesos del host que corren el modelo a la vez
+                (p. ej. los del pool de Celery); se reparten la memoria
+                disponible del presupuesto automático.
+        """
+        self.batch_size = initial_batch_size
+        self.calibrated_batch_size = initial_batch_size
+        self.candidates = sorted({int(size) for size in candidates if int(size) > 0})
+        self.memory_fraction = memory_fraction
+        self.min_batch_size = min_batch_size
+        self.processes = max(1, int(processes))
+        self.memory_budget: Optional[int] = int(memory_budget_mb * MB) if memory_budget_mb else None
+        self.calibration_fps: Dict[int, float] = {}
+        self.reductions = 0
+        self.peak_rss = 0
+        self._process = psutil.Process()
+        self._lock = threading.Lock()
+
+    def rss(self) -> int:
+        rss = self._process.memory_info().rss
+        self.peak_rss = max(self.peak_rss, rss)
+        return rss
+
+    def memory_budget_bytes(self) -> int:
+        if self.memory_budget is None:
+            available = psutil.virtual_memory().available
+            self.memory_budget = int(self.rss() + available * self.memory_fraction / self.processes)
+        return self.memory_budget
+
+    def calibrate(
+            self,
+            predict: Callable[[list[MatLike]], Any],
+            frame: MatLike,
+            repeats: int = 2) -> int:
+        """
+        Elige el tamaño de lote con más frames/seg dentro del presupuesto.
+
+        Los candidatos se prueban de menor a mayor; se deja de probar cuando
+        uno supera el presupuesto de memoria o su rendimiento cae más de un
+        10% respecto al mejor. Un tamaño mayor solo reemplaza al mejor si
+        rinde al menos un 5% más, porque también cuesta memoria y latencia.
+
+        Args:
+            predict (Callable): Ejecuta el modelo sobre una lista de frames.
+            frame (MatLike): Frame representativo (resolución real del video).
+            repeats (int): Mediciones por candidato, después de un calentamiento.
+
+        Returns:
+            int: Tamaño de lote elegido.
+        """
+        budget = self.memory_budget_bytes()
+        best_size, best_fps = None, 0.0
+        self.calibration_fps.clear()
+
+        for size in self.candidates:
+            batch = [frame] * size
+            predict(batch)  # Calentamiento: reserva buffers y compila kernels
+            start = time.perf_counter()
+            for _ in range(repeats):
+                predict(batch)
+            fps = size * repeats / max(time.perf_counter() - start, 1e-9)
+            self.calibration_fps[size] = fps
+
+            if self.rss() > budget:
+                log.warning("batch_size_over_budget", batch_size=size,
+                            peak_rss_mb=round(self.peak_rss / MB), budget_mb=round(budget / MB))
+                break
+            if best_size is None or fps >= best_fps * 1.05:
+                best_size, best_fps = size, fps
+            elif fps < best_fps * 0.9:
+                break
+
+        with self._lock:
+            self.calibrated_batch_size = best_size or self.min_batch_size
+            self.batch_size = self.calibrated_batch_size
+        log.info("batch_size_calibrated", batch_size=self.batch_size, fps=round(best_fps, 1))
+        return self.batch_size
+
+    def use_calibration(self, batch_size: int, calibration_fps: Dict[int, float]) -> int:
+        """Adopta el resultado de una calibración hecha por otro proceso del host."""
+        with self._lock:
+            self.calibrated_batch_size = max(self.min_batch_size, int(batch_size))
+            self.batch_size = self.calibrated_batch_size
+            self.calibration_fps = {int(size): float(fps) for size, fps in calibration_fps.items()}
+        log.info("batch_size_shared", batch_size=self.batch_size)
+        return self.batch_size
+
+    def observe(self) -> int:
+        """
+        Revisa la memoria después de un lote y reduce el tamaño a la mitad si
+        el RSS supera el presupuesto.
+
+        Returns:
+            int: Tamaño de lote a usar en el siguiente lote.
+        """
+        rss = self.rss()
+        budget = self.memory_budget_bytes()
+        with self._lock:
+            if rss > budget and self.batch_size > self.min_batch_size:
+                self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+                self.reductions += 1
+                log.warning("batch_size_reduced", batch_size=self.batch_size,
+                            rss_mb=round(rss / MB), budget_mb=round(budget / MB))
+            return self.batch_size
+
+    def reset(self) -> None:
+        """Vuelve al tamaño calibrado y limpia los contadores del trabajo anterior."""
+        with self._lock:
+            self.batch_size = self.calibrated_batch_size
+            self.reductions = 0
+            self.peak_rss = 0
+
+    def metrics(self) -> Dict[str, Any]:
+        """Resumen para las métricas del trabajo."""
+        return {
+            "batch_size": self.batch_size,
+            "calibrated_batch_size": self.calibrated_batch_size,
+            "calibration_fps": {str(size): round(fps, 2) for size, fps in self.calibration_fps.items()},
+            "reductions": self.reductions,
+            "memory_budget_mb": round(self.memory_budget / MB, 1) if self.memory_budget else None,
+            "processes": self.processes,
+            "peak_rss_mb": round(self.peak_rss / MB, 1),
+        }
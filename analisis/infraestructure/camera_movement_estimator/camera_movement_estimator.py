@@ -1,138 +1,147 @@
 import gc
-import logging
-import pathlib
-import pickle
+from typing import Iterable
 
 import cv2
 import numpy as np
 from cv2.typing import MatLike
 
 from analisis.entities.collection.track_collection import TrackCollection
+from analisis.infraestructure.services.annotation_service import blend_rectangle
+from analisis.infraestructure.structured_logging import get_logger
+
+log = get_logger("camera")
+
+
+# Franjas de columnas (fracción del ancho) donde se buscan características:
+# el borde izquierdo y la zona central, medidas originalmente en 1920 px
+FEATURE_COLUMNS = ((0 / 1920, 20 / 1920), (900 / 1920, 1050 / 1920))
 
 
 class CameraMovementEstimator():
-    def __init__(self, frame: MatLike):
+    def __init__(self, frame: MatLike | None = None, scale: float = 1.0):
+        """
+        Args:
+            frame (MatLike | None): Frame de referencia para construir la
+                máscara; si se omite se construye con el primer frame.
+            scale (float): Factor de reducción de la imagen en escala de grises
+                usada para el flujo óptico (1.0 = resolución completa). El
+                movimiento se devuelve siempre en píxeles de resolución completa.
+        """
         self.minimum_distance = 5
+        self.scale = scale
 
         self.lk_params = dict(winSize=(15, 15), maxLevel=2, criteria=(
             cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
 
-        first_frame_grayscale = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        mask_features = np.zeros_like(first_frame_grayscale)
-        mask_features[:, 0:20] = 1
-        mask_features[:, 900:1050] = 1
-
         self.features = dict(
             maxCorners=100,
             qualityLevel=0.3,
             minDistance=3,
             blockSize=7,
-            mask=mask_features
+            mask=None
         )
+        if frame is not None:
+            self.features["mask"] = self.build_feature_mask(self.to_grayscale(frame))
+        self.reset()
+
+    def build_feature_mask(self, frame_gray: MatLike) -> np.ndarray:
+        """Máscara de características según el ancho real del frame de trabajo."""
+        mask_features = np.zeros_like(frame_gray)
+        width = frame_gray.shape[1]
+        for start, end in FEATURE_COLUMNS:
+            mask_features[:, int(round(start * width)):int(round(end * width))] = 1
+        return mask_features
+
+    def to_grayscale(self, frame: MatLike) -> MatLike:
+        """Convierte a escala de grises y reduce según `self.scale`."""
+        frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.scale != 1.0:
+            frame_gray = cv2.resize(
+                frame_gray, None, fx=self.scale, fy=self.scale,
+                interpolation=cv2.INTER_AREA)
+        return frame_gray
 
     def add_adjust_positions_to_tracks(
             self,
             camera_movement_per_frame,
             tracks_collection: TrackCollection):
-        for entity_type, frames in tracks_collection.tracks.items():
-            for frame_num, tracks_in_frames in frames.items():
-                # if frame_num < len(camera_movement_per_frame):
-                camera_movement = camera_movement_per_frame[frame_num]
-                # else:
-                #     # If frame_num is out of range, assume no camera movement
-                #     # for this frame
-                #     camera_movement = (0, 0)
-                dx, dy = camera_movement
-                for track_id, track_detail in tracks_in_frames.items():
-                    print(f"Actual position of track {track_id}: {track_detail.position}")
-                    x, y = track_detail.position or (0, 0)
-                    position_adjusted = (x - dx, y - dy)
-                    track_detail.update(position_adjusted=position_adjusted)
-                    # track_detail.position_adjusted = position_adjusted
-                    tracks_collection.update_track(
-                        entity_type=entity_type,
-                        frame_num=frame_num,
-                        track_id=track_id,
-                        track_detail=track_detail
-                    )
-
-        # for object, object_tracks in tracks.items():
-        #     for frame_num, track in enumerate(object_tracks):
-        #         if frame_num < len(camera_movement_per_frame):
-        #             camera_movement = camera_movement_per_frame[frame_num]
-        #         else:
-        #             # If frame_num is out of range, assume no camera movement
-        #             # for this frame
-        #             camera_movement = (0, 0)
-        #         dx, dy = camera_movement
-        #         for track_id, track_info in track.items():
-        #             x, y = track_info['position']
-        #             position_adjusted = (x - dx, y - dy)
-        #             if object == 'ball':
-        #                 ball_track = TrackBallDetail(position_adjusted=position_adjusted)
-        #                 tracks_collection.update_track(
-        #                     frame_num=frame_num,
-        #                     track_id=track_id,
-        #                     track_detail=ball_track,
-        #                     entity_type="ball"
-        #                 )
-        #             else:
-        #                 player_track = TrackPlayerDetail(position_adjusted=position_adjusted)
-        #                 tracks_collection.update_track(
-        #                     entity_type="players",
-        #                     frame_num=frame_num,
-        #                     track_id=track_id,
-        #                     track_detail=player_track
-        #                 )
-        #             tracks[object][frame_num][track_id]['position_adjusted'] = position_adjusted
-
-    def get_camera_movement(
-            self,
-            frames: list[MatLike],
-            read_from_stub: bool = False,
-            stub_path: str = ""):
-        # Read the stub
-        if read_from_stub and stub_path is not None and pathlib.Path(stub_path).exists():
-            with pathlib.Path(stub_path).open('rb') as f:
-                return pickle.load(f)
-
-        camera_movement = [[0, 0]] * len(frames)
-
-        old_gray = cv2.cvtColor(frames[0], cv2.COLOR_BGR2GRAY)
-        old_features = cv2.goodFeaturesToTrack(
-            old_gray, **self.features)  # type: ignore
-
-        for frame_num in range(1, len(frames)):
-            frame_gray = cv2.cvtColor(frames[frame_num], cv2.COLOR_BGR2GRAY)
+        camera_movement = np.asarray(camera_movement_per_frame, dtype=np.float32).reshape(-1, 2)
+        for entity_type in tracks_collection.columns:
+            frames = tracks_collection.get_column(entity_type, "frame")
+            position = tracks_collection.get_column(entity_type, "position")
+            # Frames sin movimiento estimado se consideran sin movimiento
+            in_range = frames < len(camera_movement)
+            movement = np.zeros_like(position)
+            movement[in_range] = camera_movement[frames[in_range]]
+            tracks_collection.set_column(
+                entity_type, "position_adjusted", position - movement)
+
+    def get_camera_movement(self, frames: Iterable[MatLike]):
+        self.reset()
+        return [self.update(frame) for frame in frames]
+
+    def cache_params(self) -> dict:
+        """Parámetros que cambian el movimiento estimado; forman parte de la clave de caché."""
+        return {
+            "scale": self.scale,
+            "minimum_distance": self.minimum_distance,
+            "feature_columns": FEATURE_COLUMNS,
+            "lk_params": self.lk_params,
+            "features": {k: v for k, v in self.features.items() if k != "mask"},
+        }
+
+    def reset(self) -> None:
+        """Descarta el estado del frame anterior para empezar un nuevo video."""
+        self.old_gray = None
+        self.old_features = None
+
+    def update(self, frame: MatLike) -> list[float]:
+        """
+        Calcula el movimiento de cámara del frame respecto al anterior.
+
+        Mantiene internamente el último frame en escala de grises y sus
+        características, por lo que los frames deben llegar en orden.
+
+        Args:
+            frame (MatLike): Frame BGR actual.
+
+        Returns:
+            list[float]: Movimiento [x, y]; [0, 0] para el primer frame.
+        """
+        frame_gray = self.to_grayscale(frame)
+        mask = self.features["mask"]
+        if mask is None or mask.shape != frame_gray.shape:
+            self.features["mask"] = self.build_feature_mask(frame_gray)
+
+        if self.old_gray is None:
+            self.old_gray = frame_gray
+            self.old_features = cv2.goodFeaturesToTrack(
+                frame_gray, **self.features)  # type: ignore
+            return [0, 0]
+
+        movement = [0, 0]
+        if self.old_features is not None:
             new_features, _, _ = cv2.calcOpticalFlowPyrLK(
-                old_gray,
+                self.old_gray,
                 frame_gray,
-                old_features,
+                self.old_features,
                 None,  # type: ignore
                 **self.lk_params  # type: ignore
             )
-            # new_features, _, _ =
-            # cv2.calcOpticalFlowFarneback(old_gray, frame_gray,
-            # old_features, None, **self.lk_params)
             # cv2.calcOpticalFlowFarneback returna un vector 2D
-            max_distance = 0
-            camera_movement_x, camera_movement_y = 0, 0
-
             camera_movement_x, camera_movement_y, max_distance = self.update_camera_distance(
-                new_features, old_features)
+                new_features, self.old_features)
 
-            if max_distance > self.minimum_distance:
-                camera_movement[frame_num] = [camera_movement_x, camera_movement_y]  # type: ignore
-                old_features = cv2.goodFeaturesToTrack(
+            # Se vuelve a píxeles de resolución completa
+            if max_distance / self.scale > self.minimum_distance:
+                movement = [camera_movement_x / self.scale, camera_movement_y / self.scale]
+                self.old_features = cv2.goodFeaturesToTrack(
                     frame_gray, **self.features)  # type: ignore
+        else:
+            log.debug("camera_features_missing", interval=1.0)
 
-            old_gray = frame_gray.copy()
-
-        if stub_path is not None:
-            with pathlib.Path(stub_path).open('wb') as f:
-                pickle.dump(camera_movement, f)
-
-        return camera_movement
+        self.old_gray = frame_gray
+        return movement
 
     def update_camera_distance(
             self, new_features, old_features) -> tuple[float, float, float]:
@@ -150,52 +159,34 @@ class CameraMovementEstimator():
         Returns:
             Tupla con (movimiento_x, movimiento_y, distancia_maxima)
         """
-        if len(new_features) != len(old_features) or len(new_features) == 0:
+        if new_features is None or old_features is None \
+                or len(new_features) != len(old_features) or len(new_features) == 0:
             return 0.0, 0.0, 0.0
-        max_distance = 0.0
-        camera_movement_x = 0.0
-        camera_movement_y = 0.0
-
-        for new_feat, old_feat in zip(new_features, old_features):
-            new_point = new_feat.ravel()
-            old_point = old_feat.ravel()
 
-            diff = new_point - old_point
-            distance = np.linalg.norm(diff)
+        diff = np.asarray(new_features, dtype=np.float32).reshape(-1, 2) \
+            - np.asarray(old_features, dtype=np.float32).reshape(-1, 2)
+        distances = np.hypot(diff[:, 0], diff[:, 1])
+        farthest = int(np.argmax(distances))
+        if not distances[farthest] > 0:
+            return 0.0, 0.0, 0.0
 
-            if distance > max_distance:
-                max_distance = distance
-                camera_movement_x = float(diff[0])
-                camera_movement_y = float(diff[1])
+        return float(diff[farthest, 0]), float(diff[farthest, 1]), float(distances[farthest])
 
-        return camera_movement_x, camera_movement_y, float(max_distance)
+    def draw_camera_movement_frame(self, frame: MatLike, x_movement: float, y_movement: float) -> MatLike:
+        """Recuadro con el movimiento de cámara de un frame, dibujado en el lugar."""
+        blend_rectangle(frame, (0, 0), (500, 100), (255, 255, 255), 0.6)
+        cv2.putText(frame, f"Camera Movement X: {x_movement:.2f}", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 3)
+        cv2.putText(frame, f"Camera Movement Y: {y_movement:.2f}", (10, 60),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 3)
+        return frame
 
     def draw_camera_movement(self, frames: list[MatLike], camera_movement_per_frame):
         output_frames = []
 
         for frame_num, frame in enumerate(frames):
-            frame = np.copy(frame)
-
-            overlay = frame.copy()
-            cv2.rectangle(overlay, (0, 0), (500, 100), (255, 255, 255), -1)
-            alpha = 0.6
-            cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
             x_movement, y_movement = camera_movement_per_frame[frame_num]
-            frame = cv2.putText(frame,
-                                f"Camera Movement X: {x_movement:.2f}",
-                                (10, 30),
-                                cv2.FONT_HERSHEY_SIMPLEX,
-                                1,
-                                (0, 0, 0),
-                                3)
-            frame = cv2.putText(frame,
-                                f"Camera Movement Y: {y_movement:.2f}",
-                                (10, 60),
-                                cv2.FONT_HERSHEY_SIMPLEX,
-                                1,
-                                (0, 0, 0),
-                                3)
-            output_frames.append(frame)
+            output_frames.append(self.draw_camera_movement_frame(np.copy(frame), x_movement, y_movement))
 
             if frame_num % 50 == 0:
                 gc.collect()
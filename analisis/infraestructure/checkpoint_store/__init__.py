@@ -0,0 +1,2 @@
+from .checkpoint_store import (CHECKPOINT_FORMAT_VERSION, Checkpoint,
+                               CheckpointStore)
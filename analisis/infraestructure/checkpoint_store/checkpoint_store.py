@@ -0,0 +1,157 @@
+import fcntl
+import json
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional
+from uuid import uuid4
+
+import numpy as np
+from analisis.infraestructure.structured_logging import get_logger
+
+log = get_logger("cache")
+
+# Cambiar si cambia el formato de los archivos para invalidar los anteriores
+CHECKPOINT_FORMAT_VERSION = 1
+
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class Checkpoint(NamedTuple):
+    """
+    - stage : Etapa que guardó el checkpoint.
+    - meta  : Metadatos JSON guardados con los arreglos (versión, parámetros).
+    - arrays: Arreglos del checkpoint.
+    """
+    stage: str
+    meta: Dict[str, Any]
+    arrays: Dict[str, np.ndarray]
+
+
+class CheckpointStore:
+    """
+    Salida de cada etapa de un trabajo guardada en disco, para retomarlo
+    desde la última etapa terminada si se reintenta o se reinicia el worker.
+
+    Cada checkpoint es `<dir>/<trabajo>/<etapa>.npz` (sin comprimir: se
+    escribe en el camino del trabajo) con sus metadatos en JSON. Se escribe
+    en un archivo temporal y se reemplaza, así un corte a mitad nunca deja
+    un checkpoint a medias. Un checkpoint solo es válido si sus metadatos
+    coinciden con los esperados (versión del formato, de la etapa, video y
+    opciones del trabajo). Los trabajos sin actividad por más de `ttl_s`
+    segundos se eliminan al guardar.
+    """
+
+    def __init__(self, root: str | Path, ttl_s: float = 60 * 60 * 24):
+        self.root = Path(root)
+        self.ttl_s = ttl_s
+
+    def job_dir(self, job_id: str) -> Path:
+        return self.root / _SAFE_NAME.sub("_", job_id)
+
+    def path(self, job_id: str, stage: str) -> Path:
+        return self.job_dir(job_id) / f"{_SAFE_NAME.sub('_', stage)}.npz"
+
+    def save(self, job_id: str, stage: str, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> Path:
+        """
+        Guarda el checkpoint de una etapa, reemplazando el anterior.
+
+        Args:
+            job_id (str): ID del trabajo (el de la tarea de Celery).
+            stage (str): Etapa que termina.
+            arrays (dict): Arreglos a guardar; los nombres pueden llevar "/".
+            meta (dict): Metadatos serializables a JSON; se comparan al cargar.
+
+        Returns:
+            Path: Archivo escrito.
+        """
+        self.prune()
+        path = self.path(job_id, stage)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {**meta, "format": CHECKPOINT_FORMAT_VERSION, "stage": stage}
+        # Una entrega repetida puede guardar la misma etapa a la vez que la
+        # anterior (acks_late): cada una escribe su propio archivo temporal
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}-{uuid4().hex[:8]}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **arrays, __meta__=np.asarray(json.dumps(meta, sort_keys=True)))
+            tmp_path.replace(path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        return path
+
+    def load(self, job_id: str, stage: str, expected: Optional[Dict[str, Any]] = None) -> Optional[Checkpoint]:
+        """
+        Checkpoint de una etapa, o None si no existe, está dañado o sus
+        metadatos no coinciden con `expected` (p. ej. otra versión de la etapa).
+        """
+        return self.read(self.path(job_id, stage), {**(expected or {}), "stage": stage})
+
+    def read(self, path: str | Path, expected: Optional[Dict[str, Any]] = None) -> Optional[Checkpoint]:
+        """
+        Checkpoint guardado en `path` (el que devolvió `save`), con las mismas
+        validaciones que `load`. Sirve para pasar un checkpoint a otro proceso
+        o nodo con solo su ruta.
+        """
+        path = Path(path)
+        try:
+            with np.load(path, allow_pickle=False) as entry:
+                arrays = {name: entry[name] for name in entry.files}
+            meta = json.loads(str(arrays.pop("__meta__")))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            log.warning("checkpoint_discarded", path=str(path), error=str(e))
+            path.unlink(missing_ok=True)
+            return None
+
+        expected = {**(expected or {}), "format": CHECKPOINT_FORMAT_VERSION}
+        stale = [key for key, value in expected.items() if meta.get(key) != value]
+        if stale:
+            log.info("checkpoint_stale", path=str(path), fields=stale)
+            return None
+        return Checkpoint(stage=meta["stage"], meta=meta, arrays=arrays)
+
+    def count_delivery(self, job_id: str, name: str) -> int:
+        """
+        Suma una entrega de una tarea del trabajo (`name`: la tarea o la
+        subtarea) y devuelve cuántas lleva, contando esta. El contador se
+        guarda junto a los checkpoints, así sobrevive a la muerte del worker
+        y se borra con `clear` cuando el trabajo termina bien.
+        """
+        self.prune()
+        path = self.job_dir(job_id) / f"{_SAFE_NAME.sub('_', name)}.deliveries"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a+") as f:
+            # Dos entregas simultáneas no deben leer el mismo valor
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            try:
+                count = int(f.read() or 0) + 1
+            except ValueError:
+                count = 1
+            f.seek(0)
+            f.truncate()
+            f.write(str(count))
+        return count
+
+    def clear(self, job_id: str) -> None:
+        """Elimina los checkpoints de un trabajo (al terminar bien)."""
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+
+    def prune(self) -> int:
+        """Elimina los trabajos sin checkpoints nuevos en `ttl_s`; devuelve cuántos."""
+        if not self.root.exists():
+            return 0
+        limit = time.time() - self.ttl_s
+        removed = 0
+        for job_dir in self.root.iterdir():
+            try:
+                if job_dir.is_dir() and job_dir.stat().st_mtime < limit:
+                    shutil.rmtree(job_dir, ignore_errors=True)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
@@ -0,0 +1,2 @@
+from .detection_cache import (CachedDetections, DetectionCache,
+                              DetectionLog)
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+from uuid import uuid4
+
+import numpy as np
+import supervision as sv
+from analisis.infraestructure.structured_logging import get_logger
+
+log = get_logger("cache")
+
+# Cambiar si cambia el formato de las entradas para invalidar las anteriores
+CACHE_FORMAT_VERSION = 1
+
+
+class DetectionCache:
+    """
+    Caché en disco de resultados costosos del preprocesamiento (detecciones
+    de YOLO y movimiento de cámara), direccionada por contenido.
+
+    Cada entrada es un `.npz` cuyo nombre es el hash de sus entradas (hash del
+    video, hash del modelo y parámetros). Leer una entrada actualiza su mtime,
+    que se usa como orden LRU: al superar `max_bytes` se eliminan las entradas
+    menos usadas.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._file_hashes: Dict[tuple, str] = {}
+
+    def hash_file(self, path: str | Path, chunk_size: int = 1024 * 1024 * 16) -> str:
+        """
+        SHA-256 del contenido de un archivo. Se memoriza por (ruta, tamaño,
+        mtime) para no volver a leer el modelo en cada análisis.
+        """
+        path = Path(path)
+        stat = path.stat()
+        memo_key = (path.resolve().as_posix(), stat.st_size, stat.st_mtime_ns)
+        if memo_key not in self._file_hashes:
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                while chunk := f.read(chunk_size):
+                    digest.update(chunk)
+            self._file_hashes[memo_key] = digest.hexdigest()
+        return self._file_hashes[memo_key]
+
+    def make_key(self, kind: str, *hashes: str, **params) -> str:
+        """Clave de una entrada a partir de su tipo, hashes de entrada y parámetros."""
+        payload = json.dumps(
+            {"version": CACHE_FORMAT_VERSION, "kind": kind, "hashes": hashes, "params": params},
+            sort_keys=True, default=str)
+        return f"{kind}-{hashlib.sha256(payload.encode()).hexdigest()}"
+
+    def entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.npz"
+
+    def get(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        """Arreglos guardados bajo `key`, o None si no existe o está dañada."""
+        path = self.entry_path(key)
+        try:
+            with np.load(path, allow_pickle=False) as entry:
+                arrays = {name: entry[name] for name in entry.files}
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.warning("cache_entry_discarded", entry=path.name, error=str(e))
+            path.unlink(missing_ok=True)
+            return None
+        os.utime(path)
+        return arrays
+
+    def put(self, key: str, arrays: Dict[str, np.ndarray]) -> None:
+        """Guarda los arreglos bajo `key` y aplica el límite de tamaño."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self.entry_path(key)
+        # Dos trabajos sobre el mismo video escriben la misma clave: cada uno
+        # usa su archivo temporal, que no termina en ".npz" para que `evict`
+        # no lo borre a medio escribir
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}-{uuid4().hex[:8]}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        self.evict()
+
+    def evict(self) -> None:
+        """Elimina las entradas usadas hace más tiempo hasta respetar `max_bytes`."""
+        if not self.cache_dir.exists():
+            return
+        entries = []
+        # Solo las entradas terminadas; los ".tmp" son escrituras en curso
+        for path in self.cache_dir.glob("*.npz"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+class DetectionLog:
+    """Acumula las detecciones crudas de cada frame para guardarlas en la caché."""
+
+    def __init__(self):
+        self._xyxy: list[np.ndarray] = []
+        self._confidence: list[np.ndarray] = []
+        self._class_id: list[np.ndarray] = []
+        self._counts: list[int] = []
+        self.class_names: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def append(self, detections: sv.Detections) -> None:
+        count = len(detections)
+        self._counts.append(count)
+        self._xyxy.append(np.asarray(detections.xyxy, dtype=np.float32).reshape(count, 4))
+        confidence = detections.confidence if detections.confidence is not None \
+            else np.ones(count)
+        self._confidence.append(np.asarray(confidence, dtype=np.float32))
+        class_id = detections.class_id if detections.class_id is not None \
+            else np.full(count, -1)
+        self._class_id.append(np.asarray(class_id, dtype=np.int16))
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Detecciones en formato CSR: filas concatenadas y cantidad por frame."""
+        class_ids = sorted(self.class_names)
+        return {
+            "xyxy": np.concatenate(self._xyxy) if self._xyxy else np.empty((0, 4), np.float32),
+            "confidence": np.concatenate(self._confidence) if self._confidence
+            else np.empty(0, np.float32),
+            "class_id": np.concatenate(self._class_id) if self._class_id
+            else np.empty(0, np.int16),
+            "counts": np.asarray(self._counts, dtype=np.int32),
+            "class_name_ids": np.asarray(class_ids, dtype=np.int32),
+            "class_name_labels": np.asarray([self.class_names[i] for i in class_ids], dtype=str),
+        }
+
+
+class CachedDetections:
+    """Detecciones crudas leídas de la caché, accesibles por número de frame."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.xyxy = arrays["xyxy"]
+        self.confidence = arrays["confidence"]
+        self.class_id = arrays["class_id"]
+        self.offsets = np.concatenate(([0], np.cumsum(arrays["counts"], dtype=np.int64)))
+        self.class_names: Dict[int, str] = {
+            int(i): str(label)
+            for i, label in zip(arrays["class_name_ids"], arrays["class_name_labels"])}
+
+    @property
+    def frame_count(self) -> int:
+        return len(self.offsets) - 1
+
+    def get(self, frame_num: int) -> Optional[sv.Detections]:
+        """Detecciones del frame, o None si el frame no está en la caché."""
+        if not 0 <= frame_num < self.frame_count:
+            return None
+        start, end = self.offsets[frame_num], self.offsets[frame_num + 1]
+        return sv.Detections(
+            xyxy=self.xyxy[start:end].astype(np.float64),
+            confidence=self.confidence[start:end],
+            class_id=self.class_id[start:end].astype(int))
@@ -0,0 +1 @@
+from .inference_roi import InferenceRoi
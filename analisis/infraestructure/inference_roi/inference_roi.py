@@ -0,0 +1,124 @@
+from typing import Optional
+
+import cv2
+import numpy as np
+import supervision as sv
+from cv2.typing import MatLike
+from supervision.config import ORIENTED_BOX_COORDINATES
+from analisis.infraestructure.structured_logging import get_logger
+
+log = get_logger("inference")
+
+
+class InferenceRoi:
+    """
+    Prepara los frames que entran al modelo: los recorta a la región de la
+    cancha y opcionalmente los reduce, para que la inferencia procese menos
+    píxeles. Las cajas detectadas se devuelven a coordenadas del frame
+    original con `restore` antes de llegar a ByteTrack.
+
+    La región es el rectángulo que contiene el cuadrilátero de la cancha
+    (`ViewTransformer.pixel_vertices`) más un margen, para no cortar a los
+    jugadores parados sobre las líneas. Los frames reducidos se escriben en
+    un buffer reservado una vez y reutilizado entre lotes; sin reducción, el
+    recorte es una vista del frame y no copia nada.
+    """
+
+    def __init__(
+            self,
+            polygon: Optional[np.ndarray] = None,
+            margin: float = 0.1,
+            target_size: Optional[int] = None):
+        """
+        Args:
+            polygon (np.ndarray | None): Vértices de la cancha en píxeles,
+                shape (N, 2); None usa el frame completo.
+            margin (float): Margen agregado a cada lado, como fracción del
+                alto y ancho de la región.
+            target_size (int | None): Lado mayor (px) al que se reduce la
+                región; None o un valor mayor que la región no reduce.
+        """
+        self.polygon = None if polygon is None else np.asarray(polygon, dtype=np.float32).reshape(-1, 2)
+        self.margin = margin
+        self.target_size = target_size
+        self._frame_shape: Optional[tuple] = None
+        self._region = (0, 0, 0, 0)
+        self._scale = 1.0
+        self._size = (0, 0)
+        self._buffer: Optional[np.ndarray] = None
+
+    def _configure(self, frame_shape: tuple) -> None:
+        """Calcula región, escala y tamaño de salida para frames de esta forma."""
+        height, width = frame_shape[:2]
+        x0, y0, x1, y1 = 0, 0, width, height
+        if self.polygon is not None:
+            (px0, py0), (px1, py1) = self.polygon.min(axis=0), self.polygon.max(axis=0)
+            pad_x, pad_y = (px1 - px0) * self.margin, (py1 - py0) * self.margin
+            x0, y0 = max(0, int(px0 - pad_x)), max(0, int(py0 - pad_y))
+            x1, y1 = min(width, int(np.ceil(px1 + pad_x))), min(height, int(np.ceil(py1 + pad_y)))
+            if x1 - x0 < 32 or y1 - y0 < 32:
+                # La cancha no cae dentro de este video: se usa el frame completo
+                log.warning("roi_outside_frame", width=width, height=height)
+                x0, y0, x1, y1 = 0, 0, width, height
+
+        crop_width, crop_height = x1 - x0, y1 - y0
+        scale = 1.0
+        if self.target_size and max(crop_width, crop_height) > self.target_size:
+            scale = self.target_size / max(crop_width, crop_height)
+
+        self._frame_shape = tuple(frame_shape)
+        self._region = (x0, y0, x1, y1)
+        self._scale = scale
+        self._size = (max(1, round(crop_width * scale)), max(1, round(crop_height * scale)))
+        self._buffer = None
+
+    @property
+    def region(self) -> tuple:
+        """Región (x0, y0, x1, y1) del último frame preparado."""
+        return self._region
+
+    def prepare(self, frames: list[MatLike]) -> list[MatLike]:
+        """
+        Recorta (y reduce) un lote de frames para el modelo.
+
+        Los frames devueltos son vistas del frame original o del buffer
+        compartido: solo son válidos hasta el siguiente `prepare`.
+        """
+        if not frames:
+            return []
+        if self._frame_shape != frames[0].shape:
+            self._configure(frames[0].shape)
+
+        x0, y0, x1, y1 = self._region
+        crops = [frame[y0:y1, x0:x1] for frame in frames]
+        if self._scale == 1.0:
+            return crops
+
+        width, height = self._size
+        if self._buffer is None or len(self._buffer) < len(frames):
+            self._buffer = np.empty((len(frames), height, width, frames[0].shape[2]), dtype=frames[0].dtype)
+        for crop, target in zip(crops, self._buffer):
+            cv2.resize(crop, (width, height), dst=target, interpolation=cv2.INTER_AREA)
+        return list(self._buffer[:len(frames)])
+
+    def restore(self, detections: sv.Detections) -> sv.Detections:
+        """Pasa las cajas de coordenadas del recorte a las del frame original."""
+        if len(detections) == 0:
+            return detections
+        x0, y0 = self._region[:2]
+        offset = np.array([x0, y0], dtype=np.float32)
+        detections.xyxy = detections.xyxy / self._scale + np.tile(offset, 2)
+        oriented = detections.data.get(ORIENTED_BOX_COORDINATES)
+        if oriented is not None:
+            detections.data[ORIENTED_BOX_COORDINATES] = np.asarray(oriented) / self._scale + offset
+        # Las máscaras están en la resolución del recorte; este servicio no las usa
+        detections.mask = None
+        return detections
+
+    def params(self) -> dict:
+        """Parámetros que cambian las detecciones (para la clave de caché)."""
+        return {
+            "roi_polygon": None if self.polygon is None else self.polygon.round(1).tolist(),
+            "roi_margin": self.margin,
+            "target_size": self.target_size,
+        }
@@ -0,0 +1 @@
+from .metrics_spool import MetricsSpool, empty_totals, merge_totals, render_prometheus
@@ -0,0 +1,203 @@
+import fcntl
+import glob
+import json
+import os
+import re
+import socket
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+from uuid import uuid4
+
+from analisis.infraestructure.structured_logging import get_logger
+
+log = get_logger("metrics")
+
+# Contadores por etapa: (clave en el spool, métrica, descripción)
+SPAN_COUNTERS = (
+    ("calls", "analisis_stage_calls_total", "Spans recorded per stage."),
+    ("wall_s", "analisis_stage_wall_seconds_total", "Wall-clock time spent per stage."),
+    ("cpu_s", "analisis_stage_cpu_seconds_total", "CPU time of the thread running each stage."),
+    ("frames", "analisis_stage_frames_total", "Frames processed per stage."),
+)
+
+# Tiempo que el total de un host recuerda los archivos que ya sumó (ver `MetricsSpool.compact`)
+MERGED_FILES_TTL_S = 60 * 60
+
+
+def empty_totals() -> Dict[str, Any]:
+    return {"jobs": {}, "wall_s": 0.0, "process_cpu_s": 0.0, "peak_rss_mb": 0.0, "spans": {}}
+
+
+def merge_totals(totals: Dict[str, Any], other: Dict[str, Any]) -> Dict[str, Any]:
+    """Suma `other` en `totals` (el pico de RSS se combina con el máximo)."""
+    for status, count in other.get("jobs", {}).items():
+        totals["jobs"][status] = totals["jobs"].get(status, 0) + count
+    totals["wall_s"] += other.get("wall_s", 0.0)
+    totals["process_cpu_s"] += other.get("process_cpu_s", 0.0)
+    totals["peak_rss_mb"] = max(totals["peak_rss_mb"], other.get("peak_rss_mb", 0.0))
+    for name, stats in other.get("spans", {}).items():
+        merged = totals["spans"].setdefault(name, {key: 0 for key, _, _ in SPAN_COUNTERS} | {"peak_rss_mb": 0.0})
+        for key, _, _ in SPAN_COUNTERS:
+            merged[key] += stats.get(key, 0)
+        merged["peak_rss_mb"] = max(merged["peak_rss_mb"], stats.get("peak_rss_mb", 0.0))
+    return totals
+
+
+class MetricsSpool:
+    """
+    Acumulados de los trabajos de todos los procesos worker, para exponerlos
+    desde la API.
+
+    Cada proceso escribe sus contadores en su propio archivo JSON del
+    directorio compartido (`<host>-<pid>-<id>.json`, reemplazo atómico, sin
+    bloqueos entre procesos) y la API los suma al leer. Los archivos de los
+    procesos terminados se suman al total del host (`<host>.total.json`) y
+    se borran, así el directorio no crece con cada reinicio de los workers
+    y los contadores nunca bajan.
+    """
+
+    def __init__(self, spool_dir: str | Path):
+        self.spool_dir = Path(spool_dir)
+        self.host = socket.gethostname()
+        # El id distingue a un proceso nuevo que reutiliza el pid de uno terminado
+        self.path = self.spool_dir / f"{self.host}-{os.getpid()}-{uuid4().hex[:8]}.json"
+        self.host_path = self.spool_dir / f"{self.host}.total.json"
+        self._process_file = re.compile(rf"{re.escape(self.host)}-(\d+)(?:-[0-9a-f]+)?\.json")
+        self._totals = None
+
+    def record_job(self, metrics: Dict[str, Any], status: str) -> None:
+        """
+        Suma las métricas de un trabajo (`StageProfiler.metrics()`) a los
+        contadores del proceso y los guarda.
+
+        Args:
+            metrics (dict): Métricas del trabajo.
+            status (str): Estado final del trabajo (ej: "success", "failure").
+        """
+        if self._totals is None:
+            self._totals = empty_totals()
+        merge_totals(self._totals, {**metrics, "jobs": {status: 1}})
+
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._write(self.path, self._totals)
+        self.compact()
+
+    def compact(self) -> None:
+        """
+        Suma al total del host los archivos de sus procesos terminados y los
+        borra.
+
+        El total guarda qué archivos ya sumó (durante `MERGED_FILES_TTL_S`):
+        un `collect` que leyó un archivo antes de que se borrara no lo cuenta
+        dos veces.
+        """
+        finished = []
+        for path in self.spool_dir.glob(f"{glob.escape(self.host)}-*.json"):
+            match = self._process_file.fullmatch(path.name)
+            if match and path != self.path and not pid_alive(int(match.group(1))):
+                finished.append(path)
+        if not finished:
+            return
+
+        # Los procesos del host compactan de a uno
+        with open(self.spool_dir / f"{self.host}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            totals = self._read(self.host_path) or empty_totals()
+            now = time.time()
+            merged = {name: merged_at for name, merged_at in totals.pop("merged", {}).items()
+                      if now - merged_at < MERGED_FILES_TTL_S}
+            for path in finished:
+                process_totals = self._read(path)
+                if process_totals is None and not path.exists():
+                    # Ya lo sumó otro proceso
+                    continue
+                if process_totals:
+                    merge_totals(totals, process_totals)
+                merged[path.name] = now
+            self._write(self.host_path, {**totals, "merged": merged})
+            for path in finished:
+                path.unlink(missing_ok=True)
+        log.info("metrics_files_compacted", files=len(finished), host=self.host)
+
+    def collect(self) -> Dict[str, Any]:
+        """Suma de los contadores de todos los procesos."""
+        # Los archivos de procesos se leen antes que los totales de host: uno
+        # que se compacta en el medio queda en el total y se descarta acá
+        process_totals = {}
+        for path in sorted(self.spool_dir.glob("*.json")):
+            if not path.name.endswith(".total.json"):
+                process_totals[path.name] = self._read(path)
+
+        totals = empty_totals()
+        for path in sorted(self.spool_dir.glob("*.total.json")):
+            host_totals = self._read(path)
+            if host_totals:
+                for name in host_totals.get("merged", {}):
+                    process_totals.pop(name, None)
+                merge_totals(totals, host_totals)
+        for process in process_totals.values():
+            if process:
+                merge_totals(totals, process)
+        return totals
+
+    @staticmethod
+    def _write(path: Path, totals: Dict[str, Any]) -> None:
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(totals))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read(path: Path) -> Dict[str, Any] | None:
+        try:
+            return json.loads(path.read_text())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.warning("metrics_file_unreadable", file=path.name, error=str(e))
+            return None
+
+
+def pid_alive(pid: int) -> bool:
+    """Si el proceso `pid` de este host sigue corriendo."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Existe, pero es de otro usuario
+        pass
+    return True
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def render_prometheus(totals: Dict[str, Any]) -> str:
+    """Contadores en el formato de texto de Prometheus (versión 0.0.4)."""
+    lines: List[str] = []
+
+    def metric(name: str, kind: str, description: str, samples: List[tuple]) -> None:
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+    metric("analisis_jobs_total", "counter", "Finished analysis jobs by status.",
+           [({"status": status}, count) for status, count in sorted(totals["jobs"].items())])
+    metric("analisis_job_wall_seconds_total", "counter", "Wall-clock time of finished jobs.",
+           [({}, round(totals["wall_s"], 4))])
+    metric("analisis_job_cpu_seconds_total", "counter", "Process CPU time of finished jobs.",
+           [({}, round(totals["process_cpu_s"], 4))])
+    metric("analisis_worker_peak_rss_bytes", "gauge", "Highest RSS seen by a worker during a job.",
+           [({}, int(totals["peak_rss_mb"] * 1024 * 1024))])
+
+    spans = sorted(totals["spans"].items())
+    for key, name, description in SPAN_COUNTERS:
+        metric(name, "counter", description,
+               [({"stage": stage}, round(stats[key], 4)) for stage, stats in spans])
+    metric("analisis_stage_peak_rss_bytes", "gauge", "Highest RSS seen at the end of a stage span.",
+           [({"stage": stage}, int(stats["peak_rss_mb"] * 1024 * 1024)) for stage, stats in spans])
+    return "\n".join(lines) + "\n"
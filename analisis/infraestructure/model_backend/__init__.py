@@ -0,0 +1,3 @@
+from .model_backend import (INFERENCE_BACKENDS, ModelBackendError,
+                            export_onnx, export_openvino, model_file_lock,
+                            resolve_model_path)
@@ -0,0 +1,156 @@
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+from analisis.infraestructure.structured_logging import get_logger
+
+log = get_logger("inference")
+
+# Formatos de inferencia soportados; "torchscript" usa el modelo tal cual
+INFERENCE_BACKENDS = ("torchscript", "onnx", "openvino")
+
+
+class ModelBackendError(Exception):
+    pass
+
+
+def read_torchscript_metadata(model_path: Path) -> dict:
+    """
+    Metadatos de Ultralytics (clases, imgsz, stride, task...) guardados como
+    `config.txt` dentro del archivo TorchScript.
+    """
+    import torch
+
+    extra_files = {"config.txt": ""}
+    torch.jit.load(str(model_path), map_location="cpu", _extra_files=extra_files)
+    if not extra_files["config.txt"]:
+        return {}
+    # Las claves numéricas (ids de clase) vuelven a ser enteros, como en Ultralytics
+    return json.loads(
+        extra_files["config.txt"],
+        object_hook=lambda x: {int(k) if k.isdigit() else k: v for k, v in x.items()})
+
+
+@contextmanager
+def model_file_lock(model_path: Path) -> Iterator[None]:
+    """
+    Bloqueo exclusivo entre procesos sobre los archivos de un modelo
+    (`<modelo>.lock`), para que varios workers que arrancan a la vez no lo
+    descarguen ni lo exporten al mismo tiempo.
+    """
+    model_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(model_path.with_name(model_path.name + ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def is_up_to_date(output_path: Path, source_path: Path) -> bool:
+    return output_path.exists() and output_path.stat().st_mtime >= source_path.stat().st_mtime
+
+
+def export_onnx(model_path: Path, opset: int = 17) -> Path:
+    """
+    Exporta el modelo TorchScript a ONNX con batch dinámico, junto a él.
+
+    Los metadatos de Ultralytics se copian a `metadata_props`, que es donde
+    `YOLO(<modelo>.onnx)` los busca para saber clases y tamaño de entrada.
+
+    Returns:
+        Path: Ruta del `.onnx`; si ya existe y es más nuevo que el origen no
+        se vuelve a exportar.
+    """
+    output_path = model_path.with_suffix(".onnx")
+    if is_up_to_date(output_path, model_path):
+        return output_path
+
+    try:
+        import onnx
+        import torch
+    except ImportError as e:
+        raise ModelBackendError(
+            "INFERENCE_BACKEND=onnx requiere los paquetes 'onnx' y 'onnxruntime'") from e
+
+    log.info("model_export_started", model=model_path.name, backend="onnx")
+    metadata = read_torchscript_metadata(model_path)
+    imgsz = metadata.get("imgsz", [640, 640])
+    model = torch.jit.load(str(model_path), map_location="cpu").eval()
+    dummy = torch.zeros(1, 3, *imgsz)
+
+    # Temporal propio del proceso: un archivo a medio escribir nunca se comparte
+    tmp_path = output_path.with_name(f"{output_path.stem}.{os.getpid()}.tmp.onnx")
+    export_kwargs = dict(
+        input_names=["images"],
+        output_names=["output0"],
+        dynamic_axes={"images": {0: "batch"}, "output0": {0: "batch"}},
+        opset_version=opset)
+    try:
+        # El exportador basado en dynamo no acepta ScriptModules
+        torch.onnx.export(model, dummy, str(tmp_path), dynamo=False, **export_kwargs)
+    except TypeError:
+        torch.onnx.export(model, dummy, str(tmp_path), **export_kwargs)
+
+    onnx_model = onnx.load(str(tmp_path))
+    for key, value in metadata.items():
+        prop = onnx_model.metadata_props.add()
+        prop.key, prop.value = key, str(value)
+    onnx.save(onnx_model, str(tmp_path))
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def export_openvino(model_path: Path) -> Path:
+    """
+    Exporta el modelo a OpenVINO IR (vía ONNX) en `<nombre>_openvino_model/`,
+    el formato de directorio que reconoce Ultralytics.
+
+    Returns:
+        Path: Directorio del modelo OpenVINO.
+    """
+    output_dir = model_path.with_name(f"{model_path.stem}_openvino_model")
+    xml_path = output_dir / f"{model_path.stem}.xml"
+    if is_up_to_date(xml_path, model_path):
+        return output_dir
+
+    try:
+        import openvino as ov
+        import yaml
+    except ImportError as e:
+        raise ModelBackendError("INFERENCE_BACKEND=openvino requiere el paquete 'openvino'") from e
+
+    onnx_path = export_onnx(model_path)
+    log.info("model_export_started", model=onnx_path.name, backend="openvino")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    ov.save_model(ov.convert_model(str(onnx_path)), str(xml_path), compress_to_fp16=False)
+    with open(output_dir / "metadata.yaml", "w") as f:
+        yaml.safe_dump(read_torchscript_metadata(model_path), f, sort_keys=False)
+    return output_dir
+
+
+def resolve_model_path(model_path: Path, backend: str) -> Path:
+    """
+    Ruta del modelo a cargar con YOLO para el backend elegido, exportándolo
+    la primera vez si hace falta. La exportación se hace con el modelo
+    bloqueado (`model_file_lock`): los demás procesos esperan y encuentran
+    el archivo ya exportado.
+
+    Args:
+        model_path (Path): Modelo TorchScript original.
+        backend (str): Uno de `INFERENCE_BACKENDS`.
+    """
+    backend = backend.lower()
+    if backend == "torchscript":
+        return model_path
+    if backend == "onnx":
+        with model_file_lock(model_path):
+            return export_onnx(model_path)
+    if backend == "openvino":
+        with model_file_lock(model_path):
+            return export_openvino(model_path)
+    raise ModelBackendError(
+        f"Backend de inferencia '{backend}' no soportado; opciones: {', '.join(INFERENCE_BACKENDS)}")
@@ -1,10 +1,18 @@
 
-from typing import Dict
+from typing import Dict, NamedTuple
+
+import numpy as np
 from analisis.entities.tracks.track_detail import TrackDetailBase
 from analisis.infraestructure.services.bbox_processor_service import (
     get_center_of_bbox, measure_scalar_distance)
 
 
+class BallAssignment(NamedTuple):
+    player_rows: np.ndarray        # Fila del jugador con el balón por frame, -1 si nadie
+    track_ids: np.ndarray          # track_id del jugador con el balón por frame, -1 si nadie
+    team_ball_control: np.ndarray  # Equipo en posesión por frame (arrastra el último valor)
+
+
 class PlayerBallAssigner():
     def __init__(self):
         self.max_player_ball_distance = 70
@@ -51,3 +59,71 @@ class PlayerBallAssigner():
                     assigned_player = player_id
 
         return assigned_player
+
+    def assign_ball_to_players(
+            self,
+            player_frames: np.ndarray,
+            player_ids: np.ndarray,
+            player_bboxes: np.ndarray,
+            player_teams: np.ndarray,
+            ball_centers: np.ndarray) -> BallAssignment:
+        """
+        Asigna el balón a un jugador en todos los frames del video a la vez.
+
+        Para cada detección de jugador se calcula, por broadcasting, la
+        distancia de sus dos pies (esquinas inferiores del bbox) al centro del
+        balón de su frame. En cada frame gana el jugador más cercano por
+        debajo de `max_player_ball_distance`.
+
+        Parameters
+        ----------
+        player_frames : np.ndarray
+            Frame de cada detección de jugador, shape (N,).
+        player_ids : np.ndarray
+            track_id de cada detección, shape (N,).
+        player_bboxes : np.ndarray
+            Bounding boxes (x1, y1, x2, y2), shape (N, 4).
+        player_teams : np.ndarray
+            Equipo de cada detección, shape (N,).
+        ball_centers : np.ndarray
+            Centro del balón por frame, shape (F, 2); NaN si no hay balón.
+
+        Returns
+        -------
+        BallAssignment
+            Fila y track_id del jugador con el balón por frame, y el equipo en
+            posesión por frame; los frames sin asignación repiten el último
+            equipo conocido (-1 al inicio).
+        """
+        total_frames = len(ball_centers)
+        player_rows = np.full(total_frames, -1, dtype=np.int64)
+
+        in_range = player_frames < total_frames
+        rows = np.flatnonzero(in_range)
+        ball = ball_centers[player_frames[rows]]
+        bboxes = player_bboxes[rows]
+
+        # Pie izquierdo (x1, y2) y derecho (x2, y2) contra el centro del balón
+        feet = np.stack([bboxes[:, [0, 3]], bboxes[:, [2, 3]]], axis=1)
+        distance = np.linalg.norm(feet - ball[:, None, :], axis=2).min(axis=1)
+
+        candidates = distance < self.max_player_ball_distance
+        rows, distance = rows[candidates], distance[candidates]
+        if len(rows):
+            # Por frame, la fila con menor distancia queda primero
+            order = np.lexsort((distance, player_frames[rows]))
+            frames_sorted = player_frames[rows[order]]
+            first = np.r_[True, frames_sorted[1:] != frames_sorted[:-1]]
+            player_rows[frames_sorted[first]] = rows[order[first]]
+
+        assigned = player_rows >= 0
+        track_ids = np.full(total_frames, -1, dtype=np.int64)
+        track_ids[assigned] = player_ids[player_rows[assigned]]
+
+        # Cada frame sin asignación toma el equipo del último frame asignado
+        last_assigned = np.maximum.accumulate(np.where(assigned, np.arange(total_frames), -1))
+        has_previous = last_assigned >= 0
+        team_ball_control = np.full(total_frames, -1, dtype=np.int64)
+        team_ball_control[has_previous] = player_teams[player_rows[last_assigned[has_previous]]]
+
+        return BallAssignment(player_rows, track_ids, team_ball_control)
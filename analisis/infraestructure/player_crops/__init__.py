@@ -0,0 +1,4 @@
+from .player_crops import (CROP_FORMATS, BestCropCollector, CropExport,
+                           CropExporter, PlayerCrop, crop_bbox,
+                           extract_player_images, score_boxes,
+                           sharpness_factor)
@@ -0,0 +1,246 @@
+import pathlib
+import threading
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, NamedTuple, Optional
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+
+# Formato -> (extensión, parámetro de calidad de cv2.imencode)
+CROP_FORMATS = {
+    "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY),
+    "png": (".png", None),
+}
+
+
+class PlayerCrop(NamedTuple):
+    """
+    - frame: Frame del recorte.
+    - image: Recorte BGR (copia, no una vista del frame).
+    - score: Puntaje del recorte; mayor es mejor (ver `BestCropCollector`).
+    """
+    frame: int
+    image: np.ndarray
+    score: float
+
+
+class CropExport(NamedTuple):
+    """
+    - path  : Carpeta de las imágenes, o el archivo .zip.
+    - format: Formato de las imágenes.
+    - count : Imágenes escritas.
+    - bytes : Tamaño total escrito.
+    """
+    path: str
+    format: str
+    count: int
+    bytes: int
+
+
+def crop_bbox(frame: MatLike, bbox) -> MatLike | None:
+    """Recorte de `bbox` dentro del frame (vista, sin copia), o None si la caja no es válida."""
+    if np.isnan(bbox).any():
+        return None
+
+    x1, y1, x2, y2 = map(int, bbox)
+
+    # Validación de límites dentro del frame
+    h, w = frame.shape[:2]
+    x1, y1 = max(0, x1), max(0, y1)
+    x2, y2 = min(w, x2), min(h, y2)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return frame[y1:y2, x1:x2]
+
+
+def score_boxes(bboxes: np.ndarray, frame_shape: tuple) -> np.ndarray:
+    """
+    Puntaje geométrico de cada caja (N, 4), vectorizado: el área en píxeles,
+    reducida hasta un 75% cuanto más cerca del borde del frame está la caja
+    (un jugador cortado por el borde es peor recorte). Las cajas inválidas
+    dan -inf.
+    """
+    bboxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+    height, width = frame_shape[:2]
+    x1 = np.clip(bboxes[:, 0], 0, width)
+    y1 = np.clip(bboxes[:, 1], 0, height)
+    x2 = np.clip(bboxes[:, 2], 0, width)
+    y2 = np.clip(bboxes[:, 3], 0, height)
+    box_width, box_height = x2 - x1, y2 - y1
+    area = box_width * box_height
+
+    # Distancia al borde más cercano, relativa a un cuarto del alto de la caja
+    edge_distance = np.minimum.reduce([x1, y1, width - x2, height - y2])
+    margin = np.maximum(box_height * 0.25, 1.0)
+    edge_factor = 0.25 + 0.75 * np.clip(edge_distance / margin, 0.0, 1.0)
+
+    score = area * edge_factor
+    valid = ~np.isnan(bboxes).any(axis=1) & (box_width >= 1) & (box_height >= 1)
+    return np.where(valid, score, -np.inf)
+
+
+def sharpness_factor(image: MatLike, scale: float = 100.0) -> float:
+    """
+    Nitidez del recorte en (0, 1): varianza del laplaciano del gris,
+    saturada con `scale` (un recorte movido tiene poca varianza).
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    variance = float(cv2.Laplacian(gray, cv2.CV_32F).var())
+    return variance / (variance + scale)
+
+
+class BestCropCollector:
+    """
+    Callback de frame que conserva el mejor recorte de cada jugador mientras
+    se decodifica el video, sin guardar los frames.
+
+    El puntaje de un recorte es `score_boxes` (área y distancia al borde)
+    por `sharpness_factor`. Como la nitidez nunca supera 1, solo se recorta
+    y se mide la nitidez de las cajas cuyo puntaje geométrico supera al
+    mejor puntaje del track hasta el momento; el resto del frame se descarta
+    con una sola operación vectorizada.
+    """
+
+    def __init__(self, min_size: int = 8):
+        self.min_size = min_size
+        self.crops: Dict[int, PlayerCrop] = {}
+
+    def __call__(self, frame_num: int, frame: MatLike, tracks_collection) -> None:
+        rows = tracks_collection.rows_for_frame("players", frame_num)
+        if len(rows) == 0:
+            return
+        player_ids = tracks_collection.get_column("players", "track_id")[rows].tolist()
+        bboxes = tracks_collection.get_column("players", "bbox")[rows]
+
+        scores = score_boxes(bboxes, frame.shape)
+        best = np.fromiter(
+            (self.crops[player_id].score if player_id in self.crops else -np.inf for player_id in player_ids),
+            dtype=np.float64, count=len(player_ids))
+        for i in np.flatnonzero(scores > best).tolist():
+            image = crop_bbox(frame, bboxes[i])
+            if image is None or min(image.shape[:2]) < self.min_size:
+                continue
+            score = float(scores[i]) * sharpness_factor(image)
+            if score > best[i]:
+                self.crops[player_ids[i]] = PlayerCrop(frame_num, image.copy(), score)
+
+    def offer(self, player_id: int, crop: PlayerCrop) -> None:
+        """Suma un recorte elegido en otro lado (p. ej. otro segmento del video)."""
+        current = self.crops.get(player_id)
+        if current is None or crop.score > current.score:
+            self.crops[player_id] = crop
+
+
+class CropExporter:
+    """
+    Codifica y escribe los recortes en segundo plano.
+
+    La codificación (`cv2.imencode`, que libera el GIL) se reparte en un
+    pool de hilos; `write_async` vuelve enseguida y el trabajo sigue
+    mientras corren las etapas siguientes del análisis. Cada escritura va a
+    su propia carpeta `<output_folder>/<name>`, o con `archive=True` a un
+    único `<output_folder>/<name>.zip` (sin recomprimir: JPEG y WebP ya
+    están comprimidos), en lugar de un archivo por jugador.
+    """
+
+    def __init__(
+            self,
+            output_folder: str,
+            format: str = "jpeg",
+            quality: int = 90,
+            workers: int = 4,
+            archive: bool = False):
+        if format not in CROP_FORMATS:
+            raise ValueError(f"Formato de recorte '{format}' no soportado: {', '.join(CROP_FORMATS)}")
+        self.folder = pathlib.Path(output_folder)
+        self.format = format
+        self.quality = quality
+        self.archive = archive
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="crop-encoder")
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+    def encode(self, image: MatLike) -> Optional[bytes]:
+        extension, quality_param = CROP_FORMATS[self.format]
+        params = [quality_param, self.quality] if quality_param is not None else []
+        ok, encoded = cv2.imencode(extension, image, params)
+        return encoded.tobytes() if ok else None
+
+    def file_name(self, player_id: int, crop: PlayerCrop) -> str:
+        return f"player_{player_id}_frame_{crop.frame}{CROP_FORMATS[self.format][0]}"
+
+    def write_async(self, crops: Dict[int, PlayerCrop], name: str = "players") -> Future:
+        """
+        Empieza a escribir los recortes y devuelve un Future con el `CropExport`.
+
+        Args:
+            crops (dict): Recorte por track_id.
+            name (str): Nombre de la carpeta, o del .zip cuando `archive` está
+                activo; cada trabajo usa el suyo.
+        """
+        crops = dict(crops)
+        result: Future = Future()
+
+        def run() -> None:
+            try:
+                result.set_result(self.write(crops, name))
+            except BaseException as e:
+                result.set_exception(e)
+
+        threading.Thread(target=run, name="crop-export", daemon=True).start()
+        return result
+
+    def write(self, crops: Dict[int, PlayerCrop], name: str = "players") -> CropExport:
+        """Versión bloqueante de `write_async`."""
+        player_ids = sorted(crops)
+        encoded = self._executor.map(lambda player_id: self.encode(crops[player_id].image), player_ids)
+
+        count = total_bytes = 0
+        if self.archive:
+            self.folder.mkdir(parents=True, exist_ok=True)
+            path = self.folder / f"{name}.zip"
+            tmp_path = path.with_name(path.name + ".tmp")
+            with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_STORED) as bundle:
+                for player_id, data in zip(player_ids, encoded):
+                    if data is None:
+                        continue
+                    bundle.writestr(self.file_name(player_id, crops[player_id]), data)
+                    count += 1
+                    total_bytes += len(data)
+            tmp_path.replace(path)
+            return CropExport(str(path), self.format, count, path.stat().st_size)
+
+        folder = self.folder / name
+        folder.mkdir(parents=True, exist_ok=True)
+
+        def write_file(player_id: int, data: Optional[bytes]) -> int:
+            if data is None:
+                return -1
+            (folder / self.file_name(player_id, crops[player_id])).write_bytes(data)
+            return len(data)
+
+        for size in self._executor.map(write_file, player_ids, encoded):
+            if size >= 0:
+                count += 1
+                total_bytes += size
+        return CropExport(str(folder), self.format, count, total_bytes)
+
+
+def extract_player_images(
+        video_frames: Iterable[MatLike],
+        tracks_collection,
+        output_folder: str,
+        format: str = "jpeg") -> CropExport:
+    """Mejor recorte de cada jugador de un video ya trackeado, en una pasada sobre los frames."""
+    collector = BestCropCollector()
+    for frame_num, frame in enumerate(video_frames):
+        collector(frame_num, frame, tracks_collection)
+    exporter = CropExporter(output_folder, format=format)
+    try:
+        return exporter.write(collector.crops)
+    finally:
+        exporter.close()
@@ -0,0 +1 @@
+from .result_writer import RESULT_COMPRESSIONS, RESULT_FORMATS, ResultFile, ResultWriter
@@ -0,0 +1,136 @@
+import os
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import polars as pl
+
+from analisis.entities.collection.track_collection import TrackCollection
+from analisis.entities.utils.json_transform import write_tracks_json
+
+RESULT_FORMATS = ("parquet", "arrow", "json")
+# Formato -> compresiones que acepta polars; el JSON se escribe sin comprimir
+RESULT_COMPRESSIONS = {
+    "parquet": ("zstd", "lz4", "snappy", "gzip", "brotli", "uncompressed"),
+    "arrow": ("zstd", "lz4", "uncompressed"),
+    "json": None,
+}
+
+# Columna de TrackColumns -> nombres de las columnas de salida
+VECTOR_COLUMNS = {
+    "bbox": ("x1", "y1", "x2", "y2"),
+    "position": ("x", "y"),
+    "position_adjusted": ("x_adjusted", "y_adjusted"),
+    "position_transformed": ("x_m", "y_m"),
+}
+SCALAR_COLUMNS = {
+    "speed": "speed_km_h",
+    "distance": "distance_m",
+}
+
+
+class ResultFile(NamedTuple):
+    """
+    - path  : Ruta del archivo escrito.
+    - format: "parquet", "arrow" (Arrow IPC / Feather v2) o "json".
+    - rows  : Filas (detecciones) escritas.
+    - bytes : Tamaño del archivo.
+    """
+    path: str
+    format: str
+    rows: int
+    bytes: int
+
+
+class ResultWriter:
+    """
+    Escribe los tracks de un análisis como una tabla de detecciones, una
+    fila por (entidad, frame, track), en Parquet o Arrow IPC.
+
+    Las columnas salen tipadas directamente de los arreglos de
+    `TrackColumns`, sin pasar por objetos por detección: enteros chicos
+    donde alcanzan, Float32 para coordenadas y `entity` como Enum
+    (codificado por diccionario). Los valores faltantes (NaN, -1) se
+    escriben como nulos.
+
+    El formato "json" mantiene la estructura anidada de `player_frames_to_json`
+    ({"players": {frame: {track_id: {...}}}, "ball": {...}}) para clientes
+    que aún la esperan; se escribe en streaming con `write_tracks_json`.
+    """
+
+    def __init__(self, output_dir: str | Path, format: str = "parquet", compression: str = "zstd"):
+        format = format.lower()
+        if format not in RESULT_FORMATS:
+            raise ValueError(
+                f"Formato de resultado '{format}' no soportado; opciones: {', '.join(RESULT_FORMATS)}")
+        # Un códec que el formato no admite fallaría recién al escribir, al final del análisis
+        compression = compression.lower()
+        compressions = RESULT_COMPRESSIONS[format]
+        if compressions is not None and compression not in compressions:
+            raise ValueError(
+                f"Compresión '{compression}' no soportada por el formato '{format}'; "
+                f"opciones: {', '.join(compressions)}")
+        self.output_dir = Path(output_dir)
+        self.format = format
+        self.compression = compression
+
+    def to_frame(self, tracks_collection: TrackCollection) -> pl.DataFrame:
+        """Tabla de detecciones de todas las entidades, ordenada por frame."""
+        entities = list(tracks_collection.columns)
+        entity_type = pl.Enum(entities)
+        tables = []
+        for entity in entities:
+            columns = tracks_collection.columns[entity]
+            series = [
+                pl.Series("entity", [entity] * len(columns), dtype=entity_type),
+                pl.Series("frame", columns.column("frame"), dtype=pl.Int32),
+                pl.Series("track_id", columns.column("track_id"), dtype=pl.Int32),
+                pl.Series("class_id", columns.column("class_id"), dtype=pl.Int16),
+            ]
+            for name, names in VECTOR_COLUMNS.items():
+                values = columns.column(name)
+                series.extend(
+                    pl.Series(output, np.ascontiguousarray(values[:, i]), dtype=pl.Float32, nan_to_null=True)
+                    for i, output in enumerate(names))
+            for name, output in SCALAR_COLUMNS.items():
+                series.append(pl.Series(output, columns.column(name), dtype=pl.Float32, nan_to_null=True))
+            series.append(pl.Series("team", columns.column("team"), dtype=pl.Int8))
+            series.append(pl.Series("has_ball", columns.column("has_ball"), dtype=pl.Boolean))
+            tables.append(pl.DataFrame(series))
+
+        table = pl.concat(tables) if tables else pl.DataFrame()
+        if table.is_empty():
+            return table
+        return (table
+                .with_columns(
+                    pl.when(pl.col(name) >= 0).then(pl.col(name)).alias(name)
+                    for name in ("class_id", "team"))
+                .sort("frame", "entity", "track_id", maintain_order=True))
+
+    def write(self, tracks_collection: TrackCollection, name: str) -> ResultFile:
+        """
+        Escribe la tabla en `<output_dir>/<name>.<parquet|arrow|json>`. El archivo
+        se escribe con otro nombre y se renombra al final, para que nunca se
+        lea a medio escribir.
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_dir / f"{name}.{self.format}"
+        tmp_path = path.with_name(f".{path.name}.tmp")
+
+        if self.format == "json":
+            with open(tmp_path, "wb") as f:
+                write_tracks_json(tracks_collection, f)
+            rows = sum(len(columns) for columns in tracks_collection.columns.values())
+        else:
+            table = self.to_frame(tracks_collection)
+            if self.format == "parquet":
+                table.write_parquet(tmp_path, compression=self.compression, statistics=True)
+            else:
+                table.write_ipc(tmp_path, compression=self.compression)
+            rows = table.height
+        os.replace(tmp_path, path)
+        return ResultFile(
+            path=str(path.resolve()),
+            format=self.format,
+            rows=rows,
+            bytes=path.stat().st_size)
@@ -0,0 +1,5 @@
+from .segment_stitching import (TRACK_COLUMNS, Segment, SegmentTracks,
+                                StitchedTracks, TrackStitcher,
+                                match_track_ids, plan_segments,
+                                segment_tracks_from_arrays,
+                                segment_tracks_to_arrays)
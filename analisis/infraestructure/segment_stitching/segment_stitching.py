@@ -0,0 +1,237 @@
+from collections import Counter
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import supervision as sv
+from analisis.infraestructure.player_crops import PlayerCrop
+
+# Columnas que produce el tracking de cada segmento
+TRACK_COLUMNS = ("frame", "track_id", "bbox")
+
+
+class Segment(NamedTuple):
+    """
+    Rango de frames que analiza un proceso.
+
+    - index     : Posición del segmento en el video.
+    - start     : Primer frame decodificado (incluye el solape con el anterior).
+    - core_start: Primer frame que le pertenece; los anteriores solo sirven
+                  para que ByteTrack y la cámara arranquen y para unir los IDs.
+    - stop      : Frame final (excluido); None en el último, que lee hasta el final.
+    """
+    index: int
+    start: int
+    core_start: int
+    stop: Optional[int]
+
+
+class SegmentTracks(NamedTuple):
+    """
+    Resultado del preprocesamiento de un segmento, en frames absolutos.
+
+    - segment        : Segmento analizado.
+    - tracks         : Por tipo de entidad, arreglos `TRACK_COLUMNS` con los IDs
+                       locales del ByteTrack del segmento.
+    - camera_movement: Movimiento de cámara desde `segment.start`, shape (frames, 2).
+    - player_colors  : Color de camiseta por ID local.
+    - player_crops   : Mejor recorte por ID local (`PlayerCrop`).
+    - detected_frames: Frames que pasaron por el detector.
+    - timing         : Mediciones de `StageProfiler` del proceso del segmento.
+    """
+    segment: Segment
+    tracks: Dict[str, Dict[str, np.ndarray]]
+    camera_movement: np.ndarray
+    player_colors: Dict[int, np.ndarray]
+    player_crops: Dict[int, PlayerCrop]
+    detected_frames: int
+    timing: dict
+
+
+class StitchedTracks(NamedTuple):
+    """
+    - tracks         : Por tipo de entidad, filas de todo el video con IDs globales.
+    - camera_movement: Movimiento de cámara de cada frame del video.
+    - id_maps        : Por segmento, ID local -> ID global; no incluye los
+                       tracks que solo aparecen en el solape y no se unieron.
+    """
+    tracks: Dict[str, Dict[str, np.ndarray]]
+    camera_movement: np.ndarray
+    id_maps: List[Dict[int, int]]
+
+
+def plan_segments(frame_count: int, segments: int, overlap: int) -> List[Segment]:
+    """
+    Divide [0, frame_count) en `segments` rangos contiguos del mismo largo;
+    cada uno, salvo el primero, empieza `overlap` frames antes de su parte.
+    """
+    segments = max(1, min(segments, frame_count // max(1, 2 * overlap) or 1))
+    bounds = np.linspace(0, frame_count, segments + 1).round().astype(int)
+    return [
+        Segment(
+            index=index,
+            start=max(0, int(bounds[index]) - overlap) if index else 0,
+            core_start=int(bounds[index]),
+            stop=int(bounds[index + 1]) if index < segments - 1 else None)
+        for index in range(segments)
+    ]
+
+
+def match_track_ids(
+        previous: Dict[str, np.ndarray],
+        current: Dict[str, np.ndarray],
+        iou_threshold: float = 0.5) -> Dict[int, int]:
+    """
+    Empareja los IDs de dos segmentos con las cajas de los frames que ambos
+    analizaron: en cada frame se asocian las cajas por IoU (voraz, de mayor a
+    menor) y cada par (anterior, actual) suma un voto. Gana el par con más
+    votos, uno a uno.
+
+    Returns:
+        Dict[int, int]: ID del segmento actual -> ID del segmento anterior.
+    """
+    shared_frames = np.intersect1d(previous["frame"], current["frame"])
+    votes: Counter = Counter()
+    for frame_num in shared_frames:
+        previous_rows = np.flatnonzero(previous["frame"] == frame_num)
+        current_rows = np.flatnonzero(current["frame"] == frame_num)
+        iou = sv.box_iou_batch(previous["bbox"][previous_rows], current["bbox"][current_rows])
+        while iou.size:
+            i, j = np.unravel_index(np.argmax(iou), iou.shape)
+            if iou[i, j] < iou_threshold:
+                break
+            votes[(int(previous["track_id"][previous_rows[i]]), int(current["track_id"][current_rows[j]]))] += 1
+            iou[i, :] = -1
+            iou[:, j] = -1
+
+    mapping: Dict[int, int] = {}
+    used = set()
+    for (previous_id, current_id), _ in votes.most_common():
+        if current_id not in mapping and previous_id not in used:
+            mapping[current_id] = previous_id
+            used.add(previous_id)
+    return mapping
+
+
+class TrackStitcher:
+    """
+    Une los tracks de segmentos analizados por separado en los de un único
+    video, como si lo hubiera recorrido un solo ByteTrack.
+
+    Cada segmento aporta solo sus frames propios (desde `core_start`). Los
+    IDs se reconcilian con los frames de solape, que el segmento anterior
+    también analizó; los tracks sin pareja reciben un ID global nuevo. Los
+    tipos de entidad en `fixed_ids` (el balón, siempre ID 1) no se remapean.
+
+    El movimiento de cámara es relativo al frame anterior: con al menos un
+    frame de solape el primer frame propio de cada segmento ya tiene su
+    desplazamiento real, así que los tramos se encadenan uno tras otro.
+    """
+
+    def __init__(self, iou_threshold: float = 0.5, fixed_ids=("ball",)):
+        self.iou_threshold = iou_threshold
+        self.fixed_ids = set(fixed_ids)
+
+    def stitch(self, segments: List[SegmentTracks]) -> StitchedTracks:
+        segments = sorted(segments, key=lambda result: result.segment.index)
+        entity_types = sorted({entity_type for result in segments for entity_type in result.tracks})
+
+        id_maps: List[Dict[int, int]] = []
+        next_id = 1
+        previous: Optional[SegmentTracks] = None
+        for result in segments:
+            players = result.tracks.get("players", _empty_tracks())
+            mapping: Dict[int, int] = {}
+            if previous is not None:
+                matched = match_track_ids(
+                    previous.tracks.get("players", _empty_tracks()), players, self.iou_threshold)
+                mapping = {current_id: id_maps[-1][previous_id]
+                           for current_id, previous_id in matched.items()}
+            # Tracks seen only in the overlap belong to the previous segment
+            owned = players["frame"] >= result.segment.core_start
+            for local_id in np.unique(players["track_id"][owned]).tolist():
+                if local_id not in mapping:
+                    mapping[local_id] = next_id
+                    next_id += 1
+                next_id = max(next_id, mapping[local_id] + 1)
+            id_maps.append(mapping)
+            previous = result
+
+        tracks = {}
+        for entity_type in entity_types:
+            parts = {name: [] for name in TRACK_COLUMNS}
+            for result, mapping in zip(segments, id_maps):
+                columns = result.tracks.get(entity_type, _empty_tracks())
+                owned = columns["frame"] >= result.segment.core_start
+                track_ids = columns["track_id"][owned]
+                if entity_type not in self.fixed_ids and len(track_ids):
+                    track_ids = np.vectorize(mapping.__getitem__, otypes=[np.int64])(track_ids)
+                parts["frame"].append(columns["frame"][owned])
+                parts["track_id"].append(track_ids)
+                parts["bbox"].append(columns["bbox"][owned])
+            tracks[entity_type] = {
+                "frame": np.concatenate(parts["frame"]).astype(np.int64),
+                "track_id": np.concatenate(parts["track_id"]).astype(np.int64),
+                "bbox": np.vstack(parts["bbox"]).astype(np.float32).reshape(-1, 4),
+            }
+
+        camera_movement = np.vstack([
+            result.camera_movement[result.segment.core_start - result.segment.start:]
+            for result in segments
+        ]).astype(np.float32).reshape(-1, 2) if segments else np.empty((0, 2), dtype=np.float32)
+        return StitchedTracks(tracks=tracks, camera_movement=camera_movement, id_maps=id_maps)
+
+
+def _empty_tracks() -> Dict[str, np.ndarray]:
+    return {
+        "frame": np.empty(0, dtype=np.int64),
+        "track_id": np.empty(0, dtype=np.int64),
+        "bbox": np.empty((0, 4), dtype=np.float32),
+    }
+
+
+def segment_tracks_to_arrays(result: SegmentTracks) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """
+    `SegmentTracks` como arreglos planos ("tracks/players/bbox", ...) y
+    metadatos JSON, para guardarlo en disco con `CheckpointStore` en lugar
+    de mandarlo por el backend de resultados de Celery.
+    """
+    arrays: Dict[str, np.ndarray] = {"camera_movement": np.asarray(result.camera_movement)}
+    for entity_type, columns in result.tracks.items():
+        for name, values in columns.items():
+            arrays[f"tracks/{entity_type}/{name}"] = np.asarray(values)
+
+    # En el orden en que se vieron: el agrupamiento de equipos depende de él
+    player_ids = list(result.player_colors)
+    arrays["player_colors/ids"] = np.asarray(player_ids, dtype=np.int64)
+    arrays["player_colors/colors"] = np.asarray(
+        [result.player_colors[player_id] for player_id in player_ids], dtype=np.float64).reshape(-1, 3)
+
+    # Cada recorte tiene su tamaño: uno por arreglo
+    crops = {}
+    for player_id, crop in result.player_crops.items():
+        arrays[f"player_crops/{player_id}"] = crop.image
+        crops[str(player_id)] = [crop.frame, crop.score]
+
+    meta = {
+        "segment": list(result.segment),
+        "entities": sorted(result.tracks),
+        "player_crops": crops,
+        "detected_frames": result.detected_frames,
+        "timing": result.timing,
+    }
+    return arrays, meta
+
+
+def segment_tracks_from_arrays(arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> SegmentTracks:
+    """Inversa de `segment_tracks_to_arrays`."""
+    return SegmentTracks(
+        segment=Segment(*meta["segment"]),
+        tracks={entity_type: {name: arrays[f"tracks/{entity_type}/{name}"] for name in TRACK_COLUMNS}
+                for entity_type in meta["entities"]},
+        camera_movement=arrays["camera_movement"],
+        player_colors=dict(zip(arrays["player_colors/ids"].tolist(), arrays["player_colors/colors"])),
+        player_crops={int(player_id): PlayerCrop(frame_num, arrays[f"player_crops/{player_id}"], score)
+                      for player_id, (frame_num, score) in meta["player_crops"].items()},
+        detected_frames=meta["detected_frames"],
+        timing=meta["timing"],
+    )
@@ -1,7 +1,13 @@
+from .annotation_service import blend_rectangle, cumulative_ball_control
 from .bbox_processor_service import (get_bbox_width, get_center_of_bbox,
                                      get_foot_position,
                                      measure_scalar_distance,
                                      measure_vectorial_distance,
                                      rectangle_coords)
-from .video_processing_service import read_video, save_video
-from .utils import read_stub, save_stub
\ No newline at end of file
+from .pipeline_service import prefetch
+from .video_processing_service import (AsyncVideoWriter, VideoInfo,
+                                       VideoSource, get_video_info,
+                                       iter_frame_batches, open_capture,
+                                       read_frame_range, read_frames,
+                                       read_video, save_video, stream_video,
+                                       write_video)
@@ -0,0 +1,53 @@
+from typing import Sequence, Tuple
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+
+
+def blend_rectangle(
+        frame: MatLike,
+        top_left: Tuple[int, int],
+        bottom_right: Tuple[int, int],
+        color: Sequence[int],
+        alpha: float) -> MatLike:
+    """
+    Dibuja un rectángulo semitransparente sobre el frame, en el lugar.
+
+    Solo mezcla la región del rectángulo (recortada al frame), en lugar de
+    copiar y mezclar el frame completo; fuera del rectángulo el resultado es
+    el mismo.
+    """
+    height, width = frame.shape[:2]
+    x1, y1 = max(0, top_left[0]), max(0, top_left[1])
+    x2, y2 = min(width, bottom_right[0] + 1), min(height, bottom_right[1] + 1)
+    if x2 <= x1 or y2 <= y1:
+        return frame
+    region = frame[y1:y2, x1:x2]
+    overlay = np.empty_like(region)
+    overlay[:] = color
+    cv2.addWeighted(overlay, alpha, region, 1 - alpha, 0, region)
+    return frame
+
+
+def cumulative_ball_control(team_ball_control: np.ndarray, teams: Sequence[int] = (1, 2)) -> np.ndarray:
+    """
+    Porcentaje de posesión acumulado de cada equipo hasta cada frame.
+
+    Se calcula una sola vez con sumas acumuladas, así dibujar la posesión de
+    un frame no vuelve a recorrer los frames anteriores.
+
+    Args:
+        team_ball_control (np.ndarray): Equipo en posesión por frame (-1 sin posesión).
+        teams (Sequence[int]): Equipos a contar.
+
+    Returns:
+        np.ndarray: (frames, len(teams)) con la fracción de cada equipo sobre
+        los frames con posesión hasta ese frame inclusive; 0 mientras ningún
+        equipo tuvo la pelota.
+    """
+    team_ball_control = np.asarray(team_ball_control)
+    counts = np.stack(
+        [np.cumsum(team_ball_control == team) for team in teams], axis=1).astype(np.float64)
+    total = counts.sum(axis=1, keepdims=True)
+    return np.divide(counts, total, out=np.zeros_like(counts), where=total > 0)
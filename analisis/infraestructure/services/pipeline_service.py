@@ -0,0 +1,76 @@
+import queue
+import threading
+from typing import Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+def prefetch(items: Iterable[T], lookahead: int, name: str = "prefetch") -> Iterator[T]:
+    """
+    Consume un iterable en un hilo aparte y entrega sus elementos en orden.
+
+    Permite encadenar etapas que se solapan (decodificar, inferir, seguir):
+    el hilo productor nunca va más de `lookahead` elementos por delante del
+    consumidor, así que la memoria queda acotada. Las excepciones del
+    productor se relanzan en el consumidor, y si el consumidor deja de
+    iterar el productor se detiene.
+
+    Args:
+        items (Iterable[T]): Elementos a producir; se iteran en el hilo.
+        lookahead (int): Máximo de elementos producidos en espera.
+        name (str): Nombre del hilo, útil al depurar.
+
+    Yields:
+        T: Los elementos de `items` en el mismo orden.
+    """
+    items_queue: queue.Queue = queue.Queue(maxsize=max(1, lookahead))
+    stop = threading.Event()
+    end_of_stream = object()
+
+    class ProducerError:
+        def __init__(self, error: BaseException):
+            self.error = error
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        iterator = iter(items)
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+        except BaseException as e:  # Se propaga al consumidor
+            put(ProducerError(e))
+            return
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None and stop.is_set():
+                close()
+        put(end_of_stream)
+
+    producer = threading.Thread(target=produce, name=name, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = items_queue.get()
+            if item is end_of_stream:
+                break
+            if isinstance(item, ProducerError):
+                error, item = item.error, None
+                try:
+                    raise error
+                finally:
+                    # Evita el ciclo excepción -> traceback -> este frame, que
+                    # mantendría vivas las etapas anteriores hasta el próximo GC
+                    del error
+            yield item
+    finally:
+        stop.set()
+        producer.join()
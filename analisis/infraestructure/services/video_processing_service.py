@@ -1,9 +1,62 @@
+import io
 import pathlib
-from typing import List
+import queue
+import threading
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Tuple, Union
 
 import cv2
 from cv2.typing import MatLike
 
+from analisis.infraestructure.stage_profiler import StageProfiler
+
+from .pipeline_service import prefetch
+
+
+# Ruta de archivo o stream binario con read/seek (p. ej. una descarga en curso)
+VideoSource = Union[str, io.BufferedIOBase]
+
+
+def open_capture(source: VideoSource) -> cv2.VideoCapture:
+    """
+    Abre un `cv2.VideoCapture` desde una ruta o desde un stream binario.
+
+    Los streams se leen con el backend FFmpeg (OpenCV >= 4.10), lo que permite
+    decodificar un archivo que todavía se está descargando.
+    """
+    if isinstance(source, io.BufferedIOBase):
+        return cv2.VideoCapture(source, cv2.CAP_FFMPEG, [])
+    return cv2.VideoCapture(source)
+
+
+class VideoInfo(NamedTuple):
+    fps: float
+    width: int
+    height: int
+    frame_count: int
+
+
+def get_video_info(video_path: VideoSource, default_fps: float = 24.0) -> VideoInfo:
+    """
+    Lee las propiedades del contenedor de video sin decodificar frames.
+
+    Args:
+        video_path (VideoSource): Ruta del archivo de video o stream binario.
+        default_fps (float): FPS a usar si el contenedor no los informa.
+
+    Returns:
+        VideoInfo: FPS, ancho, alto y número de frames declarados.
+    """
+    cap = open_capture(video_path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        return VideoInfo(
+            fps=fps if fps and fps > 0 else default_fps,
+            width=int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            height=int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            frame_count=int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+    finally:
+        cap.release()
+
 
 def read_video(video_path: str) -> list[MatLike]:
     cap = cv2.VideoCapture(video_path)
@@ -16,57 +69,193 @@ def read_video(video_path: str) -> list[MatLike]:
     return frames
 
 
-def save_video(ouput_video_frames, output_video_path: str):
-    folder = pathlib.Path(output_video_path).parent
-    if not folder.exists():
+def read_frames(video_path: VideoSource) -> Iterator[MatLike]:
+    """Decodifica el video en el hilo actual, frame a frame."""
+    profiler = StageProfiler()
+    cap = open_capture(video_path)
+    try:
+        while True:
+            with profiler.span("decode") as span:
+                ret, frame = cap.read()
+                span.frames = int(ret)
+            if not ret:
+                break
+            yield frame
+    finally:
+        cap.release()
+
+
+def read_frame_range(video_path: str, start: int = 0, stop: int | None = None) -> Iterator[MatLike]:
+    """
+    Decodifica los frames [start, stop) de un archivo, en el hilo actual.
+
+    Se posiciona en `start` con `CAP_PROP_POS_FRAMES`; si el contenedor no
+    permite saltar a ese frame, avanza desde el principio sin decodificar
+    (`grab`). Con `stop` None lee hasta el final.
+    """
+    profiler = StageProfiler()
+    cap = open_capture(video_path)
+    try:
+        if start > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != start:
+                cap.release()
+                cap = open_capture(video_path)
+                for _ in range(start):
+                    if not cap.grab():
+                        return
+        frame_num = start
+        while stop is None or frame_num < stop:
+            with profiler.span("decode") as span:
+                ret, frame = cap.read()
+                span.frames = int(ret)
+            if not ret:
+                break
+            yield frame
+            frame_num += 1
+    finally:
+        cap.release()
+
+
+def stream_video(video_path: VideoSource, lookahead: int = 32) -> Iterator[MatLike]:
+    """
+    Decodifica el video en un hilo aparte y entrega los frames en orden.
+
+    El hilo decodificador nunca va más de `lookahead` frames por delante del
+    consumidor, así que la memoria usada depende de ese valor y no de la
+    duración del video. Si el consumidor deja de iterar, el hilo se detiene.
+
+    Args:
+        video_path (VideoSource): Ruta del archivo de video o stream binario.
+        lookahead (int): Máximo de frames decodificados en espera.
+
+    Yields:
+        MatLike: Frames BGR en orden de aparición.
+    """
+    return prefetch(read_frames(video_path), lookahead, name="video-decoder")
+
+
+def iter_frame_batches(
+        frames: Iterable[MatLike],
+        batch_size: int | Callable[[], int]) -> Iterator[Tuple[int, List[MatLike]]]:
+    """
+    Agrupa un iterable de frames en lotes consecutivos.
+
+    Args:
+        frames (Iterable[MatLike]): Frames en orden (lista o stream).
+        batch_size (int | Callable[[], int]): Tamaño máximo de cada lote, o una
+            función que lo devuelve y se consulta al armar cada lote.
+
+    Yields:
+        Tuple[int, List[MatLike]]: Número del primer frame del lote y el lote.
+    """
+    current_size = batch_size if callable(batch_size) else lambda: batch_size
+    batch: List[MatLike] = []
+    start_frame = 0
+    for frame in frames:
+        batch.append(frame)
+        if len(batch) >= current_size():
+            yield start_frame, batch
+            start_frame += len(batch)
+            batch = []
+    if batch:
+        yield start_frame, batch
+
+
+class AsyncVideoWriter:
+    """
+    Escribe frames en un archivo de video desde un hilo aparte.
+
+    `write` solo encola el frame y vuelve: la codificación (`cv2.VideoWriter`,
+    que libera el GIL) se solapa con el dibujo del frame siguiente. La cola
+    tiene `queue_size` lugares, así la memoria no depende de la duración del
+    video. Un error del hilo escritor se relanza en el siguiente `write` o en
+    `close`.
+    """
+
+    def __init__(
+            self,
+            output_video_path: str,
+            fps: float,
+            frame_size: Tuple[int, int],
+            fourcc: str = "XVID",
+            queue_size: int = 16):
+        folder = pathlib.Path(output_video_path).parent
         folder.mkdir(parents=True, exist_ok=True)
+        self.path = str(output_video_path)
+        self.frames = 0
+        self._writer = cv2.VideoWriter(self.path, cv2.VideoWriter.fourcc(*fourcc), fps, frame_size)
+        if not self._writer.isOpened():
+            raise OSError(f"No se pudo abrir el video de salida {self.path} ({fourcc})")
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._run, name="video-encoder", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        profiler = StageProfiler()
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            if self._error is not None:
+                continue  # Se descarta lo que queda hasta el cierre
+            try:
+                with profiler.span("encode", frames=1):
+                    self._writer.write(frame)
+            except BaseException as e:
+                self._error = e
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def write(self, frame: MatLike) -> None:
+        """Encola un frame; el frame no debe modificarse después."""
+        self._raise_error()
+        self._queue.put(frame)
+        self.frames += 1
+
+    def close(self) -> None:
+        """Espera a que se escriban los frames encolados y cierra el archivo."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._writer.release()
+        self._raise_error()
+
+    def __enter__(self) -> "AsyncVideoWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def write_video(
+        frames: Iterable[MatLike],
+        output_video_path: str,
+        fps: float,
+        fourcc: str = "XVID") -> int:
+    """
+    Codifica los frames en un archivo a medida que llegan (ver `AsyncVideoWriter`),
+    sin juntarlos en memoria. El tamaño del video es el del primer frame.
+
+    Returns:
+        int: Frames escritos.
+    """
+    frames = iter(frames)
+    first_frame = next(frames, None)
+    if first_frame is None:
+        return 0
+    size = (first_frame.shape[1], first_frame.shape[0])
+    with AsyncVideoWriter(output_video_path, fps, size, fourcc) as writer:
+        writer.write(first_frame)
+        for frame in frames:
+            writer.write(frame)
+    return writer.frames
+
 
-    fourcc = cv2.VideoWriter.fourcc(*'XVID')
-    out = cv2.VideoWriter(
-        output_video_path,
-        fourcc,
-        24,
-        (ouput_video_frames[0].shape[1],
-         ouput_video_frames[0].shape[0]))
-    for frame in ouput_video_frames:
-        out.write(frame)
-    out.release()
-    
-def extract_player_images(
-    video_frames: List[MatLike],
-    tracks_collection,
-    output_folder: str
-):
-    folder = pathlib.Path(output_folder)
-    folder.mkdir(parents=True, exist_ok=True)
-
-    saved_ids = set() 
-
-    for frame_num, player_track in tracks_collection.tracks["players"].items():
-        for player_id, track in player_track.items():
-            if player_id in saved_ids:
-                continue
-
-            bbox = track.bbox
-            if bbox is None or len(bbox) != 4:
-                continue  # Evita errores si el bbox no es válido
-
-            x1, y1, x2, y2 = map(int, bbox)
-
-            # Validación de límites dentro del frame
-            frame = video_frames[int(frame_num)]
-            h, w = frame.shape[:2]
-            x1, y1 = max(0, x1), max(0, y1)
-            x2, y2 = min(w, x2), min(h, y2)
-            if x2 <= x1 or y2 <= y1:
-                continue  # Bounding box inválido
-
-            # Recorte del jugador
-            player_image = frame[y1:y2, x1:x2]
-
-            # Guardar imagen
-            player_image_path = folder / f"player_{player_id}_frame_{frame_num}.png"
-            cv2.imwrite(str(player_image_path), player_image)
-
-            # Marcar este track_id como ya guardado
-            saved_ids.add(player_id)
+def save_video(ouput_video_frames, output_video_path: str, fps: float = 24.0):
+    """Escribe los frames con los FPS del video de origen (`get_video_info`)."""
+    write_video(ouput_video_frames, output_video_path, fps)
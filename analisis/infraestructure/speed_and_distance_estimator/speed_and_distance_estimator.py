@@ -1,144 +1,112 @@
-import gc
 from typing import Dict
 
 import cv2
+import numpy as np
 from cv2.typing import MatLike
 from analisis.entities.collection.track_collection import TrackCollection
-from analisis.entities.tracks.track_detail import TrackBallDetail, TrackDetailBase, TrackPlayerDetail
-from analisis.infraestructure.services.bbox_processor_service import (
-    get_foot_position, measure_scalar_distance)
+from analisis.entities.tracks.track_detail import TrackDetailBase
+from analisis.infraestructure.services.bbox_processor_service import \
+    get_foot_position
+from analisis.infraestructure.structured_logging import get_logger
+
+log = get_logger("speed")
 
 
 class SpeedAndDistanceEstimator():
-    def __init__(self):
+    def __init__(self, frame_rate: float = 24):
         self.frame_window = 5
-        self.frame_rate = 24
+        self.frame_rate = frame_rate
 
-    def add_speed_and_distance_to_tracks(
+    def measure_speed_and_distance(
             self,
-            tracks_collection: TrackCollection):
-        total_distance = {}
-        print("Calculating speed and distance...")
-        for entity_type, frames in tracks_collection.tracks.items():
-            number_of_frames = len(frames)
-            print("Number of frames on entity: ", number_of_frames)
-            for frame_num, tracks_in_frames in frames.items():
-                last_frame = min(
-                    frame_num + self.frame_window,
-                    number_of_frames - 1)
-                print(f"Processing frame {frame_num} to {last_frame}...")
-                for track_id, track_detail in tracks_in_frames.items():
-                    if track_id == track_detail.track_id:
-                        continue
-
-                    start_position = tracks_collection.tracks[entity_type][frame_num][track_id].position_transformed
-                    end_position = tracks_collection.tracks[entity_type][last_frame][track_id].position_transformed
-                    print("Start position:", start_position)
-                    print("End position:", end_position)
-
-                    if not start_position or not end_position:
-                        continue
+            frames: np.ndarray,
+            track_ids: np.ndarray,
+            positions: np.ndarray,
+            frame_rate: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Calcula velocidad y distancia acumulada de todas las detecciones.
+
+        Las detecciones se agrupan por track_id en series contiguas
+        ordenadas por frame. La distancia acumulada es la suma (cumsum) de
+        los desplazamientos entre muestras consecutivas del mismo track, y la
+        velocidad es el promedio en una ventana de las últimas
+        `frame_window` muestras: distancia de la ventana / tiempo de la ventana.
+
+        Args:
+            frames (np.ndarray): Número de frame de cada detección, shape (N,).
+            track_ids (np.ndarray): ID de track de cada detección, shape (N,).
+            positions (np.ndarray): Posición en metros, shape (N, 2); NaN si no es válida.
+            frame_rate (float): FPS reales del video.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Velocidad en km/h y distancia
+            acumulada en metros por detección, NaN donde no hay datos.
+        """
+        speed = np.full(len(frames), np.nan, dtype=np.float32)
+        distance = np.full(len(frames), np.nan, dtype=np.float32)
+
+        valid_rows = np.flatnonzero(np.isfinite(positions).all(axis=1))
+        if len(valid_rows) == 0:
+            return speed, distance
+
+        # Series por track, ordenadas por frame
+        order = valid_rows[np.lexsort((frames[valid_rows], track_ids[valid_rows]))]
+        ids = track_ids[order]
+        times = frames[order].astype(np.float64) / frame_rate
+        points = positions[order].astype(np.float64)
+
+        same_track = ids[1:] == ids[:-1]
+        steps = np.where(same_track, np.hypot(*(points[1:] - points[:-1]).T), 0.0)
+        elapsed = np.where(same_track, times[1:] - times[:-1], 0.0)
+        cumulative_distance = np.concatenate(([0.0], np.cumsum(steps)))
+        cumulative_time = np.concatenate(([0.0], np.cumsum(elapsed)))
+
+        # Primera muestra del track al que pertenece cada muestra
+        starts = np.flatnonzero(np.r_[True, ~same_track])
+        track_start = np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+
+        window_start = np.maximum(np.arange(len(order)) - self.frame_window, track_start)
+        window_distance = cumulative_distance - cumulative_distance[window_start]
+        window_time = cumulative_time - cumulative_time[window_start]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            speed_meters_per_sec = np.where(window_time > 0, window_distance / window_time, np.nan)
+
+        speed[order] = speed_meters_per_sec * 3.6
+        distance[order] = cumulative_distance - cumulative_distance[track_start]
+        return speed, distance
 
-                    distance_covered = measure_scalar_distance(
-                        start_position, end_position)
-                    time_elapsed = (last_frame - frame_num) / self.frame_rate
-                    if time_elapsed <= 0:
-                        continue
-                    speed_meters_per_sec = distance_covered / time_elapsed
-                    speed_km_per_hour = speed_meters_per_sec * 3.6
-
-                    if entity_type not in total_distance:
-                        total_distance[entity_type] = {}
-
-                    if track_id not in total_distance[entity_type]:
-                        total_distance[entity_type][track_id] = 0
-
-                    total_distance[entity_type][track_id] += distance_covered
-
-                    print(
-                        f"Track ID: {track_id}, Speed: {
-                            speed_km_per_hour:.2f} km/h, Total Distance: {
-                            total_distance[entity_type][track_id]:.2f} m")
-                    for frame_num_batch in range(frame_num, last_frame):
-                        if track_id not in frames[frame_num_batch]:
-                            continue
-
-                        track = tracks_collection.tracks[entity_type][frame_num_batch][track_id]
-                        track.update(
-                            speed_km_per_hour=speed_km_per_hour,
-                            covered_distance=total_distance[entity_type][track_id])
-                        # track.speed_km_per_hour = speed_km_per_hour
-                        # track.covered_distance = total_distance[entity_type][track_id]
-                        tracks_collection.update_track(
-                            entity_type=entity_type,
-                            frame_num=frame_num_batch,
-                            track_id=track_id,
-                            track_detail=track
-                        )
-
-        # for tracked_object, object_tracks in tracks.items():
-        #     number_of_frames = len(object_tracks)
-        #     for frame_num in range(0, number_of_frames, self.frame_window):
-        #         last_frame = min(
-        #             frame_num + self.frame_window,
-        #             number_of_frames - 1)
-
-        #         for track_id, _ in object_tracks[frame_num].items():
-        #             if track_id not in object_tracks[last_frame]:
-        #                 continue
-
-        #             start_position = object_tracks[frame_num][track_id]['position_transformed']
-        #             end_position = object_tracks[last_frame][track_id]['position_transformed']
-        #             print("Start position:", start_position)
-        #             print("End position:", end_position)
-
-        #             if not start_position or not end_position:
-        #                 continue
-
-        #             distance_covered = measure_scalar_distance(
-        #                 start_position, end_position)
-        #             time_elapsed = (last_frame - frame_num) / self.frame_rate
-        #             if time_elapsed <= 0:
-        #                 continue
-        #             speed_meteres_per_second = distance_covered / time_elapsed
-        #             speed_km_per_hour = speed_meteres_per_second * 3.6
-
-        #             if tracked_object not in total_distance:
-        #                 total_distance[tracked_object] = {}
-
-        #             if track_id not in total_distance[tracked_object]:
-        #                 total_distance[tracked_object][track_id] = 0
-
-        #             total_distance[tracked_object][track_id] += distance_covered
-
-        #             for frame_num_batch in range(frame_num, last_frame):
-        #                 if track_id not in tracks[tracked_object][frame_num_batch]:
-        #                     continue
-
-        #                 if tracked_object == "ball":
-        #                     ball_tracker = TrackBallDetail(
-        #                         speed_km_per_hour=speed_km_per_hour,
-        #                         covered_distance=total_distance[tracked_object][track_id])
-        #                     tracks_collection.update_track(
-        #                         entity_type="ball",
-        #                         frame_num=frame_num_batch,
-        #                         track_id=track_id,
-        #                         track_detail=ball_tracker
-        #                     )
-        #                 else:
-        #                     player_tracker = TrackPlayerDetail(
-        #                         speed_km_per_hour=speed_km_per_hour,
-        #                         covered_distance=total_distance[tracked_object][track_id]
-        #                     )
-        #                     tracks_collection.update_track(
-        #                         entity_type="players",
-        #                         frame_num=frame_num_batch,
-        #                         track_id=track_id,
-        #                         track_detail=player_tracker
-        #                         )
-
-        #                 tracks[tracked_object][frame_num_batch][track_id]['speed'] = speed_km_per_hour
-        #                 tracks[tracked_object][frame_num_batch][track_id]['distance'] = total_distance[tracked_object][track_id]
+    def add_speed_and_distance_to_tracks(
+            self,
+            tracks_collection: TrackCollection,
+            frame_rate: float | None = None):
+        """
+        Escribe velocidad (km/h) y distancia recorrida (m) en todos los tracks
+        con una sola escritura columnar por entidad.
+
+        Args:
+            tracks_collection (TrackCollection): Colección con `position_transformed`.
+            frame_rate (float | None): FPS del video; por defecto `self.frame_rate`.
+        """
+        frame_rate = frame_rate or self.frame_rate
+        log.debug("speed_and_distance_started", frame_rate=round(frame_rate, 2))
+        for entity_type in tracks_collection.columns:
+            speed, distance = self.measure_speed_and_distance(
+                tracks_collection.get_column(entity_type, "frame"),
+                tracks_collection.get_column(entity_type, "track_id"),
+                tracks_collection.get_column(entity_type, "position_transformed"),
+                frame_rate)
+            tracks_collection.set_column(entity_type, "speed", speed)
+            tracks_collection.set_column(entity_type, "distance", distance)
+
+    def draw_speed_and_distance_label(self, frame: MatLike, bbox, speed: float, distance: float) -> MatLike:
+        """Velocidad y distancia recorrida debajo de los pies del jugador, en el lugar."""
+        x, y = get_foot_position(bbox)
+        position = (int(x), int(y) + 40)
+        cv2.putText(frame, f"{speed:.2f} km/h", position,
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
+        cv2.putText(frame, f"{distance:.2f} m", (position[0], position[1] + 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
+        return frame
 
     def draw_speed_and_distance(
             self,
@@ -149,37 +117,12 @@ class SpeedAndDistanceEstimator():
             for object, object_tracks in tracks.items():
                 if object == "ball" or object == "referees":
                     continue
-                for _, track_info in object_tracks[frame_num].items():
-                    if track_info.speed_km_per_hour is not None and track_info.covered_distance is not None:
-                        speed = track_info.speed_km_per_hour
-                        distance = track_info.covered_distance
-                        if speed is None or distance is None:
-                            continue
-
-                        bbox = track_info.bbox
-                        position = get_foot_position(bbox)
-                        position = list(position)
-                        position[1] += 40
-
-                        position = tuple(map(int, position))
-                        cv2.putText(
-                            frame, f"{
-                                speed:.2f} km/h",
-                            position,
-                            cv2.FONT_HERSHEY_SIMPLEX,
-                            0.5,
-                            (0, 0, 0),
-                            2)
-                        cv2.putText(frame,
-                                    f"{distance:.2f} m",
-                                    (position[0],
-                                     position[1] + 20),
-                                    cv2.FONT_HERSHEY_SIMPLEX,
-                                    0.5,
-                                    (0,
-                                        0,
-                                        0),
-                                    2)
+                for _, track_info in object_tracks.get(frame_num, {}).items():
+                    speed = track_info.speed_km_per_hour
+                    distance = track_info.covered_distance
+                    if speed is None or distance is None:
+                        continue
+                    self.draw_speed_and_distance_label(frame, track_info.bbox, speed, distance)
             output_frames.append(frame)
 
         return output_frames
@@ -0,0 +1 @@
+from .stage_profiler import Span, SpanStats, StageProfiler
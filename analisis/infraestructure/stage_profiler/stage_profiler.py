@@ -0,0 +1,131 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+import psutil
+
+from analisis.entities.utils.singleton import Singleton
+
+MB = 1024 * 1024
+
+
+class Span:
+    """
+    Medición en curso; `frames` puede fijarse dentro del bloque cuando el
+    número de frames procesados no se conoce al abrirlo.
+    """
+
+    __slots__ = ("name", "frames")
+
+    def __init__(self, name: str, frames: int = 0):
+        self.name = name
+        self.frames = frames
+
+
+class SpanStats:
+    """Acumulado de todas las mediciones con un mismo nombre."""
+
+    __slots__ = ("calls", "wall_s", "cpu_s", "frames", "peak_rss")
+
+    def __init__(self):
+        self.calls = 0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.frames = 0
+        self.peak_rss = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "wall_s": round(self.wall_s, 4),
+            "cpu_s": round(self.cpu_s, 4),
+            "frames": self.frames,
+            "fps": round(self.frames / self.wall_s, 2) if self.frames and self.wall_s > 0 else None,
+            "peak_rss_mb": round(self.peak_rss / MB, 1),
+        }
+
+
+class StageProfiler(metaclass=Singleton):
+    """
+    Tiempos y memoria por etapa del trabajo actual del proceso.
+
+    Cada `span` suma su tiempo de reloj, su tiempo de CPU y sus frames al
+    acumulado de su nombre, y toma una muestra del RSS al cerrar. El CPU es
+    el del hilo que ejecuta la medición (`time.thread_time`), así las etapas
+    que corren en paralelo (decodificación, inferencia, tracking) no se
+    cuentan dos veces; el trabajo que las librerías nativas reparten en sus
+    propios hilos queda en `process_cpu_s` del trabajo. Es seguro usarlo
+    desde varios hilos.
+    """
+
+    def __init__(self):
+        self._process = psutil.Process()
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Descarta las mediciones del trabajo anterior."""
+        with self._lock:
+            self._stats: Dict[str, SpanStats] = {}
+            self._started_wall = time.perf_counter()
+            self._started_cpu = time.process_time()
+            self.peak_rss = self._process.memory_info().rss
+
+    @contextmanager
+    def span(self, name: str, frames: int = 0) -> Iterator[Span]:
+        """
+        Mide el bloque con el nombre `name`.
+
+        Args:
+            name (str): Etapa o bucle medido (ej: "detect", "track").
+            frames (int): Frames que procesa el bloque, para los frames/seg.
+        """
+        span = Span(name, frames)
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield span
+        finally:
+            self.record(span.name, time.perf_counter() - wall, time.thread_time() - cpu, span.frames)
+
+    def record(self, name: str, wall_s: float, cpu_s: float = 0.0, frames: int = 0) -> None:
+        """Suma una medición tomada por fuera de `span`."""
+        rss = self._process.memory_info().rss
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = SpanStats()
+            stats.calls += 1
+            stats.wall_s += wall_s
+            stats.cpu_s += cpu_s
+            stats.frames += frames
+            stats.peak_rss = max(stats.peak_rss, rss)
+            self.peak_rss = max(self.peak_rss, rss)
+
+    def merge(self, metrics: Dict[str, Any]) -> None:
+        """
+        Suma las mediciones de otro proceso (su `metrics()`), por ejemplo las
+        de un segmento analizado en paralelo. Los tiempos de los spans se
+        suman aunque hayan corrido a la vez; el pico de RSS es por proceso.
+        """
+        with self._lock:
+            for name, other in metrics.get("spans", {}).items():
+                stats = self._stats.get(name)
+                if stats is None:
+                    stats = self._stats[name] = SpanStats()
+                stats.calls += other.get("calls", 0)
+                stats.wall_s += other.get("wall_s", 0.0)
+                stats.cpu_s += other.get("cpu_s", 0.0)
+                stats.frames += other.get("frames", 0)
+                stats.peak_rss = max(stats.peak_rss, int(other.get("peak_rss_mb", 0.0) * MB))
+
+    def metrics(self) -> Dict[str, Any]:
+        """Resumen para las métricas del trabajo, serializable a JSON."""
+        with self._lock:
+            return {
+                "wall_s": round(time.perf_counter() - self._started_wall, 4),
+                "process_cpu_s": round(time.process_time() - self._started_cpu, 4),
+                "peak_rss_mb": round(self.peak_rss / MB, 1),
+                "spans": {name: stats.to_dict() for name, stats in self._stats.items()},
+            }
@@ -0,0 +1,2 @@
+from .structured_logging import (ROOT_LOGGER, DebugSampler, StructuredFormatter,
+                                 StructuredLogger, get_logger)
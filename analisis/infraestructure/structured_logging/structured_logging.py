@@ -0,0 +1,141 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import orjson
+
+# Todos los subsistemas cuelgan de este logger: "analisis.tracking", "analisis.camera", ...
+ROOT_LOGGER = "analisis"
+
+
+class StructuredLogger:
+    """
+    Logger de un subsistema que registra eventos con campos, no texto armado.
+
+    El nivel se consulta antes de hacer cualquier otra cosa, así una
+    llamada de debug deshabilitada en un bucle cuesta solo esa consulta
+    (`logging` la memoriza): los campos no se formatean ni se crea el
+    registro. Para los bucles calientes con debug habilitado:
+
+    - `every=N` emite una de cada N llamadas del mismo evento (muestreo).
+    - `interval=S` emite como mucho una vez cada S segundos por evento e
+      informa cuántas se omitieron (límite de tasa).
+    """
+
+    def __init__(self, name: str):
+        self._logger = logging.getLogger(name)
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._last_emitted: Dict[str, float] = {}
+
+    @property
+    def name(self) -> str:
+        return self._logger.name
+
+    def enabled(self, level: int = logging.DEBUG) -> bool:
+        """Para proteger cálculos que solo sirven al log: `if log.enabled(): ...`."""
+        return self._logger.isEnabledFor(level)
+
+    def debug(self, event: str, **fields) -> None:
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._log(logging.DEBUG, event, fields)
+
+    def info(self, event: str, **fields) -> None:
+        if self._logger.isEnabledFor(logging.INFO):
+            self._log(logging.INFO, event, fields)
+
+    def warning(self, event: str, **fields) -> None:
+        if self._logger.isEnabledFor(logging.WARNING):
+            self._log(logging.WARNING, event, fields)
+
+    def error(self, event: str, **fields) -> None:
+        if self._logger.isEnabledFor(logging.ERROR):
+            self._log(logging.ERROR, event, fields)
+
+    def exception(self, event: str, **fields) -> None:
+        """Como `error`, con el traceback de la excepción en curso."""
+        if self._logger.isEnabledFor(logging.ERROR):
+            self._log(logging.ERROR, event, fields, exc_info=True)
+
+    def _log(self, level: int, event: str, fields: Dict[str, Any], exc_info: bool = False) -> None:
+        every: Optional[int] = fields.pop("every", None)
+        interval: Optional[float] = fields.pop("interval", None)
+        if every is not None or interval is not None:
+            with self._lock:
+                count = self._counts.get(event, 0) + 1
+                self._counts[event] = count
+                if every is not None and (count - 1) % every:
+                    return
+                if interval is not None:
+                    now = time.monotonic()
+                    if now - self._last_emitted.get(event, -interval) < interval:
+                        return
+                    self._last_emitted[event] = now
+                    # Llamadas desde la última emisión (esta incluida)
+                    fields["occurrences"] = count
+                    self._counts[event] = 0
+                elif every is not None:
+                    fields["sampled_every"] = every
+        self._logger.log(level, event, exc_info=exc_info, extra={"fields": fields}, stacklevel=3)
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Una línea por evento: `2025-01-01T00:00:00Z INFO analisis.cache event k=v`,
+    o un objeto JSON por línea con `json=True` (para agregadores de logs).
+    """
+
+    def __init__(self, json: bool = False, **kwargs):
+        super().__init__(**kwargs)
+        self.json = json
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, "fields", None) or {}
+        timestamp = datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds")
+        if self.json:
+            payload = {
+                "ts": timestamp,
+                "level": record.levelname,
+                "logger": record.name,
+                "event": record.getMessage(),
+                **fields,
+            }
+            if record.exc_info:
+                payload["exc_info"] = self.formatException(record.exc_info)
+            return orjson.dumps(payload, default=str, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+        text = f"{timestamp} {record.levelname} {record.name} {record.getMessage()}"
+        if fields:
+            text += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            text += "\n" + self.formatException(record.exc_info)
+        return text
+
+
+class DebugSampler(logging.Filter):
+    """
+    Deja pasar uno de cada `every` registros DEBUG por evento. Se usa en el
+    handler para un modo de diagnóstico muestreado sin tocar las llamadas.
+    """
+
+    def __init__(self, every: int = 1):
+        super().__init__()
+        self.every = max(1, int(every))
+        self._counts: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.every == 1:
+            return True
+        key = (record.name, record.msg)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        return count % self.every == 0
+
+
+def get_logger(subsystem: str) -> StructuredLogger:
+    """Logger del subsistema (ej: "tracking"); su nivel se configura con LOG_LEVELS."""
+    return StructuredLogger(f"{ROOT_LOGGER}.{subsystem}")
@@ -1,29 +1,32 @@
-import logging
 from typing import Dict, List
+import cv2
+import numpy as np
 from sklearn.cluster import KMeans
 from cv2.typing import MatLike
-from analisis.entities.tracks.track_detail import TrackDetailBase
+from analisis.entities.collection.track_collection import TrackCollection
+from analisis.infraestructure.structured_logging import get_logger
+
+log = get_logger("team")
 
 
 class TeamAssigner:
-    def __init__(self):
+    def __init__(self, color_batch_size: int = 64, patch_size: int = 16):
         self.team_colors = {}
         self.player_team_dict = {}
+        self.player_colors = {}
+        # Recortes reducidos a la espera de calcular su color en lote
+        self.color_batch_size = color_batch_size
+        self.patch_size = patch_size
+        self._pending_patches: Dict[int, np.ndarray] = {}
+
+    def reset(self) -> None:
+        """Descarta colores, equipos y modelo del video anterior."""
+        self.team_colors = {}
+        self.player_team_dict = {}
+        self.player_colors = {}
+        self._pending_patches.clear()
+        self.__dict__.pop("kmeans", None)
 
-    def get_clustering_model(self, image):
-        # Reshape the image to 2D array
-        print("Reshaping image to 2D array, actual image shape: ", image.shape)
-        image_2d = image.reshape(-1, 3)
-        print("Reshaped image shape: ", image_2d.shape)
-
-        # Preform K-means with 2 clusters
-        kmeans = KMeans(n_clusters=2, init="k-means++", n_init=1)
-        print("Fitting KMeans model")
-        kmeans.fit(image_2d)
-        print("KMeans model fitted")
-
-        return kmeans
-    
     def get_coords_from_bbox(self, frame: MatLike, bbox: List):
         frame_h, frame_w = frame.shape[:2]
         
@@ -51,66 +54,130 @@ class TeamAssigner:
             return False
         return True
 
-    def get_player_color(
+    def get_top_half_patch(
             self,
             frame: MatLike,
-            bbox: List):
-        print("Getting player color")
-        validate = self.validate_frame(frame, bbox)
-        x1, y1, x2, y2 = self.get_coords_from_bbox(frame, bbox)
-        if not validate:
-            print("Invalid frame or bbox, returning default color.")
+            bbox: List) -> np.ndarray | None:
+        """
+        Recorta la mitad superior del jugador y la reduce a un parche de
+        `patch_size` x `patch_size` píxeles, suficiente para el color.
+
+        Returns:
+            np.ndarray | None: Parche BGR, o None si el bbox no es válido.
+        """
+        if not self.validate_frame(frame, bbox):
             return None
-        
-        # image = frame[int(bbox[1]):int(bbox[3]), int(bbox[0]):int(bbox[2])]
+        x1, y1, x2, y2 = self.get_coords_from_bbox(frame, bbox)
         image = frame[y1:y2, x1:x2]
-
         top_half_image = image[:int(image.shape[0] / 2), :]
-
-        # Get Clustering model
-        kmeans = self.get_clustering_model(top_half_image)
-
-        # Get the cluster labels forr each pixel
-        print("Getting cluster labels")
-        labels = kmeans.labels_
-
-        # Reshape the labels to the image shape
-        print("Reshaping labels to image shape")
-        clustered_image = labels.reshape(
-            top_half_image.shape[0], top_half_image.shape[1])
-
-        # Get the player cluster
-        print("Getting player cluster")
-        corner_clusters = [clustered_image[0, 0], clustered_image[0, -1],
-                           clustered_image[-1, 0], clustered_image[-1, -1]]
-        non_player_cluster = max(
-            set(corner_clusters),
-            key=corner_clusters.count)
+        return cv2.resize(
+            top_half_image,
+            (self.patch_size, self.patch_size),
+            interpolation=cv2.INTER_AREA)
+
+    def get_player_colors(self, patches: np.ndarray, iterations: int = 10) -> np.ndarray:
+        """
+        Obtiene el color de camiseta de varios jugadores a la vez.
+
+        Ejecuta un 2-means vectorizado sobre todos los parches apilados: el
+        centro inicial del fondo es el promedio de las esquinas y el del
+        jugador el píxel más alejado de él. El cluster mayoritario en las
+        esquinas se toma como fondo y el otro como color del jugador.
+
+        Args:
+            patches (np.ndarray): Parches BGR, shape (B, H, W, 3).
+            iterations (int): Máximo de iteraciones de 2-means.
+
+        Returns:
+            np.ndarray: Color del jugador por parche, shape (B, 3).
+        """
+        batch = len(patches)
+        pixels = patches.reshape(batch, -1, 3).astype(np.float32)
+        corners = patches[:, [0, 0, -1, -1], [0, -1, 0, -1]].astype(np.float32)
+
+        centers = np.empty((batch, 2, 3), dtype=np.float32)
+        centers[:, 0] = corners.mean(axis=1)
+        farthest = ((pixels - centers[:, :1]) ** 2).sum(axis=2).argmax(axis=1)
+        centers[:, 1] = pixels[np.arange(batch), farthest]
+
+        labels = np.zeros(pixels.shape[:2], dtype=bool)
+        for iteration in range(iterations):
+            distances = ((pixels[:, :, None, :] - centers[:, None, :, :]) ** 2).sum(axis=3)
+            new_labels = distances[:, :, 1] < distances[:, :, 0]
+            if iteration > 0 and np.array_equal(new_labels, labels):
+                break
+            labels = new_labels
+
+            ones = labels[:, :, None].astype(np.float32)
+            count_1 = ones.sum(axis=1)
+            count_0 = pixels.shape[1] - count_1
+            sum_1 = (pixels * ones).sum(axis=1)
+            sum_0 = pixels.sum(axis=1) - sum_1
+            # Un cluster vacío conserva su centro anterior
+            centers[:, 0] = np.where(count_0 > 0, sum_0 / np.maximum(count_0, 1), centers[:, 0])
+            centers[:, 1] = np.where(count_1 > 0, sum_1 / np.maximum(count_1, 1), centers[:, 1])
+
+        # Get the player cluster: el fondo es el cluster mayoritario en las esquinas
+        clustered_image = labels.reshape(patches.shape[:3])
+        corner_clusters = clustered_image[:, [0, 0, -1, -1], [0, -1, 0, -1]]
+        non_player_cluster = (corner_clusters.sum(axis=1) > 2).astype(np.int64)
         player_cluster = 1 - non_player_cluster
 
-        player_color = kmeans.cluster_centers_[player_cluster]
-        print("Player color: ", player_color)
+        return centers[np.arange(batch), player_cluster].astype(np.float64)
 
-        return player_color
-
-    def assign_team_color(
+    def get_player_color(
             self,
             frame: MatLike,
-            player_detections: Dict[int, TrackDetailBase]):
+            bbox: List):
+        patch = self.get_top_half_patch(frame, bbox)
+        if patch is None:
+            log.debug("player_patch_invalid", interval=5.0)
+            return None
+        return self.get_player_colors(patch[None])[0]
 
-        player_colors = []
-        for _, player_detection in player_detections.items():
-            bbox = player_detection.bbox
-            if bbox is None:
-                print("BBox is None, skipping player detection.")
+    def collect_player_colors(
+            self,
+            frame_num: int,
+            frame: MatLike,
+            tracks_collection: TrackCollection) -> None:
+        """
+        Callback de frame: guarda un parche de cada jugador la primera vez que
+        aparece con un recorte válido y calcula los colores en lotes, para no
+        necesitar el frame después. Cada track_id se procesa una sola vez.
+
+        Args:
+            frame_num (int): Número del frame actual.
+            frame (MatLike): Frame BGR actual.
+            tracks_collection (TrackCollection): Colección con los tracks ya detectados.
+        """
+        rows = tracks_collection.rows_for_frame("players", frame_num)
+        player_ids = tracks_collection.get_column("players", "track_id")[rows].tolist()
+        bboxes = tracks_collection.get_column("players", "bbox")[rows]
+        for player_id, bbox in zip(player_ids, bboxes):
+            if player_id in self.player_colors or player_id in self._pending_patches \
+                    or np.isnan(bbox).any():
                 continue
-            print("Trying to get player color with bbox: ", bbox)
-            player_color = self.get_player_color(frame, bbox)
-            print("Player color: ", player_color)
-            player_colors.append(player_color)
+            patch = self.get_top_half_patch(frame, bbox)
+            if patch is not None:
+                self._pending_patches[player_id] = patch
+
+        if len(self._pending_patches) >= self.color_batch_size:
+            self.flush_player_colors()
+
+    def flush_player_colors(self) -> None:
+        """Calcula en un solo lote el color de los parches pendientes."""
+        if not self._pending_patches:
+            return
+        colors = self.get_player_colors(np.stack(list(self._pending_patches.values())))
+        self.player_colors.update(zip(self._pending_patches.keys(), colors))
+        self._pending_patches.clear()
+
+    def assign_team_color(self):
+        """Agrupa en dos equipos los colores recolectados de los jugadores."""
+        self.flush_player_colors()
+        player_colors = list(self.player_colors.values())
 
         kmeans = KMeans(n_clusters=2, init="k-means++", n_init=10)
-        print("Player colors: ", player_colors)
         kmeans.fit(player_colors)
 
         self.kmeans = kmeans
@@ -137,31 +204,31 @@ class TeamAssigner:
 
     #     return team_id
 
-    def get_player_team(self, frame: MatLike, player_bbox, player_id: int):
+    def get_player_team(self, player_id: int):
         # Si ya se asignó el equipo previamente, usar ese valor
         if player_id in self.player_team_dict:
             return self.player_team_dict[player_id]
 
         # Validar existencia del modelo
         if not hasattr(self, "kmeans"):
-            logging.debug("KMeans model not found, cannot assign team.")
+            log.warning("team_model_missing", player=player_id, interval=5.0)
             return -1
 
         # Obtener color dominante del jugador
-        player_color = self.get_player_color(frame, player_bbox)
+        player_color = self.player_colors.get(player_id)
         if player_color is None:
-            logging.debug(f"⚠️ Could not get color for player {player_id}, bbox={player_bbox}")
+            log.debug("player_color_missing", player=player_id)
             return -1
 
         # Predicción del equipo
         try:
             team_id = int(self.kmeans.predict(player_color.reshape(1, -1))[0]) + 1
         except Exception as e:
-            logging.debug(f"⚠️ Error predicting team for player {player_id}: {e}")
+            log.warning("team_prediction_failed", player=player_id, error=str(e), interval=5.0)
             return -1
 
         # Guardar resultado en cache
         self.player_team_dict[player_id] = team_id
-        logging.debug(f"✅ Player {player_id} assigned to team {team_id}")
+        log.debug("player_team_assigned", player=player_id, team=team_id)
 
         return team_id
@@ -1,2 +1,3 @@
+from .keyframe_tracking import KeyframeSelector, MotionPropagator
 from .tracker_factory import TrackerFactory, TrackerFactoryError
-from .tracker_service import TrackerService
+from .tracker_service import DetectedBatch, TrackerService
@@ -0,0 +1,163 @@
+from typing import Optional
+
+import numpy as np
+import supervision as sv
+
+
+class KeyframeSelector:
+    """
+    Decide en qué frames corre el detector cuando se detecta por keyframes.
+
+    Hay keyframe cada `stride` frames, o antes si el desplazamiento de cámara
+    acumulado desde el último supera `max_camera_motion`. Si la confianza
+    media de un keyframe queda bajo `min_confidence`, el siguiente lote
+    arranca con un keyframe: las detecciones de un lote se piden juntas, así
+    que el aviso no puede aplicarse dentro del mismo lote.
+    """
+
+    def __init__(
+            self,
+            stride: int,
+            max_camera_motion: Optional[float] = None,
+            min_confidence: Optional[float] = None):
+        self.stride = max(1, stride)
+        self.max_camera_motion = max_camera_motion
+        self.min_confidence = min_confidence
+        self.reset()
+
+    def reset(self) -> None:
+        self._frames_since_keyframe: Optional[int] = None
+        self._camera_shift = np.zeros(2, dtype=np.float32)
+        self._force_keyframe = False
+        self.keyframes = 0
+        self.frames = 0
+
+    def select(self, camera_movement: np.ndarray) -> np.ndarray:
+        """
+        Marca los keyframes de un lote de frames consecutivos.
+
+        Args:
+            camera_movement (np.ndarray): Movimiento [x, y] de cada frame del lote.
+
+        Returns:
+            np.ndarray: Máscara booleana; True en los frames a detectar.
+        """
+        movement = np.asarray(camera_movement, dtype=np.float32).reshape(-1, 2)
+        is_keyframe = np.zeros(len(movement), dtype=bool)
+        for offset, frame_movement in enumerate(movement):
+            self._camera_shift += frame_movement
+            since = self._frames_since_keyframe
+            if (since is None
+                    or self._force_keyframe
+                    or since + 1 >= self.stride
+                    or (self.max_camera_motion is not None
+                        and np.hypot(*self._camera_shift) > self.max_camera_motion)):
+                is_keyframe[offset] = True
+                self._frames_since_keyframe = 0
+                self._camera_shift[:] = 0
+                self._force_keyframe = False
+            else:
+                self._frames_since_keyframe = since + 1
+        self.keyframes += int(is_keyframe.sum())
+        self.frames += len(movement)
+        return is_keyframe
+
+    def observe(self, detections: sv.Detections) -> None:
+        """Registra las detecciones de un keyframe para el umbral de confianza."""
+        if self.min_confidence is None:
+            return
+        confidence = detections.confidence
+        if len(detections) == 0 or confidence is None or confidence.mean() < self.min_confidence:
+            self._force_keyframe = True
+
+
+class MotionPropagator:
+    """
+    Propaga las detecciones del último keyframe a los frames siguientes.
+
+    Cada caja mantiene una velocidad constante (px/frame, por esquina)
+    medida contra la caja más cercana de su misma clase en el keyframe
+    anterior. Se asocia por distancia y no por ID de ByteTrack porque los
+    objetos chicos y rápidos (el balón) pierden el ID justamente cuando la
+    propagación se equivoca. Las cajas sin pareja se desplazan con el
+    movimiento de cámara acumulado desde el keyframe.
+    """
+
+    def __init__(self, max_speed: float = 40.0):
+        """
+        Args:
+            max_speed (float): Desplazamiento máximo por frame (px) para
+                asociar una caja con la del keyframe anterior.
+        """
+        self.max_speed = max_speed
+        self.reset()
+
+    def reset(self) -> None:
+        self._frame = -1
+        self._camera_shift = np.zeros(2, dtype=np.float32)
+        self._boxes = np.empty((0, 4), dtype=np.float32)
+        self._velocity = np.empty((0, 4), dtype=np.float32)
+        self._class_ids = np.empty(0, dtype=np.int64)
+        self._confidence = np.empty(0, dtype=np.float32)
+
+    def observe(self, frame_num: int, detections: sv.Detections) -> None:
+        """
+        Guarda las detecciones crudas de un keyframe y estima sus velocidades.
+
+        Args:
+            frame_num (int): Número del keyframe.
+            detections (sv.Detections): Detecciones del modelo en ese frame.
+        """
+        boxes = detections.xyxy.astype(np.float32).reshape(-1, 4)
+        class_ids = (detections.class_id if detections.class_id is not None
+                     else np.zeros(len(boxes))).astype(np.int64)
+        velocity = np.full_like(boxes, np.nan)
+
+        elapsed = frame_num - self._frame
+        if len(boxes) and len(self._boxes) and elapsed > 0:
+            centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+            previous_centers = (self._boxes[:, :2] + self._boxes[:, 2:]) / 2
+            distance = np.linalg.norm(centers[:, None] - previous_centers[None], axis=2)
+            distance[class_ids[:, None] != self._class_ids[None]] = np.inf
+            distance[distance > self.max_speed * elapsed] = np.inf
+            # Emparejamiento voraz, de la pareja más cercana a la más lejana
+            while np.isfinite(distance).any():
+                i, j = np.unravel_index(np.argmin(distance), distance.shape)
+                velocity[i] = (boxes[i] - self._boxes[j]) / elapsed
+                distance[i, :] = np.inf
+                distance[:, j] = np.inf
+
+        self._frame = frame_num
+        self._camera_shift[:] = 0
+        self._boxes = boxes
+        self._velocity = velocity
+        self._class_ids = class_ids
+        self._confidence = (detections.confidence if detections.confidence is not None
+                            else np.ones(len(boxes))).astype(np.float32)
+
+    def propagate(self, frame_num: int, camera_movement: np.ndarray) -> sv.Detections:
+        """
+        Cajas estimadas para un frame sin detección. Los frames se propagan
+        en orden, porque el movimiento de cámara se acumula.
+
+        Args:
+            frame_num (int): Frame a estimar, posterior al último keyframe.
+            camera_movement (np.ndarray): Movimiento de cámara [x, y] de este frame.
+
+        Returns:
+            sv.Detections: Detecciones sintéticas, listas para ByteTrack.
+        """
+        self._camera_shift += np.asarray(camera_movement, dtype=np.float32).reshape(2)
+        if len(self._boxes) == 0:
+            return sv.Detections.empty()
+
+        elapsed = frame_num - self._frame
+        known = ~np.isnan(self._velocity[:, 0])
+        boxes = np.where(
+            known[:, None],
+            self._boxes + np.nan_to_num(self._velocity) * elapsed,
+            self._boxes + np.tile(self._camera_shift, 2))
+        return sv.Detections(
+            xyxy=boxes.astype(np.float32),
+            confidence=self._confidence.copy(),
+            class_id=self._class_ids.copy())
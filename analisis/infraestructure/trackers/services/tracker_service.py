@@ -1,11 +1,31 @@
-import pickle
-from typing import override
+from typing import Iterable, Iterator, NamedTuple, Optional, override
 
+import numpy as np
 import supervision as sv
 from cv2.typing import MatLike
 from analisis.entities.collection.track_collection import TrackCollection
 from analisis.entities.interfaces import \
     TrackerServiceBase
+from analisis.infraestructure.detection_cache import CachedDetections
+from analisis.infraestructure.services import iter_frame_batches, prefetch
+from analisis.infraestructure.structured_logging import get_logger
+
+from .keyframe_tracking import KeyframeSelector, MotionPropagator
+
+log = get_logger("tracking")
+
+
+class DetectedBatch(NamedTuple):
+    """
+    - start_frame: Número del primer frame del lote.
+    - frames     : Frames del lote.
+    - detections : Detecciones crudas de cada frame.
+    - cached     : True si las detecciones salieron de la caché.
+    """
+    start_frame: int
+    frames: list[MatLike]
+    detections: list[sv.Detections]
+    cached: bool
 
 
 class TrackerService(TrackerServiceBase):
@@ -13,37 +33,192 @@ class TrackerService(TrackerServiceBase):
     def __init__(self, model_path: str):
         super().__init__(model_path)
         self.detection_frame: sv.Detections | None = None
+        # Solo se usa al detectar por keyframes (ver configure_keyframes)
+        self.keyframe_selector: KeyframeSelector | None = None
+        self.motion_propagator = MotionPropagator()
+
+    @override
+    def reset(self) -> None:
+        super().reset()
+        self.detection_frame = None
+        self.keyframe_selector = None
+        self.motion_propagator.reset()
+
+    def configure_keyframes(
+        self,
+        stride: int,
+        max_camera_motion: Optional[float] = None,
+        min_confidence: Optional[float] = None
+    ) -> None:
+        """Activa la detección por keyframes para el trabajo actual."""
+        self.keyframe_selector = KeyframeSelector(stride, max_camera_motion, min_confidence)
+        self.motion_propagator.reset()
 
     @override
     def get_object_tracks(
         self,
-        frames: list[MatLike],
-        tracks_collection: TrackCollection,
-        read_from_stub: bool = False,
-        stub_path: str = ""
+        frames: Iterable[MatLike],
+        tracks_collection: TrackCollection
     ):
-        if read_from_stub and stub_path:
-            tracks = self.read_tracks_from_stub(stub_path)
-            print(f"Tracks loaded players from stub: {tracks.pop('players', None)}")
-            print(f"Tracks loaded ball from stub: {tracks.pop('ball', None)}")
+        for batch in self.pipelined_batches(frames):
+            self.track_batch(batch.frames, batch.start_frame, tracks_collection, batch.detections)
+
+    def detect_batches(
+        self,
+        frames: Iterable[MatLike],
+        cached_detections: Optional[CachedDetections] = None
+    ) -> Iterator[DetectedBatch]:
+        """
+        Agrupa los frames en lotes y obtiene sus detecciones, de la caché si
+        la hay y cubre el lote, o del modelo.
+        """
+        if cached_detections is not None:
+            self.class_names = dict(cached_detections.class_names)
+
+        # El tamaño se consulta en cada lote: el tuner puede reducirlo
+        for start_frame, batch in iter_frame_batches(frames, lambda: self.batch_size):
+            if cached_detections is not None:
+                detections = [cached_detections.get(start_frame + offset)
+                              for offset in range(len(batch))]
+                if all(detection is not None for detection in detections):
+                    yield DetectedBatch(start_frame, batch, detections, cached=True)
+                    continue
+                # The cache does not cover this batch: back to the model
+                log.info("detection_cache_exhausted", frame=start_frame)
+                cached_detections = None
+            yield DetectedBatch(start_frame, batch, self.detect_batch(batch), cached=False)
 
-        results = self.detect_frames(frames)
+    def pipelined_batches(
+        self,
+        frames: Iterable[MatLike],
+        cached_detections: Optional[CachedDetections] = None,
+        depth: Optional[int] = None
+    ) -> Iterator[DetectedBatch]:
+        """
+        Igual que `detect_batches`, pero la inferencia corre en su propio hilo.
+
+        Con `frames` proveniente de `stream_video` quedan tres etapas unidas
+        por colas acotadas: mientras YOLO procesa el lote k, el lote k+1 se
+        decodifica y el consumidor hace el tracking del lote k-1. Solo este
+        hilo usa el modelo mientras dura la iteración.
 
-        printed = False
-        for frame_num, detection in enumerate(results):
-            cls_names = detection.names
-            cls_names_inv = {v: k for k, v in cls_names.items()}
+        Args:
+            frames (Iterable[MatLike]): Frames en orden (lista o stream).
+            cached_detections (CachedDetections | None): Detecciones de una corrida previa.
+            depth (int | None): Lotes inferidos en espera; por defecto
+                `self.pipeline_depth`. Con 0 todo corre en el hilo actual.
+        """
+        depth = self.pipeline_depth if depth is None else depth
+        batches = self.detect_batches(frames, cached_detections)
+        if depth <= 0:
+            return batches
+        return prefetch(batches, depth, name="yolo-inference")
+
+    def detect_batch(self, frames: list[MatLike]) -> list[sv.Detections]:
+        """
+        Ejecuta el modelo sobre un lote y convierte los resultados a
+        supervision, en coordenadas del frame original.
+        """
+        with self.profiler.span("detect", frames=len(frames)):
+            results = self.detect_frames(self.inference_frames(frames), batch_size=len(frames))
+            self.batch_tuner.observe()
+            if results:
+                self.class_names = dict(results[0].names)
 
             # Covert to supervision Detection format
-            detection_supervision = sv.Detections.from_ultralytics(detection)
+            detections = [sv.Detections.from_ultralytics(detection) for detection in results]
+            if self.inference_roi is not None:
+                # Back to frame coordinates before tracking
+                detections = [self.inference_roi.restore(detection) for detection in detections]
+        return detections
+
+    def track_batch(
+        self,
+        frames: list[MatLike],
+        start_frame: int,
+        tracks_collection: TrackCollection,
+        detections: list[sv.Detections] | None = None
+    ) -> list[sv.Detections]:
+        """
+        Detecta y sigue los objetos de un lote de frames consecutivos.
+
+        Args:
+            frames (list[MatLike]): Lote de frames.
+            start_frame (int): Número de frame del primer elemento del lote.
+            tracks_collection (TrackCollection): Colección donde se guardan los tracks.
+            detections (list[sv.Detections] | None): Detecciones ya calculadas
+                (p. ej. desde la caché); si se omiten se ejecuta el modelo.
+
+        Returns:
+            list[sv.Detections]: Detecciones crudas (antes del tracking) de cada frame.
+        """
+        if detections is None:
+            detections = self.detect_batch(frames)
+        cls_names_inv = {v: k for k, v in self.class_names.items()}
 
+        for offset, detection_supervision in enumerate(detections):
+            self.track_frame(detection_supervision, start_frame + offset, tracks_collection, cls_names_inv)
+        return detections
+
+    def track_keyframe_batch(
+        self,
+        frames: list[MatLike],
+        start_frame: int,
+        tracks_collection: TrackCollection,
+        camera_movement: np.ndarray
+    ) -> list[sv.Detections]:
+        """
+        Como `track_batch`, pero el modelo solo corre en los keyframes del lote
+        (todos en una sola llamada); el resto de los frames recibe las cajas
+        propagadas por `MotionPropagator`. Las cajas propagadas pasan igual
+        por ByteTrack, así su filtro de Kalman avanza frame a frame y los IDs
+        se mantienen. Requiere `configure_keyframes`.
+
+        Args:
+            frames (list[MatLike]): Lote de frames consecutivos.
+            start_frame (int): Número de frame del primer elemento del lote.
+            tracks_collection (TrackCollection): Colección donde se guardan los tracks.
+            camera_movement (np.ndarray): Movimiento de cámara de cada frame del lote.
+
+        Returns:
+            list[sv.Detections]: Detecciones crudas de los keyframes.
+        """
+        if self.keyframe_selector is None:
+            raise RuntimeError("Keyframe detection is not configured; call configure_keyframes first.")
+
+        is_keyframe = self.keyframe_selector.select(camera_movement)
+        keyframe_frames = [frame for frame, selected in zip(frames, is_keyframe) if selected]
+        keyframe_detections = self.detect_batch(keyframe_frames) if keyframe_frames else []
+        detected = iter(keyframe_detections)
+        cls_names_inv = {v: k for k, v in self.class_names.items()}
+
+        for offset, selected in enumerate(is_keyframe):
+            frame_num = start_frame + offset
+            if selected:
+                detection_supervision = next(detected)
+                self.keyframe_selector.observe(detection_supervision)
+                self.motion_propagator.observe(frame_num, detection_supervision)
+            else:
+                detection_supervision = self.motion_propagator.propagate(
+                    frame_num, camera_movement[offset])
+            self.track_frame(detection_supervision, frame_num, tracks_collection, cls_names_inv)
+        return keyframe_detections
+
+    def track_frame(
+        self,
+        detection_supervision: sv.Detections,
+        frame_num: int,
+        tracks_collection: TrackCollection,
+        cls_names_inv: dict[str, int]
+    ) -> sv.Detections:
+        """Sigue las detecciones de un frame y las agrega a los tracks."""
+        with self.profiler.span("track", frames=1):
             # Track Objects
             detection_with_tracks = self.tracker.update_with_detections(detection_supervision)
             if not self.detection_frame:
                 self.detection_frame = detection_with_tracks
-            if not printed:
-                print(detection_with_tracks)
-                printed = True
+            log.debug("frame_tracked", frame=frame_num,
+                      detections=len(detection_supervision), tracks=len(detection_with_tracks))
 
             for _, val in enumerate(self.get_trackers()):
                 val.get_object_tracks(
@@ -53,7 +228,4 @@ class TrackerService(TrackerServiceBase):
                     detection_supervision=detection_supervision,
                     tracks_collection=tracks_collection
                 )
-
-        # if stub_path is not None:
-        #     with open(stub_path, 'wb') as f:
-        #         pickle.dump(tracks, f)
+        return detection_with_tracks
@@ -0,0 +1,2 @@
+from .video_renderer import (VIDEO_CODECS, AnnotatedVideoRenderer,
+                             RenderedVideo)
@@ -0,0 +1,149 @@
+import os
+from itertools import islice
+from typing import Iterable, NamedTuple
+
+import numpy as np
+from cv2.typing import MatLike
+
+from analisis.entities.collection.track_collection import TrackCollection
+from analisis.entities.interfaces.tracker import Tracker
+from analisis.infraestructure.camera_movement_estimator.camera_movement_estimator import CameraMovementEstimator
+from analisis.infraestructure.services import AsyncVideoWriter, cumulative_ball_control
+from analisis.infraestructure.speed_and_distance_estimator.speed_and_distance_estimator import \
+    SpeedAndDistanceEstimator
+from analisis.infraestructure.stage_profiler import StageProfiler
+
+# FourCC -> extensión del contenedor
+VIDEO_CODECS = {
+    "XVID": ".avi",
+    "MJPG": ".avi",
+    "mp4v": ".mp4",
+    "avc1": ".mp4",
+}
+
+DEFAULT_PLAYER_COLOR = (0, 0, 255)
+
+
+class RenderedVideo(NamedTuple):
+    """
+    - path  : Archivo de video escrito.
+    - frames: Frames escritos.
+    - fps   : FPS del video (los del video de origen).
+    - bytes : Tamaño del archivo.
+    """
+    path: str
+    frames: int
+    fps: float
+    bytes: int
+
+
+class AnnotatedVideoRenderer:
+    """
+    Dibuja las anotaciones del análisis (jugadores, pelota, velocidad,
+    posesión y movimiento de cámara) sobre los frames a medida que se
+    decodifican, y los codifica en un `AsyncVideoWriter`.
+
+    Ningún frame se guarda: la memoria depende de las colas de decodificación
+    y escritura, no de la duración del partido. Las detecciones se leen de
+    las columnas de la colección y la posesión acumulada se calcula una sola
+    vez, así cada frame cuesta lo mismo al principio y al final del video.
+    """
+
+    def __init__(
+            self,
+            tracker: Tracker,
+            camera_movement_estimator: CameraMovementEstimator,
+            speed_and_distance_estimator: SpeedAndDistanceEstimator):
+        self.tracker = tracker
+        self.camera_movement_estimator = camera_movement_estimator
+        self.speed_and_distance_estimator = speed_and_distance_estimator
+
+    def render(
+            self,
+            frames: Iterable[MatLike],
+            tracks_collection: TrackCollection,
+            team_ball_control: np.ndarray,
+            camera_movement: np.ndarray,
+            output_path: str,
+            fps: float,
+            codec: str = "XVID") -> RenderedVideo:
+        """
+        Escribe el video anotado.
+
+        Args:
+            frames (Iterable[MatLike]): Frames del video de origen, en orden;
+                se dibuja sobre ellos, así que no deben reutilizarse.
+            tracks_collection (TrackCollection): Tracks ya asignados (equipos,
+                posesión, velocidades).
+            team_ball_control (np.ndarray): Equipo en posesión por frame.
+            camera_movement (np.ndarray): (frames, 2) movimiento de cámara.
+            output_path (str): Archivo de salida.
+            fps (float): FPS del video de origen.
+            codec (str): FourCC de `VIDEO_CODECS`.
+
+        Returns:
+            RenderedVideo: Archivo escrito. Se dibujan a lo sumo los frames
+            analizados (`len(team_ball_control)`).
+        """
+        if codec not in VIDEO_CODECS:
+            raise ValueError(f"Códec de video '{codec}' no soportado: {', '.join(VIDEO_CODECS)}")
+        profiler = StageProfiler()
+        ball_control = cumulative_ball_control(team_ball_control)
+        team_colors = {
+            int(team): tuple(float(value) for value in color)
+            for team, color in tracks_collection.team_colors.items()
+        }
+
+        writer = None
+        try:
+            for frame_num, frame in enumerate(islice(frames, len(ball_control))):
+                if writer is None:
+                    writer = AsyncVideoWriter(output_path, fps, (frame.shape[1], frame.shape[0]), codec)
+                with profiler.span("annotate", frames=1):
+                    self.annotate(
+                        frame_num, frame, tracks_collection, team_colors,
+                        ball_control[frame_num], camera_movement[frame_num])
+                writer.write(frame)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if writer is None:
+            return RenderedVideo(str(output_path), 0, fps, 0)
+        return RenderedVideo(writer.path, writer.frames, fps, os.path.getsize(writer.path))
+
+    def annotate(
+            self,
+            frame_num: int,
+            frame: MatLike,
+            tracks_collection: TrackCollection,
+            team_colors: dict,
+            ball_control: np.ndarray,
+            camera_movement: np.ndarray) -> MatLike:
+        """Dibuja las anotaciones de un frame, en el lugar."""
+        rows = tracks_collection.rows_for_frame("players", frame_num)
+        if len(rows):
+            track_ids = tracks_collection.get_column("players", "track_id")[rows].tolist()
+            bboxes = tracks_collection.get_column("players", "bbox")[rows]
+            teams = tracks_collection.get_column("players", "team")[rows].tolist()
+            has_ball = tracks_collection.get_column("players", "has_ball")[rows].tolist()
+            speeds = tracks_collection.get_column("players", "speed")[rows]
+            distances = tracks_collection.get_column("players", "distance")[rows]
+            for i, track_id in enumerate(track_ids):
+                bbox = bboxes[i]
+                if np.isnan(bbox).any():
+                    continue
+                color = team_colors.get(teams[i], DEFAULT_PLAYER_COLOR)
+                self.tracker.draw_player(frame, bbox, color, track_id, has_ball[i])
+                if not (np.isnan(speeds[i]) or np.isnan(distances[i])):
+                    self.speed_and_distance_estimator.draw_speed_and_distance_label(
+                        frame, bbox, float(speeds[i]), float(distances[i]))
+
+        rows = tracks_collection.rows_for_frame("ball", frame_num)
+        for bbox in tracks_collection.get_column("ball", "bbox")[rows]:
+            if not np.isnan(bbox).any():
+                self.tracker.draw_triangle(frame, bbox, (0, 255, 0))
+
+        self.tracker.draw_ball_control(frame, *ball_control)
+        self.camera_movement_estimator.draw_camera_movement_frame(frame, *camera_movement)
+        return frame
@@ -32,54 +32,85 @@ class ViewTransformer:
             self.target_vertices
         )
 
+    def points_inside_court(self, points: np.ndarray) -> np.ndarray:
+        """
+        Versión vectorizada de `cv2.pointPolygonTest(..., False) >= 0`.
+
+        Usa la regla par-impar sobre las aristas del cuadrilátero de la
+        cancha; los puntos se truncan a enteros como en la prueba original
+        y los que caen sobre una arista se consideran dentro.
+
+        Args:
+            points (np.ndarray): Puntos en píxeles, shape (N, 2).
+
+        Returns:
+            np.ndarray: Máscara booleana (N,) de puntos dentro de la cancha.
+        """
+        points = np.trunc(np.asarray(points, dtype=np.float64).reshape(-1, 2))
+        px, py = points[:, 0], points[:, 1]
+        vertices = self.pixel_vertices.astype(np.float64)
+
+        inside = np.zeros(len(points), dtype=bool)
+        on_edge = np.zeros(len(points), dtype=bool)
+        for (xi, yi), (xj, yj) in zip(vertices, np.roll(vertices, -1, axis=0)):
+            crosses = (yi > py) != (yj > py)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                x_intersection = (xj - xi) * (py - yi) / (yj - yi) + xi
+            inside ^= crosses & (px < x_intersection)
+
+            cross = (xj - xi) * (py - yi) - (yj - yi) * (px - xi)
+            on_edge |= (cross == 0) \
+                & (np.minimum(xi, xj) <= px) & (px <= np.maximum(xi, xj)) \
+                & (np.minimum(yi, yj) <= py) & (py <= np.maximum(yi, yj))
+        return inside | on_edge
+
+    def transform_points(self, points) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Transforma en bloque puntos de la imagen a coordenadas de la cancha.
+
+        Hace una sola llamada a `cv2.perspectiveTransform` para todos los
+        puntos válidos (finitos y dentro de la cancha).
+
+        Args:
+            points: Puntos en píxeles, shape (N, 2). Se admiten NaN.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Coordenadas en metros (N, 2), con
+            NaN en los puntos inválidos, y la máscara de validez (N,).
+        """
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        valid = np.isfinite(points).all(axis=1)
+        valid[valid] = self.points_inside_court(points[valid])
+
+        transformed = np.full(points.shape, np.nan, dtype=np.float32)
+        if valid.any():
+            transformed[valid] = cv2.perspectiveTransform(
+                points[valid].reshape(-1, 1, 2),
+                self.perspective_transform
+            ).reshape(-1, 2)
+        return transformed, valid
+
     def transform_point(self, point):
         """Transform a point from image coordinates to court coordinates"""
-        # Convert to integer for polygon test
-        int_point = (int(point[0]), int(point[1]))
-
-        # Check if point is within the court boundaries
-        if cv2.pointPolygonTest(self.pixel_vertices, int_point, False) < 0:
+        transformed, valid = self.transform_points(np.asarray(point))
+        if not valid[0]:
             return None
 
-        # Reshape point to OpenCV format: (1, 1, 2)
-        reshaped_point = point.reshape(-1, 1, 2).astype(np.float32)
-
-        # Apply perspective transformation
-        transformed_point = cv2.perspectiveTransform(
-            reshaped_point,
-            self.perspective_transform
-        )
-
         # Return as flat (x,y) coordinates
-        return transformed_point.reshape(-1, 2)
+        return transformed
 
     def add_transformed_position_to_tracks(
             self,
             tracks_collection: TrackCollection):
         """Add transformed positions to tracking data"""
-        for entity_type, frames in tracks_collection.tracks.items():
-            for frame_num, tracks_in_frames in frames.items():
-                for track_id, track_detail in tracks_in_frames.items():
-                    # Get adjusted position from tracking data
-                    position_adjusted = np.array(
-                        track_detail.position_adjusted)
-                    # Transform to court coordinates
-                    position_transformed = self.transform_point(
-                        position_adjusted)
-
-                    # Store result (converted to list if valid)
-                    position_transformed = (
-                        position_transformed.squeeze().tolist()
-                        if position_transformed is not None
-                        else None)
-                    track_detail.update(position_transformed=position_transformed)
-                    # track_detail.position_transformed = position_transformed
-                    tracks_collection.update_track(
-                        entity_type=entity_type,
-                        frame_num=frame_num,
-                        track_id=track_id,
-                        track_detail=track_detail
-                    )
+        for entity_type in tracks_collection.columns:
+            # Adjusted positions of every detection of the video, shape (N, 2)
+            position_adjusted = tracks_collection.get_column(
+                entity_type, "position_adjusted")
+            # Invalid points are stored as NaN
+            position_transformed, _ = self.transform_points(position_adjusted)
+            tracks_collection.set_column(
+                entity_type, "position_transformed", position_transformed)
 
         # for object_type, object_tracks in tracks.items():
         #     for frame_idx, frame_tracks in enumerate(object_tracks):
@@ -0,0 +1,79 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analisis.tasks.benchmark import (
+    STAGES, BenchmarkContext, MatchSpec, SyntheticMatch, build_report, compare_to_baseline, load_baseline,
+    run_benchmarks, save_baseline)
+
+DEFAULT_SPEC = MatchSpec()
+
+
+def parse_resolution(value: str) -> tuple[int, int]:
+    try:
+        width, height = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise CommandError(f"Resolución inválida '{value}', se espera ANCHOxALTO (ej: 1280x720)")
+    return width, height
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el tiempo de cada etapa del análisis sobre un partido sintético "
+        "(elipses de colores y un detector simulado, sin modelo ni red) y lo "
+        "compara opcionalmente con una línea base JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--frames", type=int, default=DEFAULT_SPEC.frames, help="Largo del partido en frames.")
+        parser.add_argument("--players", type=int, default=DEFAULT_SPEC.players, help="Jugadores de campo.")
+        parser.add_argument("--resolution", default=f"{DEFAULT_SPEC.width}x{DEFAULT_SPEC.height}", help="ANCHOxALTO.")
+        parser.add_argument("--fps", type=float, default=DEFAULT_SPEC.fps)
+        parser.add_argument("--seed", type=int, default=DEFAULT_SPEC.seed)
+        parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por etapa (se reporta la mediana).")
+        parser.add_argument("--stage", action="append", choices=list(STAGES), dest="stages",
+                            help="Etapa a medir; se puede repetir. Por defecto todas.")
+        parser.add_argument("--save-baseline", type=Path, default=None, help="Guarda el reporte como línea base.")
+        parser.add_argument("--baseline", type=Path, default=None, help="Línea base contra la que comparar.")
+        parser.add_argument("--tolerance", type=float, default=0.15,
+                            help="Fracción más lenta que la línea base que cuenta como regresión.")
+        parser.add_argument("--output", type=Path, default=None, help="Guarda el reporte JSON en este archivo.")
+
+    def handle(self, *args, **options):
+        if options["frames"] < 2 or options["players"] < 2:
+            raise CommandError("Se necesitan al menos 2 frames y 2 jugadores.")
+        if options["baseline"] is not None and not options["baseline"].is_file():
+            raise CommandError(f"No existe la línea base {options['baseline']}")
+
+        width, height = parse_resolution(options["resolution"])
+        spec = MatchSpec(
+            frames=options["frames"], players=options["players"],
+            width=width, height=height, fps=options["fps"], seed=options["seed"])
+
+        context = BenchmarkContext(SyntheticMatch(spec))
+        try:
+            results = run_benchmarks(context, options["stages"], options["repeat"])
+        finally:
+            context.close()
+
+        report = build_report(spec, results)
+        if options["save_baseline"]:
+            save_baseline(report, options["save_baseline"])
+
+        regressions = []
+        if options["baseline"] is not None:
+            baseline = load_baseline(options["baseline"])
+            if baseline.get("match") != report["match"]:
+                self.stderr.write("La línea base se midió con otro partido sintético; los tiempos no son comparables.")
+            comparisons = compare_to_baseline(report, baseline, options["tolerance"])
+            report["comparison"] = [comparison._asdict() for comparison in comparisons]
+            regressions = [comparison.stage for comparison in comparisons if comparison.regressed]
+
+        text = json.dumps(report, indent=2)
+        if options["output"]:
+            options["output"].write_text(text)
+        self.stdout.write(text)
+
+        if regressions:
+            raise CommandError(f"Regresión de rendimiento en: {', '.join(regressions)}")
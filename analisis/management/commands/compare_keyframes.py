@@ -0,0 +1,90 @@
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from pydantic import ValidationError
+
+from analisis.entities.options import AnalysisOptions
+from analisis.infraestructure.services.video_processing_service import stream_video
+from analisis.tasks.analysis import preprocessing
+from analisis.tasks.analysis.keyframe_report import compare_boxes, snapshot_boxes
+from analisis.tasks.worker_setup import prepare_worker
+
+# Campo de AnalysisOptions -> opción del comando
+OPTION_FLAGS = {
+    "detection_stride": "--stride",
+    "max_camera_motion": "--max-camera-motion",
+    "min_detection_confidence": "--min-confidence",
+}
+
+
+def describe_option_errors(error: ValidationError) -> str:
+    """Errores de AnalysisOptions con el nombre de la opción del comando que los causó."""
+    messages = []
+    for detail in error.errors():
+        field = str(detail["loc"][0]) if detail["loc"] else "opciones"
+        messages.append(f"{OPTION_FLAGS.get(field, field)}: {detail['msg']}")
+    return "; ".join(messages)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el tracking con detección por keyframes contra la detección en "
+        "todos los frames de un video local: precisión de las cajas y tiempo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("video_path", type=Path)
+        parser.add_argument("--stride", type=int, default=5, help="Frames entre keyframes.")
+        parser.add_argument("--max-camera-motion", type=float, default=None,
+                            help="Movimiento de cámara (px) que fuerza un keyframe.")
+        parser.add_argument("--min-confidence", type=float, default=None,
+                            help="Confianza media bajo la cual se fuerza un keyframe.")
+        parser.add_argument("--iou", type=float, default=0.5, help="IoU mínimo para emparejar cajas.")
+        parser.add_argument("--output", type=Path, default=None, help="Guarda el reporte JSON en este archivo.")
+
+    def handle(self, *args, **options):
+        video_path: Path = options["video_path"]
+        if not video_path.is_file():
+            raise CommandError(f"No existe el video {video_path}")
+
+        try:
+            keyframe_options = AnalysisOptions(
+                detection_stride=options["stride"],
+                max_camera_motion=options["max_camera_motion"],
+                min_detection_confidence=options["min_confidence"])
+        except ValidationError as e:
+            raise CommandError(describe_option_errors(e))
+        components = prepare_worker()
+
+        # Without cached detections both runs go through the model
+        runs = {}
+        for name, run_options in (("full", None), ("keyframes", keyframe_options)):
+            components.reset()
+            start = time.perf_counter()
+            result = preprocessing(components, stream_video(str(video_path)), options=run_options)
+            elapsed = time.perf_counter() - start
+            runs[name] = {
+                "seconds": round(elapsed, 3),
+                "fps": round(result.frame_count / elapsed, 2) if elapsed else None,
+                "detected_frames": result.detected_frames,
+                "boxes": snapshot_boxes(components.tracks_collection),
+            }
+            frame_count = result.frame_count
+
+        report = {
+            "video": str(video_path),
+            "frames": frame_count,
+            "options": keyframe_options.model_dump(),
+            "iou_threshold": options["iou"],
+            "runs": {name: {k: v for k, v in run.items() if k != "boxes"} for name, run in runs.items()},
+            "speedup": round(runs["full"]["seconds"] / runs["keyframes"]["seconds"], 2)
+            if runs["keyframes"]["seconds"] else None,
+            "accuracy": compare_boxes(runs["full"]["boxes"], runs["keyframes"]["boxes"], options["iou"]),
+        }
+
+        text = json.dumps(report, indent=2)
+        if options["output"]:
+            options["output"].write_text(text)
+        self.stdout.write(text)
@@ -1,11 +1,31 @@
+from pydantic import ValidationError
 from rest_framework import serializers
 from urllib.parse import urlparse
 
+from analisis.entities.options import AnalysisOptions
+
+
+class AnalysisOptionsSerializer(serializers.Serializer):
+    detection_stride = serializers.IntegerField(required=False, min_value=1, max_value=30)
+    max_camera_motion = serializers.FloatField(required=False)
+    min_detection_confidence = serializers.FloatField(required=False)
+
+    def validate(self, attrs):
+        """Las reglas de cada opción viven en AnalysisOptions, que usa la tarea."""
+        try:
+            AnalysisOptions(**attrs)
+        except ValidationError as e:
+            raise serializers.ValidationError(
+                {".".join(map(str, error["loc"])): error["msg"] for error in e.errors()})
+        return attrs
+
+
 class VideoAnalyzerSerializer(serializers.Serializer):
     video_url = serializers.URLField(required=True)
+    options = AnalysisOptionsSerializer(required=False)
 
     class Meta:
-        fields = ['video_url']
+        fields = ['video_url', 'options']
 
     def validate_video_url(self, value):
         """
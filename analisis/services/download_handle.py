@@ -0,0 +1,164 @@
+import io
+import threading
+from pathlib import Path
+from typing import Iterable, Optional
+
+
+class DownloadHandle:
+    """
+    Estado de una descarga por rangos en curso.
+
+    El archivo destino se crea con su tamaño final y cada chunk se escribe en
+    su posición a medida que llega, así que los bytes ya descargados se pueden
+    leer antes de que termine la descarga (ver `open`).
+    """
+
+    def __init__(self, path: Path, size: int, chunk_size: int, done_chunks: Iterable[int] = ()):
+        self.path = path
+        self.size = size
+        self.chunk_size = chunk_size
+        self.chunk_count = (size + chunk_size - 1) // chunk_size
+        self._done = set(done_chunks)
+        self._error: Optional[BaseException] = None
+        self._condition = threading.Condition()
+
+    def chunk_range(self, index: int) -> tuple[int, int]:
+        """Rango [inicio, fin) en bytes del chunk."""
+        start = index * self.chunk_size
+        return start, min(start + self.chunk_size, self.size)
+
+    @property
+    def done(self) -> bool:
+        with self._condition:
+            return len(self._done) >= self.chunk_count
+
+    @property
+    def progress(self) -> float:
+        with self._condition:
+            return len(self._done) / self.chunk_count if self.chunk_count else 1.0
+
+    @property
+    def error(self) -> Optional[BaseException]:
+        return self._error
+
+    def pending_chunks(self) -> list[int]:
+        with self._condition:
+            return [i for i in range(self.chunk_count) if i not in self._done]
+
+    def done_chunks(self) -> list[int]:
+        with self._condition:
+            return sorted(self._done)
+
+    def mark_done(self, index: int) -> None:
+        with self._condition:
+            self._done.add(index)
+            self._condition.notify_all()
+
+    def fail(self, error: BaseException) -> None:
+        with self._condition:
+            if self._error is None:
+                self._error = error
+            self._condition.notify_all()
+
+    def _range_ready(self, start: int, end: int) -> bool:
+        if end <= start:
+            return True
+        first, last = start // self.chunk_size, (end - 1) // self.chunk_size
+        return all(i in self._done for i in range(first, last + 1))
+
+    def wait_for_range(self, start: int, end: int, timeout: Optional[float] = None) -> None:
+        """
+        Bloquea hasta que los bytes [start, end) estén en disco.
+
+        Raises:
+            TimeoutError: Si no llegan antes de `timeout` segundos.
+            Exception: El error de la descarga, si falló.
+        """
+        end = min(end, self.size)
+        with self._condition:
+            ready = self._condition.wait_for(
+                lambda: self._error is not None or self._range_ready(start, end), timeout)
+            if self._error is not None:
+                raise self._error
+            if not ready:
+                raise TimeoutError(f"Bytes {start}-{end} de {self.path} no disponibles a tiempo")
+
+    def wait(self, timeout: Optional[float] = None) -> Path:
+        """Espera a que termine la descarga y devuelve la ruta del archivo."""
+        self.wait_for_range(0, self.size, timeout)
+        return self.path
+
+    def open(self) -> "GrowingFileReader":
+        """Abre un lector independiente que espera los bytes que aún no llegan."""
+        return GrowingFileReader(self)
+
+
+class GrowingFileReader(io.BufferedIOBase):
+    """
+    Lector de solo lectura sobre un archivo que se está descargando.
+
+    `read` bloquea hasta que el rango pedido está descargado, por lo que se
+    puede pasar a `cv2.VideoCapture` para decodificar mientras se descarga.
+
+    Si la descarga falla, `read` se comporta como fin de archivo: OpenCV no
+    soporta excepciones desde el stream. El error se obtiene con
+    `DownloadHandle.wait()` o `DownloadHandle.error`.
+    """
+
+    def __init__(self, handle: DownloadHandle):
+        super().__init__()
+        self.handle = handle
+        self._file = open(handle.path, "rb")
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.handle.size + offset
+        else:
+            raise ValueError(f"whence inválido: {whence}")
+        if position < 0:
+            raise ValueError("No se puede posicionar antes del inicio del archivo")
+        self._position = position
+        return position
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        if self.closed:
+            raise ValueError("Lectura sobre un archivo cerrado")
+        end = self.handle.size if size is None or size < 0 \
+            else min(self._position + size, self.handle.size)
+        if end <= self._position:
+            return b""
+        try:
+            self.handle.wait_for_range(self._position, end)
+        except Exception:
+            return b""
+        self._file.seek(self._position)
+        data = self._file.read(end - self._position)
+        self._position += len(data)
+        return data
+
+    def read1(self, size: int = -1) -> bytes:
+        return self.read(size)
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            self._file.close()
+        super().close()
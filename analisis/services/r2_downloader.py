@@ -1,39 +1,207 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from analisis.entities.utils.singleton import Singleton
+from typing import Optional
+from urllib.parse import urlparse
+
 import boto3
+from botocore.config import Config
+
+from analisis.entities.utils.singleton import Singleton
+from analisis.infraestructure.structured_logging import get_logger
+from analisis.services.download_handle import DownloadHandle
+
+log = get_logger("download")
+
 
 class R2Downloader(metaclass=Singleton):
     def __init__(self, config: dict):
+        self.max_workers = int(config.get("MAX_WORKERS", 8))
+        # Un único cliente (thread-safe) con tantas conexiones como hilos
         self.s3 = boto3.client(
             "s3",
             endpoint_url=config["ENDPOINT"],
             aws_access_key_id=config["ACCESS_KEY_ID"],
             aws_secret_access_key=config["SECRET_ACCESS_KEY"],
+            config=Config(
+                max_pool_connections=self.max_workers,
+                retries={"max_attempts": 5, "mode": "adaptive"}),
         )
         self.bucket = config["BUCKET"]
 
-    def build_destination_path(self, key: str, base_dir: str = "./tmp") -> Path:
+    def resolve_key(self, video_url: str) -> str:
+        """
+        Obtiene el key del objeto a partir de la URL de R2
+        (`https://<cuenta>.r2.cloudflarestorage.com/<bucket>/<key>`).
+        Si no es una URL se asume que ya es un key.
+        """
+        parsed = urlparse(video_url)
+        if not parsed.scheme:
+            return video_url
+        key = parsed.path.lstrip("/")
+        bucket_prefix = f"{self.bucket}/"
+        return key[len(bucket_prefix):] if key.startswith(bucket_prefix) else key
+
+    def build_destination_path(self, key: str, etag: str = "", base_dir: str = "./tmp") -> Path:
         """
         Construye un Path válido para guardar el archivo usando pathlib.
-        Extrae automáticamente el nombre del archivo desde el key.
+
+        El nombre es el del key más un hash del key completo y del ETag: dos
+        objetos con el mismo nombre en carpetas distintas, o dos versiones
+        del mismo objeto, nunca comparten archivo.
         """
         base = Path(base_dir)
-        base.mkdir(parents=True, exist_ok=True) 
+        base.mkdir(parents=True, exist_ok=True)
 
-        filename = Path(key).name
-        return base / filename
+        name = Path(key)
+        digest = hashlib.sha1(f"{key}\n{etag}".encode()).hexdigest()[:12]
+        return base / f"{name.stem}-{digest}{name.suffix}"
 
-    def stream_download(self, key: str, destination_path: str, chunk_size=1024*1024*16):
+    def stream_download(
+            self,
+            key: str,
+            destination_path: Optional[str] = None,
+            chunk_size=1024*1024*16) -> Path:
         """
-        Descarga el archivo en chunks (16 MB por defecto).
+        Descarga el archivo completo por rangos en paralelo y espera a que termine.
         Soporta archivos grandes (+5GB).
+
+        Returns:
+            Path: Ruta del archivo descargado.
         """
-        with open(destination_path, "wb") as f:
-            obj = self.s3.get_object(Bucket=self.bucket, Key=key)
-            body = obj["Body"]
-            while True:
-                chunk = body.read(chunk_size)
-                if not chunk:
-                    break
-                f.write(chunk)
-                f.flush()
\ No newline at end of file
+        return self.start_download(key, destination_path, chunk_size).wait()
+
+    def start_download(
+            self,
+            key: str,
+            destination_path: Optional[str] = None,
+            chunk_size=1024*1024*16) -> DownloadHandle:
+        """
+        Inicia la descarga del objeto en chunks de `chunk_size` bytes que se
+        piden en paralelo con rangos HTTP, y retorna sin esperar.
+
+        Los chunks terminados se registran en un archivo `<destino>.download.json`;
+        si la descarga se interrumpe, una nueva llamada con el mismo objeto
+        (mismo ETag y tamaño) solo pide los chunks que faltan.
+
+        Args:
+            key (str): Key del objeto en el bucket.
+            destination_path (str | None): Archivo destino; por defecto
+                `build_destination_path(key, etag)`.
+            chunk_size (int): Tamaño de cada rango (16 MB por defecto).
+
+        Returns:
+            DownloadHandle: Estado de la descarga; `open()` permite leer el
+            archivo mientras se descarga y `wait()` espera a que termine.
+        """
+        head = self.s3.head_object(Bucket=self.bucket, Key=key)
+        size = int(head["ContentLength"])
+        etag = head.get("ETag", "")
+
+        path = Path(destination_path) if destination_path else self.build_destination_path(key, etag)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        progress_path = path.with_name(path.name + ".download.json")
+        # Otro trabajo del host puede estar bajando y leyendo el mismo archivo
+        with open(path.with_name(path.name + ".download.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            done_chunks = self._load_progress(progress_path, path, size, etag, chunk_size)
+            if not path.exists() or path.stat().st_size != size:
+                # Se reserva el tamaño final para escribir cada chunk en su
+                # posición. Un archivo del mismo tamaño no se trunca: sus
+                # chunks se vuelven a escribir con los mismos bytes
+                with open(path, "wb") as f:
+                    f.truncate(size)
+
+        handle = DownloadHandle(path, size, chunk_size, done_chunks)
+        pending = handle.pending_chunks()
+        if not pending:
+            return handle
+
+        # El último chunk va primero: los MP4 sin "faststart" guardan el índice
+        # (moov) al final y el decodificador lo necesita antes que los frames
+        if pending[-1] == handle.chunk_count - 1:
+            pending = pending[-1:] + pending[:-1]
+
+        progress_lock = threading.Lock()
+        saved_chunks = set(done_chunks)
+        executor = ThreadPoolExecutor(
+            max_workers=min(self.max_workers, len(pending)),
+            thread_name_prefix="r2-download")
+
+        def on_chunk_done(future: Future, index: int):
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is not None:
+                handle.fail(error)
+                executor.shutdown(wait=False, cancel_futures=True)
+                return
+            # El progreso se guarda antes de avisar: quien vuelve de `wait()`
+            # encuentra el archivo de progreso completo. Si no se puede
+            # guardar solo se pierde la reanudación, el chunk está escrito
+            with progress_lock:
+                saved_chunks.add(index)
+                try:
+                    self._save_progress(progress_path, size, etag, chunk_size, sorted(saved_chunks))
+                except OSError as e:
+                    log.warning("download_progress_not_saved", file=progress_path.name, error=str(e))
+            handle.mark_done(index)
+            if handle.done:
+                executor.shutdown(wait=False)
+
+        # Los callbacks se registran después de encolar todo: un chunk que
+        # falla rápido cierra el executor y no debe cortar el encolado
+        futures = {index: executor.submit(self._download_chunk, key, handle, index)
+                   for index in pending}
+        for index, future in futures.items():
+            future.add_done_callback(lambda f, i=index: on_chunk_done(f, i))
+        return handle
+
+    def _download_chunk(self, key: str, handle: DownloadHandle, index: int) -> None:
+        start, end = handle.chunk_range(index)
+        obj = self.s3.get_object(Bucket=self.bucket, Key=key, Range=f"bytes={start}-{end - 1}")
+        body = obj["Body"]
+        with open(handle.path, "r+b") as f:
+            f.seek(start)
+            for data in body.iter_chunks(chunk_size=1024 * 1024):
+                f.write(data)
+            if f.tell() != end:
+                raise IOError(
+                    f"Chunk {index} de {key} incompleto: {f.tell() - start} de {end - start} bytes")
+
+    def _load_progress(
+            self,
+            progress_path: Path,
+            path: Path,
+            size: int,
+            etag: str,
+            chunk_size: int) -> list[int]:
+        """Chunks ya descargados de una descarga previa del mismo objeto."""
+        if not progress_path.exists() or not path.exists() or path.stat().st_size != size:
+            return []
+        try:
+            progress = json.loads(progress_path.read_text())
+        except (OSError, ValueError):
+            return []
+        if progress.get("etag") != etag or progress.get("size") != size \
+                or progress.get("chunk_size") != chunk_size:
+            return []
+        return list(progress.get("done", []))
+
+    def _save_progress(
+            self,
+            progress_path: Path,
+            size: int,
+            etag: str,
+            chunk_size: int,
+            done_chunks: list[int]) -> None:
+        # Escritura atómica: un corte a mitad no deja el progreso corrupto
+        tmp_path = progress_path.with_name(f"{progress_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(
+            {"etag": etag, "size": size, "chunk_size": chunk_size, "done": done_chunks}))
+        os.replace(tmp_path, progress_path)
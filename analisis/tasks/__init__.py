@@ -1 +1,2 @@
-from .analysis_runner import run_analysis
\ No newline at end of file
+from .analysis_runner import run_analysis
+from . import worker_setup
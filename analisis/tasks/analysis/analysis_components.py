@@ -5,30 +5,79 @@ from analisis.entities.trackers.ball_tracker import BallTracker
 from analisis.entities.trackers.player_tracker import PlayerTracker
 from analisis.entities.utils.singleton import Singleton
 from analisis.infraestructure.camera_movement_estimator.camera_movement_estimator import CameraMovementEstimator
+from analisis.infraestructure.detection_cache import DetectionCache
+from analisis.infraestructure.inference_roi import InferenceRoi
+from analisis.infraestructure.model_backend import resolve_model_path
 from analisis.infraestructure.player_ball_assigner.player_ball_assigner import PlayerBallAssigner
 from analisis.infraestructure.speed_and_distance_estimator.speed_and_distance_estimator import SpeedAndDistanceEstimator
 from analisis.infraestructure.team_assigner.team_assigner import TeamAssigner
 from analisis.infraestructure.trackers.services.tracker_service import TrackerService
 from analisis.infraestructure.view_transformer.view_transformer import ViewTransformer
+from analisis.tasks.analysis.batch_tuning import configure_batch_tuner
 from cv2.typing import MatLike
+from decouple import config
 
 
 model_path = Path("../res/models/football_model.torchscript")
 
 class AnalysisComponents(metaclass=Singleton):
-    def __init__(self, video_frame: MatLike) -> None:
-        self.tracker: TrackerService = TrackerService(model_path.as_posix())
+    """
+    Components of the analysis, built once per worker process (the model
+    load is the expensive part) and reset between jobs with `reset`.
+    """
+
+    def __init__(self, video_frame: MatLike | None = None) -> None:
+        configure_batch_tuner()
+        self.tracker: TrackerService = TrackerService(
+            AnalysisComponents.get_inference_model_path().as_posix())
         self.tracker.create_tracker("player", PlayerTracker)
         self.tracker.create_tracker("ball", BallTracker)
 
         self.tracks_collection: TrackCollection = TrackCollection()
         self.view_transformer: ViewTransformer = ViewTransformer()
+        self.tracker.inference_roi = AnalysisComponents.get_inference_roi(self.view_transformer)
         self.speed_and_distance_estimator: SpeedAndDistanceEstimator = SpeedAndDistanceEstimator()
         self.team_assigner: TeamAssigner = TeamAssigner()
         self.player_assigner: PlayerBallAssigner = PlayerBallAssigner()
-        self.camera_movement_estimator: CameraMovementEstimator = CameraMovementEstimator(video_frame)
+        self.camera_movement_estimator: CameraMovementEstimator = CameraMovementEstimator(
+            video_frame,
+            scale=config("CAMERA_MOVEMENT_SCALE", default=1.0, cast=float))
+        self.detection_cache: DetectionCache = DetectionCache(
+            config("DETECTION_CACHE_DIR", default="../res/cache/detections"),
+            max_bytes=config("DETECTION_CACHE_MAX_MB", default=4096, cast=int) * 1024 * 1024)
 
+    def reset(self) -> None:
+        """Clears the per-video state so the next job starts from scratch."""
+        self.tracker.reset()
+        self.tracker.batch_tuner.reset()
+        self.tracks_collection.clear()
+        self.team_assigner.reset()
+        self.camera_movement_estimator.reset()
 
     @staticmethod
     def get_model_path() -> Path:
-        return model_path
\ No newline at end of file
+        return model_path
+
+    @staticmethod
+    def get_inference_roi(view_transformer: ViewTransformer) -> InferenceRoi | None:
+        """
+        Pitch crop and/or downscale applied to the frames before inference,
+        from INFERENCE_ROI_CROP and INFERENCE_TARGET_SIZE; None when both are off.
+        """
+        crop = config("INFERENCE_ROI_CROP", default=False, cast=bool)
+        target_size = config("INFERENCE_TARGET_SIZE", default=0, cast=int) or None
+        if not crop and target_size is None:
+            return None
+        return InferenceRoi(
+            view_transformer.pixel_vertices if crop else None,
+            margin=config("INFERENCE_ROI_MARGIN", default=0.1, cast=float),
+            target_size=target_size)
+
+    @staticmethod
+    def get_inference_model_path() -> Path:
+        """
+        Model loaded for inference: the TorchScript file, or its ONNX /
+        OpenVINO export when INFERENCE_BACKEND asks for one.
+        """
+        return resolve_model_path(
+            model_path, config("INFERENCE_BACKEND", default="torchscript", cast=str))
\ No newline at end of file
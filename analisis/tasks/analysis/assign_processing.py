@@ -1,10 +1,12 @@
 import numpy as np
-from analisis.entities.tracks.track_detail import TrackDetailBase, TrackPlayerDetail
+from analisis.infraestructure.stage_profiler import StageProfiler
+from analisis.infraestructure.structured_logging import get_logger
 from analisis.tasks.analysis.analysis_components import AnalysisComponents
-from typing import List
-from cv2.typing import MatLike
 
-def assign_processing(components: AnalysisComponents, video_frames: List[MatLike]):
+log = get_logger("assignment")
+
+
+def assign_processing(components: AnalysisComponents, total_frames: int | None = None):
     # Assign players team
     """
     Assign team and ball acquisition to players in a video.
@@ -12,81 +14,53 @@ def assign_processing(components: AnalysisComponents, video_frames: List[MatLike
     Parameters
     ----------
     components : AnalysisComponents
-        Object containing the tracks collection and team assigner.
-    video_frames : List[MatLike]
-        List of frames from the video.
+        Object containing the tracks collection and team assigner. The player
+        colors must have been collected while the frames were decoded.
+    total_frames : int, optional
+        Number of frames of the video. Defaults to the last tracked frame + 1.
 
     Returns
     -------
     team_ball_control : np.ndarray
         Array of length equal to the number of frames in the video, where each element is the team id of the player who has the ball in that frame.
     """
-    for frame_num, track_content in components.tracks_collection.tracks["players"].items():
-        print("Assigning player teams...", components.tracks_collection.tracks["players"][frame_num].values())
-        components.team_assigner.assign_team_color(
-            video_frames[0],
-            components.tracks_collection.tracks["players"][frame_num])
-        continue
+    tracks_collection = components.tracks_collection
+    profiler = StageProfiler()
+
+    player_frames = tracks_collection.get_column("players", "frame")
+    ball_frames = tracks_collection.get_column("ball", "frame")
+    if total_frames is None:
+        total_frames = int(max(player_frames.max(initial=-1), ball_frames.max(initial=-1))) + 1
 
-    for frame_num, player_track in components.tracks_collection.tracks["players"].items():
-        for player_id, track in player_track.items():
-            team = components.team_assigner.get_player_team(
-                video_frames[frame_num],
-                track.bbox,
-                player_id
-            )
-            player_tracker = TrackPlayerDetail(**track.model_dump())
-            player_tracker.update(team=team, team_color=components.team_assigner.team_colors[team])
-            # player_tracker.team = team
-            # player_tracker.team_color = team_assigner.team_colors[team]
-            components.tracks_collection.update_track(
-                entity_type="players",
-                frame_num=frame_num,
-                track_id=player_id,
-                track_detail=player_tracker
-            )
+    log.debug("team_assignment_started", players=len(components.team_assigner.player_colors))
+    with profiler.span("team", frames=total_frames):
+        components.team_assigner.assign_team_color()
+
+        # The team is resolved once per track id and broadcast to its detections
+        player_ids = tracks_collection.get_column("players", "track_id")
+        unique_ids, detection_ids = np.unique(player_ids, return_inverse=True)
+        teams = np.array(
+            [components.team_assigner.get_player_team(int(player_id)) for player_id in unique_ids],
+            dtype=np.int8)
+        tracks_collection.set_column("players", "team", teams[detection_ids])
+        tracks_collection.team_colors.update(components.team_assigner.team_colors)
 
     # Assign Ball Acquisition
-    team_ball_control = []
-    print("Assigning ball to players...")
-    print("Total frames to assign ball: ", len(components.tracks_collection.tracks["players"]))
-    for frame_num, player_track in components.tracks_collection.tracks["players"].items():
-        print("Processing frame number: ", frame_num)
-        print("Ball tracks length: ", components.tracks_collection.tracks['ball'].values())
-        ball_frame_tracks = components.tracks_collection.tracks.get('ball', {}).get(int(frame_num))
-        
-        if not ball_frame_tracks or 1 not in ball_frame_tracks:
-            print("No ball track for this frame, appending -1")
-            team_ball_control.append(team_ball_control[-1] if team_ball_control else -1)
-            continue
-        
-        ball_detail = next(iter(ball_frame_tracks.values()))
-        ball_bbox = ball_detail.bbox
-        assigned_player = components.player_assigner.assign_ball_to_player(
-            player_track, ball_bbox)
-        print("Assigned player: ", assigned_player)
+    log.debug("ball_assignment_started", frames=total_frames)
+    with profiler.span("possession", frames=total_frames):
+        ball_bboxes = tracks_collection.get_column("ball", "bbox")
+        ball_centers = np.full((total_frames, 2), np.nan, dtype=np.float32)
+        ball_centers[ball_frames] = np.trunc((ball_bboxes[:, :2] + ball_bboxes[:, 2:]) / 2)
+
+        assignment = components.player_assigner.assign_ball_to_players(
+            player_frames=player_frames,
+            player_ids=player_ids,
+            player_bboxes=tracks_collection.get_column("players", "bbox"),
+            player_teams=tracks_collection.get_column("players", "team"),
+            ball_centers=ball_centers)
 
-        if assigned_player != -1:
-            player_base: TrackDetailBase = player_track[assigned_player]
-            print("Actual player track: ", player_base)
-            dict_player = player_base.model_dump()
-            print("Updated player team: ", dict_player['team'])
-            print("Updated player team color: ", dict_player['team_color'])
-            print("Dict player: ", TrackPlayerDetail.model_validate(dict_player))
-            player: TrackPlayerDetail = TrackPlayerDetail(**dict_player)
-            player.update(has_ball=True)
-            # player.has_ball = True
-            team_ball_control.append(player.team)
-            components.tracks_collection.update_track(
-                entity_type="players",
-                frame_num=frame_num,
-                track_id=assigned_player,
-                track_detail=player
-            )
-        else:
-            # Handle first frame case
-            team_ball_control.append(
-                team_ball_control[-1] if team_ball_control else -1)
+        assigned_rows = assignment.player_rows[assignment.player_rows >= 0]
+        tracks_collection.set_column("players", "has_ball", False)
+        tracks_collection.set_column("players", "has_ball", True, rows=assigned_rows)
 
-    team_ball_control = np.array(team_ball_control)
-    return team_ball_control
\ No newline at end of file
+    return assignment.team_ball_control
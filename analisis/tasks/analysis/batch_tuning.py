@@ -0,0 +1,126 @@
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from analisis.entities.interfaces import TrackerServiceBase
+from analisis.infraestructure.batch_size_tuner import (DEFAULT_BATCH_SIZE, DEFAULT_CANDIDATES,
+                                                      BatchSizeTuner)
+from analisis.infraestructure.model_backend import model_file_lock
+from analisis.infraestructure.structured_logging import get_logger
+from decouple import Csv, config
+
+log = get_logger("inference")
+
+# Bump when the shared calibration file changes
+CALIBRATION_FORMAT_VERSION = 1
+
+
+def configure_batch_tuner() -> BatchSizeTuner:
+    """
+    Creates the process-wide BatchSizeTuner from the environment. It must run
+    before the tracker service is built, which otherwise gets the defaults.
+    """
+    return BatchSizeTuner(
+        initial_batch_size=config("INFERENCE_BATCH_SIZE", default=DEFAULT_BATCH_SIZE, cast=int),
+        candidates=config(
+            "INFERENCE_BATCH_CANDIDATES",
+            default=",".join(map(str, DEFAULT_CANDIDATES)),
+            cast=Csv(int)),
+        memory_budget_mb=config("INFERENCE_MEMORY_BUDGET_MB", default=0, cast=float) or None,
+        processes=config("INFERENCE_PROCESSES", default=0, cast=int) or 1)
+
+
+def count_inference_processes(pool: str, concurrency: int) -> int:
+    """
+    Processes of a Celery worker that load the model: every child of a
+    prefork pool; with solo or threads the jobs share the worker's model,
+    unless SEGMENT_WORKERS processes track the segments of a long video.
+    """
+    if "prefork" in pool or "processes" in pool:
+        return max(1, concurrency)
+    return max(1, config("SEGMENT_WORKERS", default=1, cast=int))
+
+
+def calibration_frame() -> np.ndarray:
+    """
+    Synthetic frame of CALIBRATION_FRAME_SIZE; inference time does not
+    depend on the image content, only on its size.
+    """
+    width, height = config(
+        "CALIBRATION_FRAME_SIZE",
+        default="1920x1080",
+        cast=lambda value: tuple(int(side) for side in value.lower().split("x")))
+    return np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+def calibrate_batch_size(tracker: TrackerServiceBase, frame: np.ndarray | None = None) -> int:
+    """
+    Calibrates the batch size of the tracker's model on `frame`, once per
+    host: the first process measures and saves the result next to the model
+    file (`<model>.batch_size.json`), and the processes that start after it
+    reuse the result, only warming the model up.
+    """
+    frame = calibration_frame() if frame is None else frame
+    # Measure on what the model actually receives (cropped/downscaled)
+    frame = np.ascontiguousarray(tracker.inference_frames([frame])[0])
+    tuner = tracker.batch_tuner
+
+    def calibrate() -> int:
+        return tuner.calibrate(lambda frames: tracker.detect_frames(frames, batch_size=len(frames)), frame)
+
+    model_path = Path(tracker.model_path)
+    if not model_path.exists():
+        return calibrate()
+
+    calibration_path = model_path.with_name(model_path.name + ".batch_size.json")
+    expected = {
+        "format": CALIBRATION_FORMAT_VERSION,
+        "model_mtime": model_path.stat().st_mtime,
+        "frame_shape": list(frame.shape),
+        "candidates": tuner.candidates,
+        "processes": tuner.processes,
+        "memory_budget_mb": config("INFERENCE_MEMORY_BUDGET_MB", default=0, cast=float),
+    }
+    # The processes that start together wait for the first calibration
+    with model_file_lock(model_path):
+        shared = read_calibration(calibration_path, expected)
+        if shared is None:
+            batch_size = calibrate()
+            write_calibration(calibration_path, expected, tuner)
+            return batch_size
+
+    tuner.use_calibration(shared["batch_size"], shared["calibration_fps"])
+    tracker.warmup(frame)
+    return tuner.batch_size
+
+
+def read_calibration(path: Path, expected: dict) -> Optional[dict]:
+    """Calibration saved by another process, if it was made for the same model and settings."""
+    try:
+        calibration = json.loads(path.read_text())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        log.warning("batch_calibration_discarded", path=str(path), error=str(e))
+        return None
+    if any(calibration.get(key) != value for key, value in expected.items()):
+        return None
+    return calibration
+
+
+def write_calibration(path: Path, expected: dict, tuner: BatchSizeTuner) -> None:
+    """Saves the calibration for the other processes; a failed write only costs them a calibration."""
+    calibration = {
+        **expected,
+        "batch_size": tuner.calibrated_batch_size,
+        "calibration_fps": {str(size): fps for size, fps in tuner.calibration_fps.items()},
+    }
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        tmp_path.write_text(json.dumps(calibration))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        log.warning("batch_calibration_not_written", path=str(path), error=str(e))
+        tmp_path.unlink(missing_ok=True)
@@ -0,0 +1,179 @@
+from typing import Dict, NamedTuple, Optional
+
+import numpy as np
+from analisis.entities.options import AnalysisOptions
+from analisis.infraestructure.checkpoint_store import CheckpointStore
+from analisis.infraestructure.player_crops import PlayerCrop
+from analisis.infraestructure.stage_profiler import StageProfiler
+from analisis.infraestructure.structured_logging import get_logger
+from analisis.tasks.analysis.analysis_components import AnalysisComponents
+from analisis.tasks.analysis.preprocessing import PreprocessingResult
+from decouple import config
+
+log = get_logger("cache")
+
+# Checkpointed stages, in pipeline order
+STAGES = ("preprocessing", "post_processing", "assignment")
+# Bump a stage version when what it leaves in the tracks changes, so older
+# checkpoints of that stage are not resumed
+STAGE_VERSIONS = {
+    "preprocessing": 2,
+    "post_processing": 2,
+    "assignment": 2,
+}
+
+_store: CheckpointStore | None = None
+
+
+class DeliveryLimitExceeded(RuntimeError):
+    """The task was delivered more than MAX_JOB_DELIVERIES times; it fails instead of running again."""
+
+
+class ResumePoint(NamedTuple):
+    """
+    - stage            : Last stage finished before the job stopped.
+    - preprocessed     : Preprocessing result, without the raw detections.
+    - fps              : FPS of the video.
+    - team_ball_control: Team in possession per frame, once "assignment" ran.
+    - player_crops     : Best crop of each player, still to be exported.
+    """
+    stage: str
+    preprocessed: PreprocessingResult
+    fps: float
+    team_ball_control: Optional[np.ndarray]
+    player_crops: Dict[int, PlayerCrop]
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    """Store from CHECKPOINT_DIR, shared by the jobs of this process."""
+    global _store
+    if _store is None:
+        _store = CheckpointStore(
+            config("CHECKPOINT_DIR", default="../res/checkpoints"),
+            ttl_s=config("CHECKPOINT_TTL_HOURS", default=24, cast=float) * 60 * 60)
+    return _store
+
+
+class JobCheckpoints:
+    """
+    Checkpoints of one job. Each one holds the whole state the next stages
+    need (tracks, camera movement, player colors and crops), so resuming
+    only reads the latest valid one.
+    """
+
+    def __init__(self, store: CheckpointStore, job_id: str, video_path: str, options: AnalysisOptions):
+        self.store = store
+        self.job_id = job_id
+        # A checkpoint is only resumed by the same job on the same input
+        self.expected = {"video": video_path, "options": options.model_dump()}
+
+    def save(
+            self,
+            stage: str,
+            components: AnalysisComponents,
+            preprocessed: PreprocessingResult,
+            fps: float,
+            player_crops: Dict[int, PlayerCrop],
+            team_ball_control: Optional[np.ndarray] = None) -> None:
+        """Saves the state after `stage`; a failed write never fails the job."""
+        arrays = components.tracks_collection.to_arrays()
+        arrays["camera_movement"] = preprocessed.camera_movement
+        # Patches still waiting for their color would be lost
+        components.team_assigner.flush_player_colors()
+        player_colors = components.team_assigner.player_colors
+        player_ids = sorted(player_colors)
+        arrays["player_colors/ids"] = np.asarray(player_ids, dtype=np.int64)
+        arrays["player_colors/colors"] = np.asarray(
+            [player_colors[player_id] for player_id in player_ids], dtype=np.float64).reshape(-1, 3)
+        if team_ball_control is not None:
+            arrays["team_ball_control"] = np.asarray(team_ball_control)
+        # The crops are exported at the end of the job, so a resumed job needs them
+        crops = {}
+        for player_id, crop in player_crops.items():
+            arrays[f"player_crops/{player_id}"] = crop.image
+            crops[str(player_id)] = [crop.frame, crop.score]
+
+        meta = {
+            **self.expected,
+            "stage_version": STAGE_VERSIONS[stage],
+            "fps": fps,
+            "frame_count": preprocessed.frame_count,
+            "detected_frames": preprocessed.detected_frames,
+            "player_crops": crops,
+        }
+        try:
+            with StageProfiler().span("checkpoint"):
+                path = self.store.save(self.job_id, stage, arrays, meta)
+        except OSError as e:
+            log.warning("checkpoint_not_written", job=self.job_id, stage=stage, error=str(e))
+            return
+        log.info("checkpoint_written", job=self.job_id, stage=stage,
+                 mb=round(path.stat().st_size / 1024 / 1024, 1))
+
+    def resume(self, components: AnalysisComponents) -> Optional[ResumePoint]:
+        """
+        Loads the latest valid checkpoint into `components`.
+
+        Returns:
+            ResumePoint | None: Where to continue, or None to start over.
+        """
+        for stage in reversed(STAGES):
+            checkpoint = self.store.load(
+                self.job_id, stage, {**self.expected, "stage_version": STAGE_VERSIONS[stage]})
+            if checkpoint is None:
+                continue
+
+            arrays = checkpoint.arrays
+            components.tracks_collection.load_arrays(arrays)
+            components.team_assigner.player_colors = dict(zip(
+                arrays["player_colors/ids"].tolist(), arrays["player_colors/colors"]))
+            log.info("job_resumed", job=self.job_id, stage=stage)
+            return ResumePoint(
+                stage=stage,
+                preprocessed=PreprocessingResult(
+                    frame_count=checkpoint.meta["frame_count"],
+                    camera_movement=arrays["camera_movement"],
+                    detections=None,
+                    detected_frames=checkpoint.meta["detected_frames"]),
+                fps=checkpoint.meta["fps"],
+                team_ball_control=arrays.get("team_ball_control"),
+                player_crops={
+                    int(player_id): PlayerCrop(frame_num, arrays[f"player_crops/{player_id}"], score)
+                    for player_id, (frame_num, score) in checkpoint.meta["player_crops"].items()})
+        return None
+
+    def clear(self) -> None:
+        self.store.clear(self.job_id)
+
+
+def open_job_checkpoints(task, video_path: str, options: AnalysisOptions) -> Optional[JobCheckpoints]:
+    """Checkpoints of the running Celery job; None when disabled or run without a job id."""
+    if task.request.id is None or not config("CHECKPOINTS_ENABLED", default=True, cast=bool):
+        return None
+    return JobCheckpoints(get_checkpoint_store(), task.request.id, video_path, options)
+
+
+def check_delivery_limit(job_id: Optional[str], name: str) -> None:
+    """
+    Counts this delivery of a task of the job and fails it past
+    MAX_JOB_DELIVERIES. With acks_late and reject_on_worker_lost a task whose
+    worker dies goes back to the queue, so one that always kills its worker
+    (e.g. out of memory) would otherwise be redelivered forever.
+
+    :raises DeliveryLimitExceeded: If the limit was reached; the checkpoints
+        of the job are removed
+    """
+    limit = config("MAX_JOB_DELIVERIES", default=3, cast=int)
+    if not job_id or limit <= 0:
+        return
+    store = get_checkpoint_store()
+    try:
+        deliveries = store.count_delivery(job_id, name)
+    except OSError as e:
+        log.warning("delivery_not_counted", job=job_id, task=name, error=str(e))
+        return
+    if deliveries > limit:
+        log.error("delivery_limit_exceeded", job=job_id, task=name, deliveries=deliveries, limit=limit)
+        store.clear(job_id)
+        raise DeliveryLimitExceeded(
+            f"El análisis se interrumpió {deliveries - 1} veces (límite {limit}) y no se vuelve a intentar.")
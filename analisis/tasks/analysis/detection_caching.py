@@ -0,0 +1,65 @@
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import numpy as np
+from analisis.infraestructure.detection_cache import CachedDetections
+from analisis.infraestructure.structured_logging import get_logger
+from analisis.tasks.analysis.analysis_components import AnalysisComponents
+from analisis.tasks.analysis.preprocessing import PreprocessingResult
+
+log = get_logger("cache")
+
+
+class CacheKeys(NamedTuple):
+    detections: str
+    camera_movement: str
+
+
+class CachedPreprocessing(NamedTuple):
+    detections: Optional[CachedDetections]
+    camera_movement: Optional[np.ndarray]
+
+
+def build_cache_keys(components: AnalysisComponents, video_path: str | Path) -> CacheKeys:
+    """
+    Keys of the cached preprocessing of a video.
+
+    Detections depend on the video content, the model weights and the
+    inference parameters; camera movement only on the video and the
+    estimator parameters.
+    """
+    cache = components.detection_cache
+    video_hash = cache.hash_file(video_path)
+    model_hash = cache.hash_file(AnalysisComponents.get_model_path())
+    return CacheKeys(
+        detections=cache.make_key(
+            "detections", video_hash, model_hash, **components.tracker.inference_params()),
+        camera_movement=cache.make_key(
+            "camera", video_hash, **components.camera_movement_estimator.cache_params()))
+
+
+def load_cached_preprocessing(components: AnalysisComponents, keys: CacheKeys) -> CachedPreprocessing:
+    cache = components.detection_cache
+    detections = cache.get(keys.detections)
+    camera = cache.get(keys.camera_movement)
+    log.info("detection_cache_lookup", detections="hit" if detections else "miss",
+             camera_movement="hit" if camera else "miss")
+    return CachedPreprocessing(
+        detections=CachedDetections(detections) if detections else None,
+        camera_movement=camera["movement"] if camera else None)
+
+
+def store_preprocessing(
+        components: AnalysisComponents,
+        keys: CacheKeys,
+        result: PreprocessingResult,
+        cached: CachedPreprocessing) -> None:
+    """Saves what this run had to compute so the next run can skip it; never fails the job."""
+    cache = components.detection_cache
+    try:
+        if result.detections is not None:
+            cache.put(keys.detections, result.detections.to_arrays())
+        if cached.camera_movement is None or len(cached.camera_movement) < result.frame_count:
+            cache.put(keys.camera_movement, {"movement": result.camera_movement})
+    except OSError as e:
+        log.warning("cache_entry_not_written", error=str(e))
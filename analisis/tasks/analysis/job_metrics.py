@@ -0,0 +1,26 @@
+from typing import Any, Dict
+
+from analisis.infraestructure.metrics_spool import MetricsSpool
+from analisis.infraestructure.structured_logging import get_logger
+from decouple import config
+
+log = get_logger("metrics")
+
+_spool: MetricsSpool | None = None
+
+
+def get_metrics_spool() -> MetricsSpool:
+    """Spool shared by the workers and the API, from METRICS_SPOOL_DIR."""
+    global _spool
+    # One instance per process: it keeps the running totals of this worker
+    if _spool is None:
+        _spool = MetricsSpool(config("METRICS_SPOOL_DIR", default="../res/metrics"))
+    return _spool
+
+
+def record_job_metrics(metrics: Dict[str, Any], status: str) -> None:
+    """Adds the timing of a finished job to the worker counters; never fails the job."""
+    try:
+        get_metrics_spool().record_job(metrics, status)
+    except OSError as e:
+        log.warning("job_metrics_not_written", error=str(e))
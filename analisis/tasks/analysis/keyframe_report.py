@@ -0,0 +1,80 @@
+from typing import Dict
+
+import numpy as np
+import supervision as sv
+from analisis.entities.collection.track_collection import TrackCollection
+
+BoxSnapshot = Dict[str, Dict[str, np.ndarray]]
+
+
+def snapshot_boxes(tracks_collection: TrackCollection) -> BoxSnapshot:
+    """Copy of the frame and bbox columns of every entity type (the collection is a singleton)."""
+    snapshot = {}
+    for entity_type, columns in tracks_collection.columns.items():
+        bbox = columns.column("bbox")
+        valid = ~np.isnan(bbox).any(axis=1)
+        snapshot[entity_type] = {
+            "frame": columns.column("frame")[valid].copy(),
+            "bbox": bbox[valid].copy(),
+        }
+    return snapshot
+
+
+def match_boxes(reference: np.ndarray, candidate: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """
+    Greedy one-to-one matching by descending IoU.
+
+    Returns:
+        np.ndarray: IoU of each matched pair, shape (matches,).
+    """
+    if len(reference) == 0 or len(candidate) == 0:
+        return np.empty(0, dtype=np.float32)
+    iou = sv.box_iou_batch(reference, candidate)
+    matches = []
+    while True:
+        i, j = np.unravel_index(np.argmax(iou), iou.shape)
+        if iou[i, j] < iou_threshold:
+            break
+        matches.append(iou[i, j])
+        iou[i, :] = -1
+        iou[:, j] = -1
+    return np.asarray(matches, dtype=np.float32)
+
+
+def compare_boxes(reference: BoxSnapshot, candidate: BoxSnapshot, iou_threshold: float = 0.5) -> Dict[str, dict]:
+    """
+    Accuracy of a candidate run (e.g. keyframe detection) against a reference
+    run of the same video, per entity type.
+
+    Boxes are matched per frame by IoU, so track IDs may differ between runs.
+    Recall is the fraction of reference boxes with a match, precision the
+    fraction of candidate boxes with one.
+    """
+    empty = {"frame": np.empty(0, dtype=np.int32), "bbox": np.empty((0, 4), dtype=np.float32)}
+    report = {}
+    for entity_type in sorted(set(reference) | set(candidate)):
+        ref = reference.get(entity_type, empty)
+        cand = candidate.get(entity_type, empty)
+        ref_order = np.argsort(ref["frame"], kind="stable")
+        cand_order = np.argsort(cand["frame"], kind="stable")
+        ref_frames, cand_frames = ref["frame"][ref_order], cand["frame"][cand_order]
+
+        ious = []
+        for frame_num in np.union1d(ref_frames, cand_frames):
+            ref_rows = ref_order[np.searchsorted(ref_frames, frame_num, "left"):
+                                 np.searchsorted(ref_frames, frame_num, "right")]
+            cand_rows = cand_order[np.searchsorted(cand_frames, frame_num, "left"):
+                                   np.searchsorted(cand_frames, frame_num, "right")]
+            ious.append(match_boxes(ref["bbox"][ref_rows], cand["bbox"][cand_rows], iou_threshold))
+
+        ious = np.concatenate(ious) if ious else np.empty(0, dtype=np.float32)
+        matched = len(ious)
+        report[entity_type] = {
+            "reference_boxes": int(len(ref_frames)),
+            "candidate_boxes": int(len(cand_frames)),
+            "matched": matched,
+            "recall": round(matched / len(ref_frames), 4) if len(ref_frames) else None,
+            "precision": round(matched / len(cand_frames), 4) if len(cand_frames) else None,
+            "mean_iou": round(float(ious.mean()), 4) if matched else None,
+        }
+    return report
@@ -1,16 +1,20 @@
+import numpy as np
 from analisis.entities.trackers.ball_tracker import BallTracker
+from analisis.infraestructure.stage_profiler import StageProfiler
+from analisis.infraestructure.structured_logging import get_logger
 from analisis.tasks.analysis.analysis_components import AnalysisComponents
-from typing import List
-from cv2.typing import MatLike
 
-def post_processing(components: AnalysisComponents, video_frames: List[MatLike]):
+log = get_logger("tracking")
+
+def post_processing(components: AnalysisComponents, total_frames: int, frame_rate: float):
     """
     Process the output of the analysis.
 
     Prints the ball detection rate and interpolates the ball positions between frames.
 
     :param components: AnalysisComponents instance
-    :param video_frames: List of frames of the video
+    :param total_frames: Number of frames of the video
+    :param frame_rate: Frames per second of the video, used for the speeds
     """
     
     ball_tracker = components.tracker.get_tracker("ball")
@@ -18,21 +22,22 @@ def post_processing(components: AnalysisComponents, video_frames: List[MatLike])
     if not isinstance(ball_tracker, BallTracker):
         raise TypeError("El tracker de balón no es una instancia de BallTracker.")
 
-    detected_frames = sum(
-        1
-        for frame_tracks in components.tracks_collection.tracks["ball"].values()
-        if 1 in frame_tracks and getattr(frame_tracks[1], "bbox", None) is not None
-    )
+    ball_bbox = components.tracks_collection.get_column("ball", "bbox")
+    ball_frames = components.tracks_collection.get_column("ball", "frame")
+    detected_frames = len(np.unique(ball_frames[~np.isnan(ball_bbox).any(axis=1)]))
 
-    total_frames = len(video_frames)
     detection_rate = detected_frames / total_frames if total_frames > 0 else 0.0
-    print(f"Ball detection rate: {detection_rate:.2%} ({detected_frames}/{total_frames} frames)")
+    log.info("ball_detection_rate", rate=round(detection_rate, 4), frames=detected_frames, total_frames=total_frames)
 
-    ball_tracker.interpolate_ball_positions(
-        components.tracks_collection.tracks["ball"],
-    )
+    profiler = StageProfiler()
+    # Straight on the bbox column: the nested `tracks` view would build one
+    # object per detection of every entity
+    with profiler.span("interpolate", frames=total_frames):
+        ball_tracker.interpolate_ball_positions(components.tracks_collection)
 
     # Speed and distance estimation
-    components.speed_and_distance_estimator.add_speed_and_distance_to_tracks(
-        components.tracks_collection
-    )
\ No newline at end of file
+    with profiler.span("speed", frames=total_frames):
+        components.speed_and_distance_estimator.add_speed_and_distance_to_tracks(
+            components.tracks_collection,
+            frame_rate=frame_rate
+        )
\ No newline at end of file
@@ -1,36 +1,168 @@
-from typing import List
+from typing import Callable, Iterable, NamedTuple, Optional, Sequence
+
+import numpy as np
+from analisis.entities.collection.track_collection import TrackCollection
+from analisis.entities.options import AnalysisOptions
+from analisis.infraestructure.detection_cache import CachedDetections, DetectionLog
+from analisis.infraestructure.stage_profiler import StageProfiler
+from analisis.infraestructure.structured_logging import get_logger
+from analisis.infraestructure.services import iter_frame_batches
 from analisis.tasks.analysis.analysis_components import AnalysisComponents
 from cv2.typing import MatLike
 
+log = get_logger("tracking")
+
+FrameCallback = Callable[[int, MatLike, TrackCollection], None]
+
 
-def preprocessing(components: AnalysisComponents, video_frames: List[MatLike]):
+class PreprocessingResult(NamedTuple):
+    """
+    - frame_count    : Number of frames processed.
+    - camera_movement: Camera movement [x, y] per frame, shape (frame_count, 2).
+    - detections     : Raw detections of every frame, or None when they all
+                       came from the cache or only keyframes were detected
+                       (nothing new to store).
+    - detected_frames: Frames whose boxes came from the detector or the cache;
+                       the rest were propagated from keyframes.
+    """
+    frame_count: int
+    camera_movement: np.ndarray
+    detections: Optional[DetectionLog]
+    detected_frames: int
+
+
+def preprocessing(
+        components: AnalysisComponents,
+        video_frames: Iterable[MatLike],
+        frame_callbacks: Sequence[FrameCallback] = (),
+        cached_detections: Optional[CachedDetections] = None,
+        cached_camera_movement: Optional[np.ndarray] = None,
+        options: Optional[AnalysisOptions] = None,
+        with_positions: bool = True) -> PreprocessingResult:
     """
     Preprocess video frames to get tracks and estimate camera movement.
 
+    The frames are consumed in a single pass, batch by batch, so they can
+    come from a stream. Inference runs in its own thread (see
+    `TrackerService.pipelined_batches`) while this thread tracks the previous
+    batch, so only a few batches are held in memory at any time.
+
+    With `options.detection_stride` > 1 and no cached detections, the model
+    only runs on keyframes (see `TrackerService.track_keyframe_batch`). Camera
+    movement is then estimated before tracking each batch, since it decides
+    extra keyframes and moves the propagated boxes; inference runs on this
+    thread, as it depends on that.
+
     Steps:
-    1. Get object tracks from video frames.
-    2. Add position to tracks.
-    3. Estimate camera movement from video frames.
+    1. Get object tracks from each batch of frames.
+    2. Estimate camera movement and run the frame callbacks on each frame.
+    3. Add position to tracks.
     4. Add adjusted positions to tracks.
     5. Add transformed position to tracks.
+
+    :param components: AnalysisComponents instance
+    :param video_frames: Frames of the video, in order (list or stream)
+    :param frame_callbacks: Callables invoked as (frame_num, frame, tracks_collection)
+        once the frame has been tracked, e.g. to sample player colors or crops
+    :param cached_detections: Raw detections from a previous run; the model only
+        runs on frames they do not cover
+    :param cached_camera_movement: Camera movement from a previous run; the
+        estimator only runs on frames it does not cover
+    :param options: Per-job options (keyframe stride and thresholds)
+    :param with_positions: False stops after step 2 and leaves steps 3 to 5
+        to the caller (see `add_positions`)
+    :return: PreprocessingResult with the frame count, camera movement and the
+        detections computed in this run
+    """
+    camera_movement_per_frame = []
+    components.camera_movement_estimator.reset()
+    tracker = components.tracker
+    profiler = StageProfiler()
+    # Every detection is logged, so a partial cache is completed by this run;
+    # keyframe runs leave it empty, their detections do not cover every frame
+    detection_log = DetectionLog()
+    inferred = False
+
+    def estimate_camera_movement(frame_num: int, frame: MatLike):
+        if cached_camera_movement is not None and frame_num < len(cached_camera_movement):
+            return cached_camera_movement[frame_num]
+        with profiler.span("camera", frames=1):
+            return components.camera_movement_estimator.update(frame)
+
+    def run_callbacks(start_frame: int, frames: list[MatLike]) -> None:
+        if not frame_callbacks:
+            return
+        with profiler.span("callbacks", frames=len(frames)):
+            for offset, frame in enumerate(frames):
+                for callback in frame_callbacks:
+                    callback(start_frame + offset, frame, components.tracks_collection)
+
+    # A full cache is both faster and exact, so it wins over keyframes
+    if options is not None and options.keyframe_mode and cached_detections is None:
+        stride = options.detection_stride
+        tracker.configure_keyframes(
+            stride, options.max_camera_motion, options.min_detection_confidence)
+        # Batches span `stride` times more frames, so each holds about one
+        # inference batch worth of keyframes
+        for start_frame, frames in iter_frame_batches(video_frames, lambda: tracker.batch_size * stride):
+            movement = np.asarray(
+                [estimate_camera_movement(start_frame + offset, frame)
+                 for offset, frame in enumerate(frames)],
+                dtype=np.float32).reshape(-1, 2)
+            tracker.track_keyframe_batch(
+                frames=frames,
+                start_frame=start_frame,
+                tracks_collection=components.tracks_collection,
+                camera_movement=movement
+            )
+            camera_movement_per_frame.extend(movement)
+            run_callbacks(start_frame, frames)
+        detected_frames = tracker.keyframe_selector.keyframes
+        log.info("keyframe_detection", detected_frames=detected_frames, frames=len(camera_movement_per_frame))
+    else:
+        for batch in tracker.pipelined_batches(video_frames, cached_detections):
+            tracker.track_batch(
+                frames=batch.frames,
+                start_frame=batch.start_frame,
+                tracks_collection=components.tracks_collection,
+                detections=batch.detections
+            )
+            inferred = inferred or not batch.cached
+            for detection in batch.detections:
+                detection_log.append(detection)
+
+            for offset, frame in enumerate(batch.frames):
+                camera_movement_per_frame.append(
+                    estimate_camera_movement(batch.start_frame + offset, frame))
+            run_callbacks(batch.start_frame, batch.frames)
+        detected_frames = len(camera_movement_per_frame)
+        detection_log.class_names = dict(tracker.class_names)
+
+    camera_movement = np.asarray(camera_movement_per_frame, dtype=np.float32).reshape(-1, 2)
+    if with_positions:
+        add_positions(components, camera_movement)
+    return PreprocessingResult(
+        frame_count=len(camera_movement),
+        camera_movement=camera_movement,
+        detections=detection_log if inferred else None,
+        detected_frames=detected_frames)
+
+
+def add_positions(components: AnalysisComponents, camera_movement: np.ndarray) -> None:
+    """
+    Steps 3 to 5 of `preprocessing`, once every frame has been tracked:
+    position, camera-adjusted position and pitch position of each track.
+
+    :param components: AnalysisComponents instance with the tracks filled
+    :param camera_movement: Camera movement [x, y] per frame, shape (frame_count, 2)
     """
-    components.tracker.get_object_tracks(
-        frames=video_frames,
-        read_from_stub=False,
-        tracks_collection=components.tracks_collection
-    )
-    components.tracker.add_position_to_tracks(components.tracks_collection)
-
-
-    #Estimate camera movement
-    camera_movement_per_frame = components.camera_movement_estimator.get_camera_movement(
-        frames=video_frames,
-        read_from_stub=False
+    with StageProfiler().span("transform", frames=len(camera_movement)):
+        components.tracker.add_position_to_tracks(components.tracks_collection)
+
+        components.camera_movement_estimator.add_adjust_positions_to_tracks(
+            camera_movement,
+            components.tracks_collection
+        )
+        components.view_transformer.add_transformed_position_to_tracks(
+            components.tracks_collection
         )
-    components.camera_movement_estimator.add_adjust_positions_to_tracks(
-        camera_movement_per_frame,
-        components.tracks_collection
-    )
-    components.view_transformer.add_transformed_position_to_tracks(
-        components.tracks_collection
-    )
\ No newline at end of file
@@ -0,0 +1,103 @@
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+from analisis.entities.collection.track_collection import TrackCollection
+from analisis.infraestructure.player_crops import CropExporter
+from analisis.infraestructure.result_writer import ResultFile, ResultWriter
+from analisis.infraestructure.services import stream_video
+from analisis.infraestructure.video_renderer import VIDEO_CODECS, AnnotatedVideoRenderer, RenderedVideo
+from analisis.tasks.analysis.analysis_components import AnalysisComponents
+from analisis.infraestructure.structured_logging import get_logger
+from decouple import config
+
+log = get_logger("export")
+
+
+def get_result_writer() -> ResultWriter:
+    return ResultWriter(
+        config("RESULT_OUTPUT_DIR", default="../res/results"),
+        format=config("RESULT_FORMAT", default="parquet"),
+        compression=config("RESULT_COMPRESSION", default="zstd"))
+
+
+_crop_exporter: CropExporter | None = None
+
+
+def get_crop_exporter() -> CropExporter:
+    """Player crop writer of this process; its encoding threads are reused between jobs."""
+    global _crop_exporter
+    if _crop_exporter is None:
+        _crop_exporter = CropExporter(
+            config("PLAYER_CROPS_DIR", default="../res/output"),
+            format=config("PLAYER_CROPS_FORMAT", default="jpeg"),
+            quality=config("PLAYER_CROPS_QUALITY", default=90, cast=int),
+            workers=config("PLAYER_CROPS_WORKERS", default=4, cast=int),
+            archive=config("PLAYER_CROPS_ARCHIVE", default=False, cast=bool))
+    return _crop_exporter
+
+
+def export_tracks(tracks_collection: TrackCollection, name: str) -> ResultFile:
+    """Writes the detections of the job to the configured result file."""
+    result_file = get_result_writer().write(tracks_collection, name)
+    log.info("result_written", path=result_file.path, format=result_file.format,
+             rows=result_file.rows, mb=round(result_file.bytes / 1024 / 1024, 1))
+    return result_file
+
+
+def render_annotated_video(
+        components: AnalysisComponents,
+        video_file: Path,
+        team_ball_control: np.ndarray,
+        camera_movement: np.ndarray,
+        fps: float,
+        name: str) -> RenderedVideo:
+    """
+    Decodes the source video again and writes it annotated, frame by frame,
+    at the source FPS (see `AnnotatedVideoRenderer`).
+    """
+    codec = config("RENDER_VIDEO_CODEC", default="XVID")
+    output_path = Path(config("RENDER_OUTPUT_DIR", default="../res/videos")) / f"{name}{VIDEO_CODECS.get(codec, '')}"
+    renderer = AnnotatedVideoRenderer(
+        components.tracker.get_tracker("player"),
+        components.camera_movement_estimator,
+        components.speed_and_distance_estimator)
+    rendered = renderer.render(
+        stream_video(str(video_file)),
+        components.tracks_collection,
+        team_ball_control,
+        camera_movement,
+        str(output_path),
+        fps,
+        codec=codec)
+    log.info("video_rendered", path=rendered.path, frames=rendered.frames, fps=rendered.fps,
+             mb=round(rendered.bytes / 1024 / 1024, 1))
+    return rendered
+
+
+def summarize_tracks(
+        tracks_collection: TrackCollection,
+        team_ball_control: np.ndarray,
+        total_frames: int,
+        fps: float) -> Dict:
+    """
+    Small JSON-serializable summary kept in the task result; the per-detection
+    data lives in the result file.
+    """
+    controlled = team_ball_control[team_ball_control >= 0]
+    teams, counts = np.unique(controlled, return_counts=True)
+    return {
+        "frames": total_frames,
+        "fps": fps,
+        "duration_seconds": round(total_frames / fps, 2) if fps else None,
+        "players": int(len(np.unique(tracks_collection.get_column("players", "track_id")))),
+        "ball_frames": int(len(np.unique(tracks_collection.get_column("ball", "frame")))),
+        # Share of the frames with a team in possession
+        "possession": {
+            str(team): round(int(count) / len(controlled), 4) for team, count in zip(teams.tolist(), counts)
+        },
+        "team_colors_bgr": {
+            str(team): np.asarray(color).round(1).tolist()
+            for team, color in tracks_collection.team_colors.items()
+        },
+    }
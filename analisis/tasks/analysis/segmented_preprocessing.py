@@ -0,0 +1,252 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+from typing import List, Optional
+
+import cv2
+from analisis.entities.options import AnalysisOptions
+from analisis.infraestructure.segment_stitching import (TRACK_COLUMNS, Segment, SegmentTracks,
+                                                        TrackStitcher, plan_segments,
+                                                        segment_tracks_from_arrays,
+                                                        segment_tracks_to_arrays)
+from analisis.infraestructure.services import prefetch, read_frame_range
+from analisis.infraestructure.player_crops import BestCropCollector
+from analisis.infraestructure.stage_profiler import StageProfiler
+from analisis.infraestructure.structured_logging import get_logger
+from analisis.tasks.analysis.analysis_components import AnalysisComponents
+from analisis.tasks.analysis.checkpointing import get_checkpoint_store
+from analisis.tasks.analysis.preprocessing import PreprocessingResult, add_positions, preprocessing
+from analisis.tasks.worker_setup import prepare_worker, setup_spawned_process
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+log = get_logger("pipeline")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+
+
+class SegmentedPreprocessingUnavailable(RuntimeError):
+    """The segments could not be analyzed in parallel; run the serial path instead."""
+
+
+def init_segment_worker(threads: int) -> None:
+    """
+    Runs once in every pool process: splits the cores between the processes
+    and loads the model, so each segment only pays for its own frames.
+    """
+    setup_spawned_process()
+    cv2.setNumThreads(threads)
+    if torch is not None:
+        torch.set_num_threads(threads)
+    prepare_worker()
+
+
+def get_segment_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Process pool kept for the life of the worker, so the model is loaded
+    once per pool process and not once per job.
+
+    Raises:
+        SegmentedPreprocessingUnavailable: If this process cannot start
+            children (e.g. a daemonic Celery prefork child).
+    """
+    global _pool, _pool_workers
+    if _pool is not None and _pool_workers == workers:
+        return _pool
+    shutdown_segment_pool()
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_segment_worker,
+        initargs=(threads,))
+    try:
+        # Processes start on the first submit; fail here, before any frame is read
+        pool.submit(os.getpid).result()
+    except (AssertionError, OSError, BrokenProcessPool) as e:
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise SegmentedPreprocessingUnavailable(f"cannot start segment processes: {e}") from e
+
+    _pool, _pool_workers = pool, workers
+    log.info("segment_pool_started", workers=workers, threads_per_worker=threads)
+    return pool
+
+
+def shutdown_segment_pool() -> None:
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool, _pool_workers = None, 0
+
+
+def process_segment(video_path: str, segment: Segment, options: Optional[AnalysisOptions]) -> SegmentTracks:
+    """
+    Runs in a pool process: tracks the frames of one segment with the
+    process' own components and returns them in absolute frame numbers,
+    with the local track ids of this segment.
+    """
+    profiler = StageProfiler()
+    profiler.reset()
+    components = prepare_worker()
+    components.reset()
+
+    crops = BestCropCollector()
+    frames = prefetch(read_frame_range(video_path, segment.start, segment.stop), 32, name="video-decoder")
+    result = preprocessing(
+        components,
+        frames,
+        frame_callbacks=[components.team_assigner.collect_player_colors, crops],
+        options=options,
+        with_positions=False)
+    components.team_assigner.flush_player_colors()
+
+    tracks_collection = components.tracks_collection
+    tracks = {}
+    for entity_type in tracks_collection.columns:
+        columns = {name: tracks_collection.get_column(entity_type, name).copy() for name in TRACK_COLUMNS}
+        columns["frame"] += segment.start
+        tracks[entity_type] = columns
+
+    return SegmentTracks(
+        segment=segment,
+        tracks=tracks,
+        camera_movement=result.camera_movement,
+        player_colors=dict(components.team_assigner.player_colors),
+        player_crops={player_id: crop._replace(frame=crop.frame + segment.start)
+                      for player_id, crop in crops.crops.items()},
+        detected_frames=result.detected_frames,
+        timing=profiler.metrics())
+
+
+def save_segment_tracks(job_id: str, result: SegmentTracks, expected: dict) -> str:
+    """
+    Writes a segment tracked by a subtask next to the job checkpoints
+    (CHECKPOINT_DIR, which has to be shared storage when the segments run on
+    several nodes) and returns its path, so only the path goes through the
+    Celery result backend. `clear` of the job removes it with the checkpoints.
+    """
+    arrays, meta = segment_tracks_to_arrays(result)
+    path = get_checkpoint_store().save(job_id, f"segment-{result.segment.index}", arrays, {**meta, **expected})
+    return str(path)
+
+
+def find_segment_tracks(job_id: str, segment: Segment, expected: dict) -> Optional[str]:
+    """Path of a segment already saved by an earlier delivery of the same subtask."""
+    store = get_checkpoint_store()
+    path = store.path(job_id, f"segment-{segment.index}")
+    if store.read(path, {**expected, "segment": list(segment)}) is None:
+        return None
+    return str(path)
+
+
+def load_segment_tracks(path: str) -> SegmentTracks:
+    """
+    :raises SegmentedPreprocessingUnavailable: If the file is missing or
+        unreadable on this node; the serial path gives the right result
+    """
+    checkpoint = get_checkpoint_store().read(path)
+    if checkpoint is None:
+        raise SegmentedPreprocessingUnavailable(f"segment file not readable on this node: {path}")
+    return segment_tracks_from_arrays(checkpoint.arrays, checkpoint.meta)
+
+
+def segmented_preprocessing(
+        components: AnalysisComponents,
+        video_path: str,
+        frame_count: int,
+        player_crops: BestCropCollector,
+        options: Optional[AnalysisOptions] = None,
+        workers: int = 2,
+        overlap: int = 30) -> PreprocessingResult:
+    """
+    Same result as `preprocessing`, with the video split into `workers`
+    segments that are tracked in parallel by a process pool.
+
+    Each segment starts `overlap` frames before its own part, so ByteTrack
+    and the camera estimator warm up on frames that the previous segment
+    owns; the track ids of both segments are then joined on those frames
+    (see `TrackStitcher`). Team colors and player crops are collected in the
+    segment processes and keyed by the joined ids here.
+
+    :param components: AnalysisComponents instance of this process; its track
+        collection receives the joined tracks
+    :param video_path: Local video file; every process seeks its own segment
+    :param frame_count: Frame count declared by the container
+    :param player_crops: Receives the best crop of each joined player id
+    :param options: Per-job options (keyframe stride and thresholds)
+    :param workers: Pool processes, one segment each
+    :param overlap: Frames shared by consecutive segments (at least 1)
+    :return: PreprocessingResult; detections are not kept, so nothing new is cached
+
+    :raises SegmentedPreprocessingUnavailable: If the pool cannot run or the
+        video is shorter than declared; the serial path gives the right result
+    """
+    segments = plan_segments(frame_count, workers, max(1, overlap))
+    pool = get_segment_pool(workers)
+    try:
+        results: List[SegmentTracks] = list(
+            pool.map(process_segment, repeat(video_path), segments, repeat(options)))
+    except BrokenProcessPool as e:
+        shutdown_segment_pool()
+        raise SegmentedPreprocessingUnavailable(f"segment process died: {e}") from e
+    return join_segments(components, results, player_crops)
+
+
+def join_segments(
+        components: AnalysisComponents,
+        results: List[SegmentTracks],
+        player_crops: BestCropCollector) -> PreprocessingResult:
+    """
+    Joins the segments tracked elsewhere (pool processes or Celery subtasks)
+    into the tracks of `components`, then runs the position steps.
+
+    :raises SegmentedPreprocessingUnavailable: If a segment that is not the
+        last one ended early (the declared frame count was wrong)
+    """
+    results = sorted(results, key=lambda result: result.segment.index)
+
+    # A segment ending early means the declared frame count was wrong
+    for result in results[:-1]:
+        expected = result.segment.stop - result.segment.start
+        if len(result.camera_movement) != expected:
+            raise SegmentedPreprocessingUnavailable(
+                f"segment {result.segment.index} decoded {len(result.camera_movement)} of {expected} frames")
+
+    profiler = StageProfiler()
+    for result in results:
+        profiler.merge(result.timing)
+
+    stitched = TrackStitcher().stitch(results)
+    tracks_collection = components.tracks_collection
+    for entity_type, columns in stitched.tracks.items():
+        if len(columns["track_id"]):
+            tracks_collection.update_tracks(
+                entity_type, columns["frame"], columns["track_id"], bbox=columns["bbox"])
+
+    # The first segment that saw a player decides its color; the best crop
+    # of any segment wins
+    player_colors = {}
+    for result, id_map in zip(results, stitched.id_maps):
+        for local_id, color in result.player_colors.items():
+            if local_id in id_map:
+                player_colors.setdefault(id_map[local_id], color)
+        for local_id, crop in result.player_crops.items():
+            if local_id in id_map:
+                player_crops.offer(id_map[local_id], crop)
+    components.team_assigner.player_colors = player_colors
+
+    add_positions(components, stitched.camera_movement)
+    log.info("segments_joined", segments=len(results), frames=len(stitched.camera_movement),
+             players=len(player_colors))
+    return PreprocessingResult(
+        frame_count=len(stitched.camera_movement),
+        camera_movement=stitched.camera_movement,
+        detections=None,
+        detected_frames=sum(result.detected_frames for result in results))
@@ -1,6 +1,9 @@
+import os
 from pathlib import Path
 from requests import get
 
+from analisis.infraestructure.model_backend import model_file_lock
+
 model_url = "https://github.com/UDLAIA-STATS/analysis_service/releases/download/model/football_model.torchscript"
 
 def model_exists(model_path: Path) -> bool:
@@ -12,7 +15,14 @@ def prepare_model(model_path: Path, source_path: Path) -> None:
     if not source_path.exists() or not source_path.is_file():
         source_path.mkdir(parents=True, exist_ok=True)
 
-    r = get(model_url)
+    # Workers starting together download the model once; the rest wait here
+    with model_file_lock(model_path):
+        if model_exists(model_path):
+            return
+        r = get(model_url)
+        r.raise_for_status()
 
-    with open(model_path, "wb") as f:
-        f.write(r.content)
+        tmp_path = model_path.with_name(f"{model_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(r.content)
+        os.replace(tmp_path, model_path)
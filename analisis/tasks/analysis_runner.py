@@ -1,65 +1,425 @@
+import fcntl
+from concurrent.futures import Future
+from contextlib import ExitStack
+from itertools import chain
 from pathlib import Path
 import numpy as np
-from typing import Dict, Mapping
+from typing import Callable, Dict, Mapping, Optional
+from uuid import uuid4
+from analisis.entities.options import AnalysisOptions
 from analisis.entities.trackers.ball_tracker import BallTracker
 from analisis.entities.tracks.track_detail import TrackDetailBase, TrackPlayerDetail
-from analisis.infraestructure.services.video_processing_service import extract_player_images, read_video
+from analisis.infraestructure.player_crops import BestCropCollector, PlayerCrop
+from analisis.infraestructure.segment_stitching import Segment, plan_segments
+from analisis.infraestructure.stage_profiler import StageProfiler
+from analisis.infraestructure.structured_logging import get_logger
+from analisis.infraestructure.services.video_processing_service import (
+    VideoInfo, get_video_info, stream_video)
 from analisis.services.r2_downloader import R2Downloader
 from analisis.tasks.analysis.analysis_components import AnalysisComponents
 from analisis.tasks.analysis import ( preprocessing, post_processing, assign_processing )
-from analisis.entities.utils.json_transform import player_frames_to_json, player_tracks_to_json
-from analisis.tasks.analysis.verify_model import prepare_model
-from celery import shared_task
+from analisis.tasks.analysis.checkpointing import (STAGES, JobCheckpoints, ResumePoint, check_delivery_limit,
+                                                   open_job_checkpoints)
+from analisis.tasks.analysis.job_metrics import record_job_metrics
+from analisis.tasks.analysis.result_export import (export_tracks, get_crop_exporter, render_annotated_video,
+                                                   summarize_tracks)
+from analisis.tasks.analysis.preprocessing import PreprocessingResult
+from analisis.tasks.analysis.segmented_preprocessing import (
+    SegmentedPreprocessingUnavailable, find_segment_tracks, join_segments, load_segment_tracks,
+    process_segment, save_segment_tracks, segmented_preprocessing)
+from analisis.tasks.analysis.detection_caching import (
+    CachedPreprocessing, build_cache_keys, load_cached_preprocessing, store_preprocessing)
+from analisis.tasks.worker_setup import prepare_worker
+from celery import chord, group, shared_task
+from celery.exceptions import Ignore
 from decouple import config
 
-@shared_task(bind=True)
-def run_analysis(video_path: str):
+log = get_logger("pipeline")
+
+
+def report_stage(task, stage: str) -> None:
+    """Publica la etapa actual del análisis en el backend de resultados."""
+    log.info("stage_started", stage=stage, job=task.request.id)
+    if task.request.id is not None:
+        task.update_state(state="PROGRESS", meta={"stage": stage})
+
+
+# acks_late + reject_on_worker_lost: a job whose worker dies goes back to the
+# queue, and the new run resumes from its checkpoints (at most
+# MAX_JOB_DELIVERIES times, see check_delivery_limit)
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def run_analysis(self, video_path: str, options: Optional[dict] = None):
     """
     Analiza un video y extrae información de los jugadores y del balón.
     
     Parameters:
     video_path (str): Ruta del archivo de video a analizar.
+    options (dict | None): Opciones del trabajo (ver AnalysisOptions).
     
     Returns:
-    None
+    dict: Ruta del archivo con las detecciones (Parquet o Arrow), un resumen
+    (posesión por equipo, colores, duración) y métricas, serializables a
+    JSON para guardarse en el backend de resultados.
     """
 
-    prepare_model(
-        model_path=AnalysisComponents.get_model_path(),
-        source_path=AnalysisComponents.get_model_path().parent)
+    # Spans of this job; the totals also go to the worker metrics spool
+    profiler = StageProfiler()
+    profiler.reset()
+    return run_measured(
+        profiler, lambda: analyze_video(self, video_path, AnalysisOptions(**(options or {})), profiler))
 
 
-    downloader = R2Downloader({
+def run_measured(profiler: StageProfiler, analyze: Callable[[], dict]) -> dict:
+    """Runs a job body and adds its timing to the result and to the worker metrics."""
+    try:
+        result = analyze()
+    except Ignore:
+        # Replaced by the segment chord; its callback records the job
+        raise
+    except Exception:
+        record_job_metrics(profiler.metrics(), "failure")
+        raise
+    if "timing" in result["metrics"]:
+        # Eager runs get the chord result back, already measured
+        return result
+    timing = profiler.metrics()
+    result["metrics"]["timing"] = timing
+    record_job_metrics(timing, "success")
+    return result
+
+
+def get_downloader() -> R2Downloader:
+    return R2Downloader({
         "BUCKET": config("R2_BUCKET"),
         "ACCESS_KEY_ID": config("R2_ACCESS_KEY_ID"),
         "SECRET_ACCESS_KEY": config("R2_SECRET_ACCESS_KEY"),
         "ENDPOINT": config("S3_CLIENT_ACCOUNT_ENDPOINT"),
+        "MAX_WORKERS": config("R2_DOWNLOAD_WORKERS", default=8, cast=int),
     })
 
-    downloader.stream_download(key=video_path, destination_path="../res/r2")
-    download_path = downloader.build_destination_path(key=video_path)
 
-    
-    video_frames = read_video(download_path.as_posix())
+def analyze_video(task, video_path: str, analysis_options: AnalysisOptions, profiler: StageProfiler) -> dict:
+    """Cuerpo de `run_analysis`; cada etapa queda medida en `profiler`."""
+    check_delivery_limit(task.request.id, task.name)
+
+    # Normally already done by the worker_process_init hook
+    components = prepare_worker()
+    components.reset()
+
+    # A retried or redelivered job continues after its last finished stage
+    checkpoints = open_job_checkpoints(task, video_path, analysis_options)
+    resumed = checkpoints.resume(components) if checkpoints else None
+    if resumed is not None:
+        return complete_analysis(
+            task, components, resumed.preprocessed, resumed.fps, analysis_options, profiler,
+            checkpoints, resumed, video_file=lambda: fetch_shared_video(video_path))
+
+    report_stage(task, "download")
+    downloader = get_downloader()
+
+    # Frames are decoded while the remaining byte ranges keep downloading
+    download = downloader.start_download(key=downloader.resolve_key(video_path))
+
+    with download.open() as reader:
+        video_info = get_video_info(reader)
+
+    # Long videos can be split across the cluster as a chord of segment subtasks
+    fanout_segments = config("FANOUT_SEGMENTS", default=1, cast=int)
+    if fanout_segments > 1 and \
+            video_info.frame_count >= config("SEGMENT_MIN_FRAMES", default=1500, cast=int):
+        # Subtasks that land on this node reuse the finished file
+        download.wait()
+        return fan_out_analysis(task, video_path, video_info, analysis_options, fanout_segments)
+
+    # The readers of the growing file are closed once the frames are tracked,
+    # after their decoder threads stop
+    with ExitStack() as readers:
+        video_frames = stream_video(readers.enter_context(download.open()))
+        readers.callback(video_frames.close)
+        first_frame = next(video_frames, None)
+
+        if first_frame is None:
+            download.wait()
+            log.error("video_without_frames", video=video_path)
+            raise ValueError("No se pudo analizar el video, no se obtuvieron frames. Verifique el archivo de video e intente nuevamente.")
 
-    if not video_frames:
-        print("No frames found in the video.")
-        raise ValueError("No se pudo analizar el video, no se obtuvieron frames. Verifique el archivo de video e intente nuevamente.")
+        # Long videos can be tracked in segments by a process pool; each process
+        # seeks its own segment, so the file has to be complete first
+        segment_workers = config("SEGMENT_WORKERS", default=1, cast=int)
+        segmented = segment_workers > 1 and \
+            video_info.frame_count >= config("SEGMENT_MIN_FRAMES", default=1500, cast=int)
+        if segmented:
+            download.wait()
 
-    components = AnalysisComponents(video_frames[0])
+        # The video is hashed up front only when it is already on disk (a re-run);
+        # a fresh download is hashed once complete, to store what was computed
+        use_cache = config("DETECTION_CACHE_ENABLED", default=True, cast=bool)
+        cache_keys = None
+        cached = CachedPreprocessing(detections=None, camera_movement=None)
+        if use_cache and download.done:
+            cache_keys = build_cache_keys(components, download.path)
+            cached = load_cached_preprocessing(components, cache_keys)
 
-    preprocessing(components, video_frames)
+        report_stage(task, "tracking")
+        player_crops = BestCropCollector()
+        frames = chain([first_frame], video_frames)
+        preprocessed = None
+        with profiler.span("preprocessing") as span:
+            # Cached detections are cheaper to replay than to split
+            if segmented and cached.detections is None:
+                video_frames.close()
+                try:
+                    preprocessed = segmented_preprocessing(
+                        components,
+                        str(download.path),
+                        video_info.frame_count,
+                        player_crops,
+                        options=analysis_options,
+                        workers=segment_workers,
+                        overlap=config("SEGMENT_OVERLAP", default=30, cast=int))
+                except SegmentedPreprocessingUnavailable as e:
+                    log.warning("segments_unavailable", error=str(e))
+                    frames = stream_video(readers.enter_context(download.open()))
+                    readers.callback(frames.close)
+
+            if preprocessed is None:
+                preprocessed = track_frames(components, frames, player_crops, analysis_options, cached)
+            span.frames = preprocessed.frame_count
+
+    # A failed download would otherwise look like a shorter video
+    download.wait()
+
+    if use_cache:
+        cache_keys = cache_keys or build_cache_keys(components, download.path)
+        store_preprocessing(components, cache_keys, preprocessed, cached)
+
+    if checkpoints:
+        checkpoints.save("preprocessing", components, preprocessed, video_info.fps, player_crops.crops)
+    return complete_analysis(
+        task, components, preprocessed, video_info.fps, analysis_options, profiler, checkpoints,
+        player_crops=player_crops.crops, video_file=lambda: download.path)
+
+
+def track_frames(
+        components: AnalysisComponents,
+        frames,
+        player_crops: BestCropCollector,
+        analysis_options: AnalysisOptions,
+        cached: Optional[CachedPreprocessing] = None) -> PreprocessingResult:
+    """
+    Single pass over the decoded frames: tracking, camera movement, player
+    colors and player crops are taken while the frame is in memory.
+    """
+    return preprocessing(
+        components,
+        frames,
+        frame_callbacks=[
+            components.team_assigner.collect_player_colors,
+            player_crops,
+        ],
+        cached_detections=cached.detections if cached else None,
+        cached_camera_movement=cached.camera_movement if cached else None,
+        options=analysis_options)
+
+
+def complete_analysis(
+        task,
+        components: AnalysisComponents,
+        preprocessed: PreprocessingResult,
+        fps: float,
+        analysis_options: AnalysisOptions,
+        profiler: StageProfiler,
+        checkpoints: Optional[JobCheckpoints] = None,
+        resumed: Optional[ResumePoint] = None,
+        player_crops: Optional[Dict[int, PlayerCrop]] = None,
+        video_file: Optional[Callable[[], Path]] = None) -> dict:
+    """
+    Stages after tracking, over the whole match: speeds, teams, possession
+    and export. Each stage is checkpointed; `resumed` skips the stages
+    its checkpoint already covers. The best crop of each player
+    (`player_crops`, or the resumed checkpoint's) is written on the exporter
+    threads meanwhile and joined at the export.
+    With RENDER_VIDEO, the annotated video is rendered last from the local
+    copy that `video_file` returns.
+    """
+    total_frames = preprocessed.frame_count
+    finished = STAGES.index(resumed.stage) if resumed else STAGES.index("preprocessing")
+    player_crops = resumed.player_crops if resumed else player_crops or {}
+    crop_export = start_crop_export(task, player_crops)
 
     # Trackers post-processing
-    post_processing(components, video_frames)
+    if finished < STAGES.index("post_processing"):
+        report_stage(task, "post_processing")
+        with profiler.span("post_processing", frames=total_frames):
+            post_processing(components, total_frames, fps)
+        if checkpoints:
+            checkpoints.save("post_processing", components, preprocessed, fps, player_crops)
+
+    if finished < STAGES.index("assignment"):
+        report_stage(task, "assignment")
+        with profiler.span("assignment", frames=total_frames):
+            team_ball_control = assign_processing(components, total_frames)
+        if checkpoints:
+            checkpoints.save("assignment", components, preprocessed, fps, player_crops, team_ball_control)
+    else:
+        team_ball_control = resumed.team_ball_control
+
+    # The tracks go to a columnar file; the result backend only gets a summary
+    report_stage(task, "export")
+    with profiler.span("export", frames=total_frames):
+        result_file = export_tracks(components.tracks_collection, task.request.id or uuid4().hex)
+        player_images = finish_crop_export(crop_export)
 
-    team_ball_control = assign_processing(components, video_frames)
-    player_tracks_json = player_frames_to_json(components.tracks_collection.tracks["players"])
-    extract_player_images(video_frames, components.tracks_collection, '../res/output')
+    annotated_video = None
+    if video_file is not None and config("RENDER_VIDEO", default=False, cast=bool):
+        report_stage(task, "render")
+        with profiler.span("render", frames=total_frames):
+            try:
+                annotated_video = render_annotated_video(
+                    components, video_file(), team_ball_control, preprocessed.camera_movement, fps,
+                    task.request.id or uuid4().hex)._asdict()
+            except OSError as e:
+                log.warning("video_not_rendered", error=str(e))
 
+    if checkpoints:
+        checkpoints.clear()
     return {
-        "player_tracks": player_tracks_json,
-        "team_ball_control": team_ball_control
+        "result_file": result_file._asdict(),
+        "player_images": player_images,
+        "annotated_video": annotated_video,
+        "summary": summarize_tracks(
+            components.tracks_collection, team_ball_control, total_frames, fps),
+        "metrics": {
+            "inference_batch": components.tracker.batch_tuner.metrics(),
+            "detection": {
+                "options": analysis_options.model_dump(),
+                "frames": total_frames,
+                "detected_frames": preprocessed.detected_frames,
+            },
+            "resumed_from": resumed.stage if resumed else None,
+        },
     }
-    
-    
\ No newline at end of file
+
+
+def start_crop_export(task, player_crops: Dict[int, PlayerCrop]) -> Future:
+    """Starts writing the best crop of each player on the exporter threads."""
+    log.info("player_crops_selected", players=len(player_crops), job=task.request.id)
+    return get_crop_exporter().write_async(player_crops, name=task.request.id or "players")
+
+
+def finish_crop_export(crop_export: Future) -> Optional[dict]:
+    """Waits for the crops; a failed write is logged and does not fail the job."""
+    try:
+        return crop_export.result()._asdict()
+    except OSError as e:
+        log.warning("player_crops_not_written", error=str(e))
+        return None
+
+
+def fan_out_analysis(
+        task,
+        video_path: str,
+        video_info: VideoInfo,
+        analysis_options: AnalysisOptions,
+        segments: int) -> dict:
+    """
+    Replaces the job with a chord: one `analyze_segment` subtask per segment,
+    which any worker of the cluster can take, and `join_segment_analysis` as
+    callback. The callback keeps the job id, so the API follows it as usual.
+    In eager mode the chord runs here and its result is returned.
+    """
+    plan = plan_segments(
+        video_info.frame_count, segments, max(1, config("SEGMENT_OVERLAP", default=30, cast=int)))
+    report_stage(task, "segments")
+    log.info("segments_fanned_out", segments=len(plan), frames=video_info.frame_count, job=task.request.id)
+
+    options = analysis_options.model_dump()
+    job_id = task.request.id or uuid4().hex
+    header = group(analyze_segment.s(video_path, list(segment), options, job_id) for segment in plan)
+    return task.replace(chord(header, join_segment_analysis.s(video_path, options, video_info.fps)))
+
+
+def fetch_shared_video(video_path: str) -> Path:
+    """
+    Local copy of the video for a segment subtask. The subtasks that land on
+    the same node share it: a file lock lets the first one download it and
+    the rest find it complete (the download progress file survives).
+    """
+    downloader = get_downloader()
+    key = downloader.resolve_key(video_path)
+    # Keyed on the object only: the file name also depends on its ETag
+    lock_path = downloader.build_destination_path(key)
+    with open(lock_path.with_name(lock_path.name + ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return downloader.start_download(key).wait()
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def analyze_segment(video_path: str, segment: list, options: Optional[dict] = None, job_id: str = "") -> str:
+    """
+    Tracks one segment of a fanned-out job (see `fan_out_analysis`).
+
+    Returns:
+    str: Path of the segment tracks, saved with the job checkpoints (see
+    `save_segment_tracks`); the tracks never go through the result backend.
+    """
+    segment = Segment(*segment)
+    check_delivery_limit(job_id, f"segment-{segment.index}")
+    analysis_options = AnalysisOptions(**(options or {}))
+    expected = {"video": video_path, "options": analysis_options.model_dump()}
+    # A redelivered subtask finds the segment it already saved
+    saved = find_segment_tracks(job_id, segment, expected)
+    if saved is not None:
+        return saved
+
+    local_path = fetch_shared_video(video_path)
+    result = process_segment(str(local_path), segment, analysis_options)
+    return save_segment_tracks(job_id, result, expected)
+
+
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def join_segment_analysis(self, segment_paths: list, video_path: str, options: Optional[dict], fps: float) -> dict:
+    """
+    Chord callback of a fanned-out job: joins the segment tracks and runs the
+    stages that need the whole match. Returns the same result as `run_analysis`.
+    If the segments cannot be joined (the container declared a wrong frame
+    count, common with VFR files), the video is tracked here in one pass.
+    """
+    profiler = StageProfiler()
+    profiler.reset()
+    analysis_options = AnalysisOptions(**(options or {}))
+
+    def analyze() -> dict:
+        check_delivery_limit(self.request.id, self.name)
+        components = prepare_worker()
+        components.reset()
+        checkpoints = open_job_checkpoints(self, video_path, analysis_options)
+        resumed = checkpoints.resume(components) if checkpoints else None
+        if resumed is not None:
+            return complete_analysis(
+                self, components, resumed.preprocessed, resumed.fps, analysis_options, profiler,
+                checkpoints, resumed, video_file=lambda: fetch_shared_video(video_path))
+
+        report_stage(self, "tracking")
+        player_crops = BestCropCollector()
+        with profiler.span("preprocessing") as span:
+            try:
+                preprocessed = join_segments(
+                    components, [load_segment_tracks(path) for path in segment_paths], player_crops)
+            except SegmentedPreprocessingUnavailable as e:
+                log.warning("segments_unavailable", error=str(e), job=self.request.id)
+                components.reset()
+                player_crops = BestCropCollector()
+                preprocessed = track_frames(
+                    components, stream_video(str(fetch_shared_video(video_path))), player_crops,
+                    analysis_options)
+            span.frames = preprocessed.frame_count
+        if checkpoints:
+            checkpoints.save("preprocessing", components, preprocessed, fps, player_crops.crops)
+        return complete_analysis(
+            self, components, preprocessed, fps, analysis_options, profiler, checkpoints,
+            player_crops=player_crops.crops,
+            video_file=lambda: fetch_shared_video(video_path))
+
+    log.info("segments_joining", segments=len(segment_paths), video=video_path, job=self.request.id)
+    return run_measured(profiler, analyze)
@@ -0,0 +1,4 @@
+from .baseline import StageComparison, build_report, compare_to_baseline, load_baseline, save_baseline
+from .stages import STAGES, BenchmarkContext, Stage, run_benchmarks, time_stage
+from .stub_detector import StubDetector
+from .synthetic_match import MatchSpec, SyntheticMatch
@@ -0,0 +1,80 @@
+import json
+import os
+import platform
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, NamedTuple
+
+import cv2
+import numpy as np
+
+from .synthetic_match import MatchSpec
+
+
+class StageComparison(NamedTuple):
+    """
+    - stage     : Stage name.
+    - baseline_s: Median seconds in the baseline.
+    - current_s : Median seconds in this run.
+    - ratio     : current / baseline (above 1 is slower).
+    - regressed : True if the ratio exceeds 1 + tolerance.
+    """
+    stage: str
+    baseline_s: float
+    current_s: float
+    ratio: float
+    regressed: bool
+
+
+def machine_info() -> dict:
+    """Where the numbers were taken; baselines only compare on the same machine."""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+def build_report(spec: MatchSpec, results: Dict[str, dict]) -> dict:
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": machine_info(),
+        "match": spec._asdict(),
+        "stages": results,
+    }
+
+
+def save_baseline(report: dict, path: str | Path) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2))
+    return path
+
+
+def load_baseline(path: str | Path) -> dict:
+    return json.loads(Path(path).read_text())
+
+
+def compare_to_baseline(report: dict, baseline: dict, tolerance: float = 0.15) -> List[StageComparison]:
+    """
+    Compares the median time of each stage present in both reports.
+
+    A stage regresses when it is more than `tolerance` (fraction) slower
+    than in the baseline. Stages missing from either side are skipped.
+    """
+    comparisons = []
+    for stage, current in report["stages"].items():
+        reference = baseline.get("stages", {}).get(stage)
+        if reference is None or not reference.get("median_s"):
+            continue
+        ratio = current["median_s"] / reference["median_s"]
+        comparisons.append(StageComparison(
+            stage=stage,
+            baseline_s=reference["median_s"],
+            current_s=current["median_s"],
+            ratio=round(ratio, 3),
+            regressed=ratio > 1 + tolerance))
+    return comparisons
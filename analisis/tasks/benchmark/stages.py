@@ -0,0 +1,251 @@
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+from unittest import mock
+
+import numpy as np
+from analisis.entities.interfaces import tracker_service_base
+from analisis.entities.utils.json_transform import write_tracks_json
+from analisis.infraestructure.result_writer import ResultWriter
+from analisis.infraestructure.player_crops import extract_player_images
+from analisis.infraestructure.services.video_processing_service import stream_video
+from analisis.infraestructure.video_renderer import AnnotatedVideoRenderer
+from analisis.tasks.analysis import assign_processing, post_processing, preprocessing
+from analisis.tasks.analysis.analysis_components import AnalysisComponents
+
+from .stub_detector import StubDetector
+from .synthetic_match import SyntheticMatch
+
+
+class BenchmarkContext:
+    """
+    Shared state of a benchmark run: the synthetic match, its frames in
+    memory (so decoding is only measured by the `decode` stage), the
+    rendered video and the analysis components built with the stub detector.
+    """
+
+    def __init__(self, match: SyntheticMatch, work_dir: Optional[Path] = None):
+        self.match = match
+        self.frames = list(match.frames())
+        self._own_dir = work_dir is None
+        self.work_dir = Path(work_dir or tempfile.mkdtemp(prefix="analisis-bench-"))
+        self.video_path = match.write_video(self.work_dir / "match.mp4")
+        # Components are a per-process singleton; the patch only matters the
+        # first time they are built
+        with mock.patch.object(tracker_service_base, "YOLO", StubDetector):
+            self.components = AnalysisComponents()
+
+    @property
+    def frame_count(self) -> int:
+        return len(self.frames)
+
+    @property
+    def fps(self) -> float:
+        return self.match.spec.fps
+
+    def output_dir(self, name: str) -> Path:
+        """Empty directory for the files written by a stage."""
+        path = self.work_dir / name
+        shutil.rmtree(path, ignore_errors=True)
+        path.mkdir(parents=True)
+        return path
+
+    def load_tracks(self, collect_colors: bool = False) -> None:
+        """
+        Resets the components and loads the ground-truth tracks with their
+        positions, as `preprocessing` leaves them.
+        """
+        components = self.components
+        components.reset()
+        self.match.fill_tracks(components.tracks_collection)
+        components.tracker.add_position_to_tracks(components.tracks_collection)
+        components.camera_movement_estimator.add_adjust_positions_to_tracks(
+            self.match.camera_movement, components.tracks_collection)
+        components.view_transformer.add_transformed_position_to_tracks(components.tracks_collection)
+        if collect_colors:
+            for frame_num, frame in enumerate(self.frames):
+                components.team_assigner.collect_player_colors(frame_num, frame, components.tracks_collection)
+
+    def close(self) -> None:
+        if self._own_dir:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+class Stage(NamedTuple):
+    """
+    - name : Name used in reports and baselines.
+    - run  : Timed callable, receives the context and what `setup` returned.
+    - setup: Untimed callable run before every repetition; returns the state
+             `run` needs (stages mutate the tracks, so each run starts fresh).
+    """
+    name: str
+    run: Callable[[BenchmarkContext, Any], None]
+    setup: Callable[[BenchmarkContext], Any] = lambda context: None
+
+
+def _decode(context: BenchmarkContext, state) -> None:
+    for _ in stream_video(str(context.video_path)):
+        pass
+
+
+def _reset(context: BenchmarkContext) -> None:
+    context.components.reset()
+
+
+def _preprocessing(context: BenchmarkContext, state) -> None:
+    preprocessing(context.components, context.frames)
+
+
+def _camera_movement(context: BenchmarkContext, state) -> None:
+    estimator = context.components.camera_movement_estimator
+    for frame in context.frames:
+        estimator.update(frame)
+
+
+def _post_processing(context: BenchmarkContext, state) -> None:
+    post_processing(context.components, context.frame_count, context.fps)
+
+
+def _speed_and_distance(context: BenchmarkContext, state) -> None:
+    context.components.speed_and_distance_estimator.add_speed_and_distance_to_tracks(
+        context.components.tracks_collection, frame_rate=context.fps)
+
+
+def _view_transformer(context: BenchmarkContext, state) -> None:
+    context.components.view_transformer.add_transformed_position_to_tracks(
+        context.components.tracks_collection)
+
+
+def _team_assigner(context: BenchmarkContext, state) -> None:
+    components = context.components
+    for frame_num, frame in enumerate(context.frames):
+        components.team_assigner.collect_player_colors(frame_num, frame, components.tracks_collection)
+    components.team_assigner.assign_team_color()
+
+
+def _player_ball_assigner_setup(context: BenchmarkContext) -> dict:
+    context.load_tracks()
+    tracks_collection = context.components.tracks_collection
+    ball_frames = tracks_collection.get_column("ball", "frame")
+    ball_bboxes = tracks_collection.get_column("ball", "bbox")
+    ball_centers = np.full((context.frame_count, 2), np.nan, dtype=np.float32)
+    ball_centers[ball_frames] = np.trunc((ball_bboxes[:, :2] + ball_bboxes[:, 2:]) / 2)
+    player_ids = tracks_collection.get_column("players", "track_id")
+    return {
+        "player_frames": tracks_collection.get_column("players", "frame"),
+        "player_ids": player_ids,
+        "player_bboxes": tracks_collection.get_column("players", "bbox"),
+        "player_teams": (player_ids % 2 + 1).astype(np.int8),
+        "ball_centers": ball_centers,
+    }
+
+
+def _player_ball_assigner(context: BenchmarkContext, state: dict) -> None:
+    context.components.player_assigner.assign_ball_to_players(**state)
+
+
+def _assign_processing(context: BenchmarkContext, state) -> None:
+    assign_processing(context.components, context.frame_count)
+
+
+def _extract_player_images(context: BenchmarkContext, state: Path) -> None:
+    extract_player_images(context.frames, context.components.tracks_collection, str(state))
+
+
+def _extract_player_images_setup(context: BenchmarkContext) -> Path:
+    context.load_tracks()
+    return context.output_dir("players")
+
+
+def _render_video_setup(context: BenchmarkContext) -> tuple:
+    context.load_tracks(collect_colors=True)
+    post_processing(context.components, context.frame_count, context.fps)
+    team_ball_control = assign_processing(context.components, context.frame_count)
+    return team_ball_control, context.output_dir("render") / "benchmark.avi"
+
+
+def _render_video(context: BenchmarkContext, state: tuple) -> None:
+    team_ball_control, output_path = state
+    components = context.components
+    renderer = AnnotatedVideoRenderer(
+        components.tracker.get_tracker("player"),
+        components.camera_movement_estimator,
+        components.speed_and_distance_estimator)
+    # The renderer draws in place; the shared frames stay clean
+    renderer.render(
+        (frame.copy() for frame in context.frames),
+        components.tracks_collection,
+        team_ball_control,
+        np.asarray(context.match.camera_movement, dtype=np.float32),
+        str(output_path),
+        context.fps)
+
+
+def _export_setup(context: BenchmarkContext) -> Path:
+    context.load_tracks()
+    post_processing(context.components, context.frame_count, context.fps)
+    return context.output_dir("results")
+
+
+def _export_parquet(context: BenchmarkContext, state: Path) -> None:
+    ResultWriter(state, "parquet").write(context.components.tracks_collection, "benchmark")
+
+
+def _export_json(context: BenchmarkContext, state: Path) -> None:
+    with open(state / "benchmark.json", "wb") as file:
+        write_tracks_json(context.components.tracks_collection, file)
+
+
+STAGES: Dict[str, Stage] = {stage.name: stage for stage in (
+    Stage("decode", _decode),
+    Stage("preprocessing", _preprocessing, _reset),
+    Stage("camera_movement", _camera_movement, _reset),
+    Stage("view_transformer", _view_transformer, lambda context: context.load_tracks()),
+    Stage("post_processing", _post_processing, lambda context: context.load_tracks()),
+    Stage("speed_and_distance", _speed_and_distance, lambda context: context.load_tracks()),
+    Stage("team_assigner", _team_assigner, lambda context: context.load_tracks()),
+    Stage("player_ball_assigner", _player_ball_assigner, _player_ball_assigner_setup),
+    Stage("assign_processing", _assign_processing, lambda context: context.load_tracks(collect_colors=True)),
+    Stage("extract_player_images", _extract_player_images, _extract_player_images_setup),
+    Stage("render_video", _render_video, _render_video_setup),
+    Stage("export_parquet", _export_parquet, _export_setup),
+    Stage("export_json", _export_json, _export_setup),
+)}
+
+
+def time_stage(context: BenchmarkContext, stage: Stage, repeat: int = 3) -> dict:
+    """
+    Runs a stage `repeat` times (setup excluded from the timing).
+
+    Returns:
+        dict: Median and minimum seconds, and frames per second at the median.
+    """
+    seconds: List[float] = []
+    for _ in range(max(1, repeat)):
+        state = stage.setup(context)
+        start = time.perf_counter()
+        stage.run(context, state)
+        seconds.append(time.perf_counter() - start)
+
+    median = statistics.median(seconds)
+    return {
+        "median_s": round(median, 6),
+        "min_s": round(min(seconds), 6),
+        "fps": round(context.frame_count / median, 2) if median else None,
+        "runs": len(seconds),
+    }
+
+
+def run_benchmarks(
+        context: BenchmarkContext,
+        stages: Optional[Iterable[str]] = None,
+        repeat: int = 3) -> Dict[str, dict]:
+    """Times the given stages (all of them by default), in registry order."""
+    selected = list(STAGES) if stages is None else list(stages)
+    unknown = set(selected) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown benchmark stages: {', '.join(sorted(unknown))}")
+    return {name: time_stage(context, STAGES[name], repeat) for name in STAGES if name in selected}
@@ -0,0 +1,93 @@
+from typing import List
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+
+from .synthetic_match import BALL_COLOR, REFEREE_COLOR, TEAM_COLORS
+
+CLASS_NAMES = {0: "ball", 1: "goalkeeper", 2: "player", 3: "referee"}
+
+# (class id, BGR color, minimum area in px) of each color the detector looks for
+COLOR_CLASSES = (
+    *((2, color, 40) for color in TEAM_COLORS),
+    (3, REFEREE_COLOR, 40),
+    (0, BALL_COLOR, 4),
+)
+
+
+class _Tensor:
+    """The part of a torch tensor that `sv.Detections.from_ultralytics` uses."""
+
+    def __init__(self, values: np.ndarray):
+        self._values = values
+
+    def cpu(self) -> "_Tensor":
+        return self
+
+    def numpy(self) -> np.ndarray:
+        return self._values
+
+
+class _OrientedBoxes:
+    def __init__(self, xyxy: np.ndarray, class_ids: np.ndarray, confidence: np.ndarray):
+        x1, y1, x2, y2 = xyxy.T
+        self.xyxy = _Tensor(xyxy)
+        self.xyxyxyxy = _Tensor(np.stack(
+            [np.stack([x1, y1], axis=1), np.stack([x2, y1], axis=1),
+             np.stack([x2, y2], axis=1), np.stack([x1, y2], axis=1)], axis=1))
+        self.cls = _Tensor(class_ids.astype(np.float32))
+        self.conf = _Tensor(confidence)
+        self.id = None
+
+
+class StubResult:
+    """Shaped like `ultralytics.engine.results.Results` of an OBB task."""
+
+    def __init__(self, xyxy: np.ndarray, class_ids: np.ndarray, confidence: np.ndarray):
+        self.names = CLASS_NAMES
+        self.obb = _OrientedBoxes(xyxy, class_ids, confidence)
+        self.boxes = None
+
+
+class StubDetector:
+    """
+    YOLO stand-in for the benchmarks: finds the entities of a
+    `SyntheticMatch` by segmenting their colors (cv2.inRange and connected
+    components). It needs no model file or GPU, and its cost is small next
+    to the stages being measured.
+
+    Takes the same arguments as `YOLO(...)`, so it can be patched into
+    `TrackerServiceBase`.
+    """
+
+    def __init__(self, model: str | None = None, task: str = "obb", verbose: bool = False,
+                 tolerance: int = 40):
+        self.model_name = model
+        self.task = task
+        self.names = CLASS_NAMES
+        self.tolerance = tolerance
+
+    def predict(self, frames: List[MatLike], conf: float = 0.1, **kwargs) -> List[StubResult]:
+        return [self.detect(frame) for frame in frames]
+
+    def detect(self, frame: MatLike) -> StubResult:
+        boxes, class_ids = [], []
+        for class_id, color, min_area in COLOR_CLASSES:
+            color = np.asarray(color, dtype=np.int16)
+            mask = cv2.inRange(
+                frame,
+                np.clip(color - self.tolerance, 0, 255).astype(np.uint8),
+                np.clip(color + self.tolerance, 0, 255).astype(np.uint8))
+            count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+            # Label 0 is the background
+            stats = stats[1:count]
+            stats = stats[stats[:, cv2.CC_STAT_AREA] >= min_area]
+            x, y = stats[:, cv2.CC_STAT_LEFT], stats[:, cv2.CC_STAT_TOP]
+            boxes.append(np.stack(
+                [x, y, x + stats[:, cv2.CC_STAT_WIDTH], y + stats[:, cv2.CC_STAT_HEIGHT]],
+                axis=1).astype(np.float32).reshape(-1, 4))
+            class_ids.append(np.full(len(stats), class_id))
+
+        xyxy = np.vstack(boxes)
+        return StubResult(xyxy, np.concatenate(class_ids), np.full(len(xyxy), 0.9, dtype=np.float32))
@@ -0,0 +1,194 @@
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+import cv2
+import numpy as np
+from analisis.entities.collection.track_collection import TrackCollection
+
+# BGR colors of the rendered entities; the stub detector segments them back
+TEAM_COLORS = ((0, 0, 220), (220, 80, 0))
+REFEREE_COLOR = (0, 220, 220)
+BALL_COLOR = (255, 255, 255)
+
+
+class MatchSpec(NamedTuple):
+    """
+    - frames : Number of frames of the match.
+    - players: Outfield players, split in two teams (plus one referee).
+    - width  : Frame width in pixels.
+    - height : Frame height in pixels.
+    - fps    : Frame rate written to the video and used for speeds.
+    - seed   : Seed of the random motion, so runs are comparable.
+    """
+    frames: int = 120
+    players: int = 22
+    width: int = 1280
+    height: int = 720
+    fps: float = 25.0
+    seed: int = 0
+
+
+class SyntheticMatch:
+    """
+    Synthetic football match: team-colored ellipses (players), a yellow
+    ellipse (referee) and a white circle (ball) over a textured pitch seen
+    by a panning camera.
+
+    Motion is precomputed from the seed, so the ground-truth boxes are known
+    for every frame and frames can be rendered in any order. The pitch
+    texture has enough corners for the camera movement estimator.
+    """
+
+    def __init__(self, spec: MatchSpec = MatchSpec()):
+        self.spec = spec
+        rng = np.random.default_rng(spec.seed)
+        width, height = spec.width, spec.height
+        scale = width / 1280
+
+        self.body_size = np.array([max(8, round(23 * scale)), max(16, round(54 * height / 720))])
+        self.ball_radius = max(3, round(5 * scale))
+
+        # Horizontal pan; the world is wider than the frame by the pan range
+        self.pan_range = int(0.1 * width)
+        t = np.arange(spec.frames)
+        self.camera_x = np.round(
+            self.pan_range * (1 + np.sin(2 * np.pi * t / max(spec.frames, 60))) / 2).astype(np.int64)
+        self.background = self._render_background(rng, width + self.pan_range, height)
+
+        # Players and referee: bounded random walk in world coordinates
+        people = spec.players + 1
+        low = np.array([self.body_size[0], 0.15 * height])
+        high = np.array([width + self.pan_range - 2 * self.body_size[0], height - 1.2 * self.body_size[1]])
+        positions = np.empty((spec.frames, people, 2))
+        positions[0] = rng.uniform(low, high, size=(people, 2))
+        velocity = rng.uniform(-2, 2, size=(people, 2)) * scale
+        for frame_num in range(1, spec.frames):
+            velocity = np.clip(velocity + rng.normal(0, 0.3 * scale, size=velocity.shape), -4 * scale, 4 * scale)
+            step = positions[frame_num - 1] + velocity
+            bounce = (step < low) | (step > high)
+            velocity[bounce] *= -1
+            positions[frame_num] = np.clip(step, low, high)
+        self.people_positions = positions
+
+        # The ball runs to the feet of a player and changes owner every second or so
+        ball = np.empty((spec.frames, 2))
+        feet = positions[:, :, :] + self.body_size * np.array([0.5, 1.0])
+        ball[0] = feet[0, 0]
+        owner = 0
+        max_step = 12 * scale
+        for frame_num in range(1, spec.frames):
+            if frame_num % int(spec.fps) == 0:
+                owner = int(rng.integers(spec.players))
+            offset = feet[frame_num, owner] - ball[frame_num - 1]
+            distance = np.hypot(*offset)
+            ball[frame_num] = ball[frame_num - 1] + (offset if distance <= max_step else offset * max_step / distance)
+        self.ball_positions = ball
+
+    @property
+    def camera_movement(self) -> np.ndarray:
+        """Ground-truth camera movement [x, y] per frame, like CameraMovementEstimator."""
+        movement = np.zeros((self.spec.frames, 2), dtype=np.float32)
+        movement[1:, 0] = np.diff(self.camera_x)
+        return movement
+
+    def boxes(self, frame_num: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Ground-truth boxes of a frame, in frame coordinates.
+
+        Returns:
+            tuple: (xyxy (N, 4), entity (N,) with 0 = player, 1 = referee,
+            2 = ball, track_id (N,)). Boxes fully outside the frame are dropped.
+        """
+        camera = np.array([self.camera_x[frame_num], 0])
+        top_left = self.people_positions[frame_num] - camera
+        people = np.hstack([top_left, top_left + self.body_size])
+        ball_center = self.ball_positions[frame_num] - camera
+        ball = np.hstack([ball_center - self.ball_radius, ball_center + self.ball_radius])
+
+        xyxy = np.vstack([people, ball[None]]).astype(np.float32)
+        entity = np.array([0] * self.spec.players + [1, 2], dtype=np.int8)
+        track_id = np.concatenate([np.arange(1, self.spec.players + 2), [1]])
+        visible = (xyxy[:, 0] >= 0) & (xyxy[:, 2] <= self.spec.width)
+        return xyxy[visible], entity[visible], track_id[visible]
+
+    def render(self, frame_num: int) -> np.ndarray:
+        """BGR frame `frame_num` of the match."""
+        x = self.camera_x[frame_num]
+        frame = self.background[:, x:x + self.spec.width].copy()
+        xyxy, entity, track_id = self.boxes(frame_num)
+        for box, kind, player_id in zip(xyxy, entity, track_id):
+            center = (int(round((box[0] + box[2]) / 2)), int(round((box[1] + box[3]) / 2)))
+            if kind == 2:
+                cv2.circle(frame, center, self.ball_radius, BALL_COLOR, -1)
+                continue
+            color = REFEREE_COLOR if kind == 1 else TEAM_COLORS[(player_id - 1) % 2]
+            axes = (int(self.body_size[0] // 2), int(self.body_size[1] // 2))
+            cv2.ellipse(frame, center, axes, 0, 0, 360, color, -1)
+        return frame
+
+    def frames(self) -> Iterator[np.ndarray]:
+        for frame_num in range(self.spec.frames):
+            yield self.render(frame_num)
+
+    def write_video(self, path: str | Path, fourcc: str = "mp4v") -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        writer = cv2.VideoWriter(
+            str(path), cv2.VideoWriter.fourcc(*fourcc), self.spec.fps, (self.spec.width, self.spec.height))
+        try:
+            for frame in self.frames():
+                writer.write(frame)
+        finally:
+            writer.release()
+        return path
+
+    def fill_tracks(self, tracks_collection: TrackCollection) -> None:
+        """
+        Loads the ground-truth tracks (bbox only) into the collection, as the
+        trackers would leave them after a perfect detection run.
+        """
+        players, ball = {"frame": [], "track_id": [], "bbox": []}, {"frame": [], "bbox": []}
+        for frame_num in range(self.spec.frames):
+            xyxy, entity, track_id = self.boxes(frame_num)
+            is_player = entity == 0
+            players["frame"].append(np.full(is_player.sum(), frame_num))
+            players["track_id"].append(track_id[is_player])
+            players["bbox"].append(xyxy[is_player])
+            if (entity == 2).any():
+                ball["frame"].append(frame_num)
+                ball["bbox"].append(xyxy[entity == 2][0])
+
+        tracks_collection.update_tracks(
+            entity_type="players",
+            frame_nums=np.concatenate(players["frame"]),
+            track_ids=np.concatenate(players["track_id"]),
+            bbox=np.vstack(players["bbox"]))
+        if ball["frame"]:
+            tracks_collection.update_tracks(
+                entity_type="ball",
+                frame_nums=np.asarray(ball["frame"]),
+                track_ids=np.ones(len(ball["frame"])),
+                bbox=np.vstack(ball["bbox"]))
+
+    @staticmethod
+    def _render_background(rng: np.random.Generator, width: int, height: int) -> np.ndarray:
+        """Mowed-grass stripes with noise, grey lines and a checkered ad board."""
+        background = np.empty((height, width, 3), dtype=np.uint8)
+        stripe = max(1, width // 16)
+        shades = np.where((np.arange(width) // stripe) % 2 == 0, 130, 115)
+        background[:] = np.stack(
+            [np.full(width, 40), shades, np.full(width, 40)], axis=1)[None]
+        noise = rng.integers(-12, 13, size=(height, width, 1), dtype=np.int16)
+        background = np.clip(background.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+        line_color = (190, 190, 190)
+        thickness = max(2, height // 240)
+        cv2.line(background, (width // 2, int(0.12 * height)), (width // 2, height), line_color, thickness)
+        cv2.circle(background, (width // 2, int(0.55 * height)), height // 6, line_color, thickness)
+        cv2.line(background, (0, int(0.12 * height)), (width, int(0.12 * height)), line_color, thickness)
+
+        board = max(8, height // 24)
+        cells = (np.add.outer(np.arange(board * 2) // board, np.arange(width) // board) % 2).astype(bool)
+        background[:board * 2][cells] = (170, 170, 170)
+        background[:board * 2][~cells] = (30, 30, 30)
+        return background
@@ -0,0 +1,111 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from analisis.infraestructure.structured_logging import get_logger
+from analisis.tasks.analysis.analysis_components import AnalysisComponents
+from analisis.tasks.analysis.batch_tuning import (calibrate_batch_size, calibration_frame,
+                                                  count_inference_processes)
+from analisis.tasks.analysis.result_export import get_result_writer
+from analisis.tasks.analysis.verify_model import prepare_model
+from celery.signals import worker_init, worker_process_init
+from decouple import config
+
+log = get_logger("inference")
+
+_components: AnalysisComponents | None = None
+
+
+def prepare_worker() -> AnalysisComponents:
+    """
+    Loads the model and builds the analysis components once per process.
+
+    Downloads the model if missing, exports it for the configured
+    INFERENCE_BACKEND, warms it up with a dummy batch and calibrates the
+    inference batch size. Later calls return the same components; call
+    `AnalysisComponents.reset` before each job.
+    """
+    global _components
+    if _components is not None:
+        return _components
+
+    model_path = AnalysisComponents.get_model_path()
+    prepare_model(model_path=model_path, source_path=model_path.parent)
+    components = AnalysisComponents()
+
+    frame = calibration_frame()
+    try:
+        if config("INFERENCE_BATCH_CALIBRATION", default=True, cast=bool):
+            # Calibration runs every candidate, so it warms the model up too
+            calibrate_batch_size(components.tracker, frame)
+        else:
+            components.tracker.warmup(frame)
+    except Exception as e:
+        log.warning("model_warmup_failed", batch_size=components.tracker.batch_size, error=str(e))
+
+    _components = components
+    return components
+
+
+def prepare_model_files() -> None:
+    """
+    Downloads the model and exports it for INFERENCE_BACKEND, without loading
+    it. Both steps are guarded by a file lock and skip what is up to date.
+    """
+    model_path = AnalysisComponents.get_model_path()
+    prepare_model(model_path=model_path, source_path=model_path.parent)
+    AnalysisComponents.get_inference_model_path()
+
+
+def setup_spawned_process() -> None:
+    """Spawned processes start clean; the logging setup lives in the settings."""
+    if os.environ.get("DJANGO_SETTINGS_MODULE"):
+        import django
+        django.setup()
+
+
+def prepare_model_files_isolated() -> None:
+    """
+    `prepare_model_files` for a process that forks afterwards. Exporting to
+    ONNX or OpenVINO loads and traces the model with torch, whose thread
+    pools do not survive a fork (the children can hang at their first
+    inference), so the export runs in a short-lived spawned process.
+    """
+    if config("INFERENCE_BACKEND", default="torchscript").lower() == "torchscript":
+        prepare_model_files()
+        return
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=setup_spawned_process) as pool:
+        pool.submit(prepare_model_files).result()
+
+
+@worker_init.connect
+def setup_worker(sender=None, **kwargs):
+    """
+    Runs once in the parent worker process, before the pool forks: the slow
+    download and export happen here (the export in a spawned process, see
+    `prepare_model_files_isolated`), so the children only load the model
+    within CELERY_WORKER_PROC_ALIVE_TIMEOUT.
+
+    Also sets INFERENCE_PROCESSES, unless configured, from the pool the
+    worker runs: the processes inherit it and split the memory budget of
+    the batch size calibration.
+
+    A RESULT_FORMAT/RESULT_COMPRESSION pair the writer does not support
+    stops the worker here instead of failing every job at the export.
+    """
+    get_result_writer()
+    if sender is not None and not config("INFERENCE_PROCESSES", default=0, cast=int):
+        processes = count_inference_processes(str(sender.pool_cls), sender.concurrency)
+        os.environ["INFERENCE_PROCESSES"] = str(processes)
+        log.info("inference_processes", processes=processes, pool=str(sender.pool_cls))
+    prepare_model_files_isolated()
+
+
+@worker_process_init.connect
+def setup_worker_process(**kwargs):
+    """
+    Runs in every worker process before it takes any job, so the first job
+    does not pay for the model load.
+    """
+    prepare_worker()
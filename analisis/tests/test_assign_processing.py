@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from analisis.entities.collection.track_collection import TrackCollection
+from analisis.entities.tracks.track_detail import TrackPlayerDetail
+from analisis.entities.utils.singleton import Singleton
+from analisis.infraestructure.player_ball_assigner import PlayerBallAssigner
+from analisis.tasks.analysis.assign_processing import assign_processing
+
+TEAMS = {1: 1, 2: 2}
+PLAYER_BBOXES = {1: [100, 100, 120, 200], 2: [300, 100, 320, 200]}
+# Frame -> ball bbox; the ball sits at the feet of player 1, then of player 2
+BALLS = {0: [105, 195, 115, 205], 2: [305, 195, 315, 205], 3: [305, 195, 315, 205]}
+# Frame 1 has no ball, frame 2 has no players
+PLAYER_FRAMES = (0, 1, 3)
+
+
+class StubTeamAssigner:
+    """Teams by track id; the real one clusters the sampled shirt colors."""
+    player_colors = {}
+    team_colors = {1: np.zeros(3), 2: np.ones(3)}
+
+    def assign_team_color(self):
+        pass
+
+    def get_player_team(self, player_id: int) -> int:
+        return TEAMS[player_id]
+
+
+class AssignProcessingTests(SimpleTestCase):
+    def setUp(self):
+        Singleton._instances.pop(TrackCollection, None)
+        self.addCleanup(Singleton._instances.pop, TrackCollection, None)
+        self.collection = TrackCollection()
+        for frame in PLAYER_FRAMES:
+            self.collection.update_tracks(
+                entity_type="players", frame_nums=frame, track_ids=list(PLAYER_BBOXES),
+                bbox=np.asarray(list(PLAYER_BBOXES.values()), dtype=np.float32))
+        for frame, bbox in BALLS.items():
+            self.collection.update_tracks(
+                entity_type="ball", frame_nums=frame, track_ids=[1], bbox=np.asarray([bbox], dtype=np.float32))
+        self.components = SimpleNamespace(
+            tracks_collection=self.collection,
+            team_assigner=StubTeamAssigner(),
+            player_assigner=PlayerBallAssigner())
+
+    def test_possession_per_frame(self):
+        team_ball_control = assign_processing(self.components, total_frames=4)
+
+        # Frame 1 (no ball) and frame 2 (no players) keep the last team
+        self.assertEqual(team_ball_control.tolist(), [1, 1, 1, 2])
+        frames = self.collection.get_column("players", "frame").tolist()
+        track_ids = self.collection.get_column("players", "track_id").tolist()
+        has_ball = self.collection.get_column("players", "has_ball").tolist()
+        self.assertEqual(
+            sorted((frame, track_id) for frame, track_id, ball in zip(frames, track_ids, has_ball) if ball),
+            [(0, 1), (3, 2)])
+        self.assertEqual(self.collection.get_column("players", "team").tolist(),
+                         [TEAMS[track_id] for track_id in track_ids])
+
+    def test_matches_the_per_frame_assignment(self):
+        assign_processing(self.components, total_frames=4)
+        has_ball = self.collection.get_column("players", "has_ball")
+        assigner = PlayerBallAssigner()
+
+        for frame in range(4):
+            rows = self.collection.rows_for_frame("players", frame)
+            players = {
+                int(track_id): TrackPlayerDetail(track_id=int(track_id), bbox=bbox.tolist())
+                for track_id, bbox in zip(self.collection.get_column("players", "track_id")[rows],
+                                          self.collection.get_column("players", "bbox")[rows])}
+            expected = assigner.assign_ball_to_player(players, BALLS[frame]) if frame in BALLS else -1
+            holders = [int(track_id) for track_id, ball in
+                       zip(self.collection.get_column("players", "track_id")[rows], has_ball[rows]) if ball]
+            self.assertEqual(holders, [] if expected == -1 else [expected], f"frame {frame}")
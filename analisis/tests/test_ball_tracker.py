@@ -0,0 +1,40 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from analisis.entities.collection.track_collection import TrackCollection
+from analisis.entities.trackers.ball_tracker import BallTracker
+from analisis.entities.utils.singleton import Singleton
+
+
+class BallInterpolationTests(SimpleTestCase):
+    def setUp(self):
+        Singleton._instances.pop(TrackCollection, None)
+        self.addCleanup(Singleton._instances.pop, TrackCollection, None)
+        self.collection = TrackCollection()
+        # BallTracker only needs the model to detect
+        self.tracker = BallTracker.__new__(BallTracker)
+
+    def add_ball(self, frame: int, bbox) -> None:
+        self.collection.update_tracks(
+            entity_type="ball", frame_nums=frame, track_ids=[1], bbox=np.asarray([bbox], dtype=np.float32))
+
+    def test_missing_boxes_are_interpolated_between_frames(self):
+        self.add_ball(0, [np.nan] * 4)
+        self.add_ball(2, [10, 10, 20, 20])
+        self.add_ball(4, [np.nan] * 4)
+        self.add_ball(6, [30, 10, 40, 20])
+        self.add_ball(8, [np.nan] * 4)
+
+        self.assertEqual(self.tracker.interpolate_ball_positions(self.collection), 3)
+
+        bboxes = self.collection.get_column("ball", "bbox")
+        by_frame = dict(zip(self.collection.get_column("ball", "frame").tolist(), bboxes.tolist()))
+        self.assertEqual(by_frame[4], [20, 10, 30, 20])
+        # The edges repeat the nearest detection
+        self.assertEqual(by_frame[0], [10, 10, 20, 20])
+        self.assertEqual(by_frame[8], [30, 10, 40, 20])
+
+    def test_nothing_to_interpolate(self):
+        self.add_ball(0, [10, 10, 20, 20])
+        self.assertEqual(self.tracker.interpolate_ball_positions(self.collection), 0)
+        self.assertEqual(self.tracker.interpolate_ball_positions(TrackCollection()), 0)
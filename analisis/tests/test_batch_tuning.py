@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from analisis.entities.utils.singleton import Singleton
+from analisis.infraestructure.batch_size_tuner import BatchSizeTuner, batch_size_tuner
+from analisis.infraestructure.batch_size_tuner.batch_size_tuner import MB
+from analisis.tasks.analysis.batch_tuning import calibrate_batch_size, count_inference_processes
+
+
+def new_tuner(**kwargs) -> BatchSizeTuner:
+    # The tuner is a per-process singleton
+    Singleton._instances.pop(BatchSizeTuner, None)
+    return BatchSizeTuner(**kwargs)
+
+
+class FakeTracker:
+    """The part of TrackerServiceBase the calibration uses."""
+
+    def __init__(self, model_path: Path, tuner: BatchSizeTuner):
+        self.model_path = str(model_path)
+        self.batch_tuner = tuner
+        self.detected_batches = []
+        self.warmups = 0
+
+    def inference_frames(self, frames):
+        return frames
+
+    def detect_frames(self, frames, batch_size):
+        self.detected_batches.append(batch_size)
+
+    def warmup(self, frame, batch_size=None):
+        self.warmups += 1
+
+
+class MemoryBudgetTests(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(Singleton._instances.pop, BatchSizeTuner, None)
+
+    def test_available_memory_is_split_between_the_processes(self):
+        tuner = new_tuner(processes=4, memory_fraction=0.5)
+        with mock.patch.object(batch_size_tuner.psutil, "virtual_memory",
+                               return_value=SimpleNamespace(available=8000 * MB)), \
+                mock.patch.object(tuner, "rss", return_value=500 * MB):
+            self.assertEqual(tuner.memory_budget_bytes(), 500 * MB + 1000 * MB)
+
+    def test_explicit_budget_is_not_split(self):
+        tuner = new_tuner(processes=4, memory_budget_mb=2000)
+        self.assertEqual(tuner.memory_budget_bytes(), 2000 * MB)
+
+    def test_inference_processes_of_the_pool(self):
+        self.assertEqual(count_inference_processes("prefork", 8), 8)
+        self.assertEqual(count_inference_processes("<class 'celery.concurrency.prefork.TaskPool'>", 3), 3)
+        with mock.patch.dict(os.environ, {"SEGMENT_WORKERS": "1"}):
+            self.assertEqual(count_inference_processes("threads", 8), 1)
+        with mock.patch.dict(os.environ, {"SEGMENT_WORKERS": "4"}):
+            self.assertEqual(count_inference_processes("solo", 1), 4)
+
+
+class SharedCalibrationTests(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(Singleton._instances.pop, BatchSizeTuner, None)
+        self.dir = Path(tempfile.mkdtemp(prefix="analisis-calibration-"))
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.model_path = self.dir / "model.torchscript"
+        self.model_path.write_bytes(b"model")
+        self.frame = np.zeros((48, 64, 3), dtype=np.uint8)
+
+    def test_second_process_reuses_the_calibration(self):
+        first = FakeTracker(self.model_path, new_tuner(candidates=(1, 2, 4), memory_budget_mb=1e6))
+        batch_size = calibrate_batch_size(first, self.frame)
+        self.assertTrue(first.detected_batches)
+        self.assertTrue((self.dir / "model.torchscript.batch_size.json").exists())
+
+        second = FakeTracker(self.model_path, new_tuner(candidates=(1, 2, 4), memory_budget_mb=1e6))
+        self.assertEqual(calibrate_batch_size(second, self.frame), batch_size)
+        self.assertEqual(second.detected_batches, [])
+        self.assertEqual(second.warmups, 1)
+        self.assertEqual(second.batch_tuner.calibrated_batch_size, batch_size)
+
+    def test_other_settings_calibrate_again(self):
+        calibrate_batch_size(
+            FakeTracker(self.model_path, new_tuner(candidates=(1, 2, 4), memory_budget_mb=1e6)), self.frame)
+
+        other = FakeTracker(self.model_path, new_tuner(candidates=(1, 2), memory_budget_mb=1e6))
+        calibrate_batch_size(other, self.frame)
+        self.assertTrue(other.detected_batches)
@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from analisis.infraestructure.checkpoint_store import CheckpointStore
+from analisis.tasks.analysis import checkpointing
+from analisis.tasks.analysis.checkpointing import DeliveryLimitExceeded, check_delivery_limit
+
+
+class DeliveryLimitTests(SimpleTestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp(prefix="analisis-checkpoints-")
+        self.addCleanup(shutil.rmtree, root, True)
+        self.store = CheckpointStore(root)
+        for patch in (
+                mock.patch.object(checkpointing, "_store", self.store),
+                mock.patch.dict(os.environ, {"MAX_JOB_DELIVERIES": "3"})):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_deliveries_are_counted_per_task(self):
+        self.assertEqual(self.store.count_delivery("job", "run_analysis"), 1)
+        self.assertEqual(self.store.count_delivery("job", "run_analysis"), 2)
+        self.assertEqual(self.store.count_delivery("job", "segment-0"), 1)
+        self.store.clear("job")
+        self.assertEqual(self.store.count_delivery("job", "run_analysis"), 1)
+
+    def test_job_fails_after_the_last_delivery(self):
+        for _ in range(3):
+            check_delivery_limit("job", "run_analysis")
+
+        with self.assertRaises(DeliveryLimitExceeded):
+            check_delivery_limit("job", "run_analysis")
+        # The checkpoints of the failed job are removed
+        self.assertFalse(self.store.job_dir("job").exists())
+
+    def test_no_limit(self):
+        with mock.patch.dict(os.environ, {"MAX_JOB_DELIVERIES": "0"}):
+            for _ in range(5):
+                check_delivery_limit("job", "run_analysis")
+        self.assertFalse(self.store.job_dir("job").exists())
+
+
+class CheckpointStoreTests(SimpleTestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp(prefix="analisis-checkpoints-")
+        self.addCleanup(shutil.rmtree, root, True)
+        self.store = CheckpointStore(root)
+
+    def test_concurrent_saves_of_a_stage_use_their_own_tmp_files(self):
+        tmp_paths = []
+        savez = np.savez
+
+        def record_tmp(file, **arrays):
+            tmp_paths.append(file.name)
+            savez(file, **arrays)
+
+        with mock.patch.object(np, "savez", record_tmp):
+            self.store.save("job", "preprocessing", {"values": np.arange(3)}, {})
+            path = self.store.save("job", "preprocessing", {"values": np.arange(4)}, {})
+
+        self.assertEqual(len(set(tmp_paths)), 2)
+        self.assertEqual([entry.name for entry in path.parent.iterdir()], ["preprocessing.npz"])
+        np.testing.assert_array_equal(self.store.load("job", "preprocessing").arrays["values"], np.arange(4))
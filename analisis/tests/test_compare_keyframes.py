@@ -0,0 +1,23 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+
+from analisis.management.commands import compare_keyframes
+
+
+class CompareKeyframesCommandTests(SimpleTestCase):
+    def test_invalid_stride_is_a_command_error(self):
+        with tempfile.NamedTemporaryFile(suffix=".mp4") as video, \
+                mock.patch.object(compare_keyframes, "prepare_worker") as prepare_worker:
+            for stride in ("0", "31"):
+                with self.subTest(stride=stride), self.assertRaisesRegex(CommandError, "--stride"):
+                    call_command("compare_keyframes", video.name, "--stride", stride)
+        prepare_worker.assert_not_called()
+
+    def test_missing_video(self):
+        with self.assertRaisesRegex(CommandError, "No existe"):
+            call_command("compare_keyframes", str(Path(tempfile.gettempdir()) / "missing.mp4"))
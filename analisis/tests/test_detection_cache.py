@@ -0,0 +1,49 @@
+import shutil
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from analisis.infraestructure.detection_cache import DetectionCache
+from analisis.tasks.analysis.detection_caching import CacheKeys, CachedPreprocessing, store_preprocessing
+from analisis.tasks.analysis.preprocessing import PreprocessingResult
+
+
+class DetectionCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp(prefix="analisis-cache-"))
+        self.addCleanup(shutil.rmtree, self.dir, True)
+
+    def test_put_leaves_only_the_entry(self):
+        cache = DetectionCache(str(self.dir), max_bytes=1024 * 1024)
+
+        cache.put("movement-a", {"movement": np.arange(10.0)})
+
+        self.assertEqual([path.name for path in self.dir.iterdir()], ["movement-a.npz"])
+        np.testing.assert_array_equal(cache.get("movement-a")["movement"], np.arange(10.0))
+
+    def test_eviction_skips_writes_in_progress(self):
+        cache = DetectionCache(str(self.dir), max_bytes=0)
+        # Another process is writing this entry
+        in_progress = self.dir / "movement-a.npz.123-abcdef01.tmp"
+        in_progress.write_bytes(b"\0" * 1024)
+
+        cache.put("movement-b", {"movement": np.arange(10.0)})
+
+        self.assertTrue(in_progress.exists())
+        self.assertFalse(cache.entry_path("movement-b").exists())
+
+    def test_failed_store_does_not_fail_the_job(self):
+        cache = mock.Mock(spec=DetectionCache)
+        cache.put.side_effect = OSError("no space left")
+        result = PreprocessingResult(
+            frame_count=3, camera_movement=np.zeros((3, 2)), detections=None, detected_frames=3)
+
+        store_preprocessing(
+            SimpleNamespace(detection_cache=cache), CacheKeys("detections-a", "movement-a"), result,
+            CachedPreprocessing(detections=None, camera_movement=None))
+
+        cache.put.assert_called_once()
@@ -0,0 +1,65 @@
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from analisis.infraestructure.metrics_spool import MetricsSpool
+
+JOB = {"wall_s": 2.0, "process_cpu_s": 1.5, "peak_rss_mb": 300.0,
+       "spans": {"tracking": {"calls": 1, "wall_s": 1.0, "cpu_s": 0.8, "frames": 100, "peak_rss_mb": 250.0}}}
+
+
+def finished_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+class MetricsSpoolTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp(prefix="analisis-metrics-"))
+        self.addCleanup(shutil.rmtree, self.dir, True)
+
+    def finished_process_spool(self) -> MetricsSpool:
+        spool = MetricsSpool(self.dir)
+        spool.path = self.dir / f"{spool.host}-{finished_pid()}-0badc0de.json"
+        return spool
+
+    def test_finished_processes_are_merged_into_the_host_total(self):
+        for status in ("success", "failure"):
+            self.finished_process_spool().record_job(JOB, status)
+        spool = MetricsSpool(self.dir)
+
+        spool.record_job(JOB, "success")
+
+        self.assertEqual(sorted(path.name for path in self.dir.glob("*.json")),
+                         sorted([spool.path.name, spool.host_path.name]))
+        totals = spool.collect()
+        self.assertEqual(totals["jobs"], {"success": 2, "failure": 1})
+        self.assertAlmostEqual(totals["wall_s"], 6.0)
+        self.assertEqual(totals["spans"]["tracking"]["frames"], 300)
+        self.assertEqual(totals["peak_rss_mb"], 300.0)
+
+    def test_running_processes_are_kept(self):
+        other = MetricsSpool(self.dir)
+        other.path = self.dir / f"{other.host}-1-0badc0de.json"
+        other.record_job(JOB, "success")
+
+        MetricsSpool(self.dir).record_job(JOB, "success")
+
+        self.assertTrue(other.path.exists())
+        self.assertEqual(MetricsSpool(self.dir).collect()["jobs"], {"success": 2})
+
+    def test_file_left_behind_by_a_compaction_is_counted_once(self):
+        finished = self.finished_process_spool()
+        finished.record_job(JOB, "success")
+        content = finished.path.read_text()
+        spool = MetricsSpool(self.dir)
+        spool.compact()
+        # What a collect that listed the directory before the compaction reads
+        finished.path.write_text(content)
+
+        self.assertEqual(spool.collect()["jobs"], {"success": 1})
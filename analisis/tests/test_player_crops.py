@@ -0,0 +1,44 @@
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from analisis.infraestructure.player_crops import CropExporter, PlayerCrop
+
+
+def make_crops(*player_ids: int) -> dict:
+    image = np.random.default_rng(0).integers(0, 256, (40, 20, 3), dtype=np.uint8)
+    return {player_id: PlayerCrop(frame=player_id * 10, image=image, score=1.0) for player_id in player_ids}
+
+
+class CropExporterTests(SimpleTestCase):
+    def setUp(self):
+        self.folder = Path(tempfile.mkdtemp(prefix="analisis-crops-"))
+        self.addCleanup(shutil.rmtree, self.folder, True)
+
+    def exporter(self, **kwargs) -> CropExporter:
+        exporter = CropExporter(str(self.folder), workers=2, **kwargs)
+        self.addCleanup(exporter.close)
+        return exporter
+
+    def test_each_job_writes_its_own_folder(self):
+        exporter = self.exporter()
+
+        first = exporter.write_async(make_crops(1, 2), name="job-1").result(timeout=30)
+        second = exporter.write(make_crops(3), name="job-2")
+
+        self.assertEqual(Path(first.path), self.folder / "job-1")
+        self.assertEqual(sorted(path.name for path in Path(first.path).iterdir()),
+                         ["player_1_frame_10.jpg", "player_2_frame_20.jpg"])
+        self.assertEqual([path.name for path in Path(second.path).iterdir()], ["player_3_frame_30.jpg"])
+        self.assertEqual((first.count, second.count), (2, 1))
+
+    def test_archive(self):
+        export = self.exporter(format="png", archive=True).write(make_crops(1, 2), name="job-1")
+
+        self.assertEqual(Path(export.path), self.folder / "job-1.zip")
+        with zipfile.ZipFile(export.path) as bundle:
+            self.assertEqual(sorted(bundle.namelist()), ["player_1_frame_10.png", "player_2_frame_20.png"])
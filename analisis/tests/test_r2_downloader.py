@@ -0,0 +1,157 @@
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase
+from moto import mock_aws
+
+from analisis.entities.utils.singleton import Singleton
+from analisis.services.r2_downloader import R2Downloader
+
+ENDPOINT = "https://test.r2.cloudflarestorage.com"
+BUCKET = "videos"
+KEY = "matches/match.mp4"
+CHUNK_SIZE = 256 * 1024
+
+
+class R2DownloaderTests(SimpleTestCase):
+    def setUp(self):
+        patches = [
+            mock.patch.dict(os.environ, {
+                "MOTO_S3_CUSTOM_ENDPOINTS": ENDPOINT,
+                "AWS_DEFAULT_REGION": "us-east-1",
+            }),
+            mock_aws(),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        Singleton._instances.pop(R2Downloader, None)
+        self.addCleanup(Singleton._instances.pop, R2Downloader, None)
+        self.downloader = R2Downloader({
+            "ENDPOINT": ENDPOINT,
+            "ACCESS_KEY_ID": "test",
+            "SECRET_ACCESS_KEY": "test",
+            "BUCKET": BUCKET,
+            "MAX_WORKERS": 4,
+        })
+        self.downloader.s3.create_bucket(Bucket=BUCKET)
+
+        self.dir = Path(tempfile.mkdtemp(prefix="analisis-r2-"))
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.destination = self.dir / "match.mp4"
+        self.progress_path = self.dir / "match.mp4.download.json"
+
+    def upload(self, seed: int = 0, size: int = 5 * CHUNK_SIZE + 1000) -> bytes:
+        body = bytes((i * 31 + seed) % 251 for i in range(size))
+        self.downloader.s3.put_object(Bucket=BUCKET, Key=KEY, Body=body)
+        return body
+
+    def start_download(self):
+        return self.downloader.start_download(KEY, str(self.destination), chunk_size=CHUNK_SIZE)
+
+    def test_full_download(self):
+        body = self.upload()
+
+        handle = self.start_download()
+
+        self.assertEqual(handle.wait(timeout=30), self.destination)
+        self.assertEqual(self.destination.read_bytes(), body)
+        self.assertEqual(handle.chunk_count, 6)
+        self.assertEqual(json.loads(self.progress_path.read_text())["done"], list(range(6)))
+        with handle.open() as reader:
+            reader.seek(CHUNK_SIZE - 10)
+            self.assertEqual(reader.read(20), body[CHUNK_SIZE - 10:CHUNK_SIZE + 10])
+
+    def test_resume_requests_only_the_missing_chunks(self):
+        body = self.upload()
+        self.start_download().wait(timeout=30)
+        # An interrupted download: chunks 2 and 4 never arrived
+        progress = json.loads(self.progress_path.read_text())
+        progress["done"] = [0, 1, 3, 5]
+        self.progress_path.write_text(json.dumps(progress))
+        with open(self.destination, "r+b") as f:
+            for index in (2, 4):
+                f.seek(index * CHUNK_SIZE)
+                f.write(b"\0" * CHUNK_SIZE)
+
+        with mock.patch.object(
+                R2Downloader, "_download_chunk", autospec=True,
+                side_effect=R2Downloader._download_chunk) as download_chunk:
+            self.start_download().wait(timeout=30)
+
+        self.assertEqual(sorted(call.args[3] for call in download_chunk.call_args_list), [2, 4])
+        self.assertEqual(self.destination.read_bytes(), body)
+
+    def test_changed_object_is_downloaded_again(self):
+        self.upload(seed=0)
+        self.start_download().wait(timeout=30)
+        # Same size, different content: only the ETag tells them apart
+        body = self.upload(seed=1)
+
+        with mock.patch.object(
+                R2Downloader, "_download_chunk", autospec=True,
+                side_effect=R2Downloader._download_chunk) as download_chunk:
+            self.start_download().wait(timeout=30)
+
+        self.assertEqual(download_chunk.call_count, 6)
+        self.assertEqual(self.destination.read_bytes(), body)
+        self.assertEqual(
+            json.loads(self.progress_path.read_text())["etag"],
+            self.downloader.s3.head_object(Bucket=BUCKET, Key=KEY)["ETag"])
+
+    def test_failed_chunk_fails_the_download(self):
+        self.upload()
+        download_chunk = R2Downloader._download_chunk
+
+        def fail_third_chunk(downloader, key, handle, index):
+            if index == 2:
+                raise IOError("connection reset")
+            download_chunk(downloader, key, handle, index)
+
+        with mock.patch.object(R2Downloader, "_download_chunk", fail_third_chunk):
+            handle = self.start_download()
+            with self.assertRaisesRegex(IOError, "connection reset"):
+                handle.wait(timeout=30)
+
+        self.assertIsInstance(handle.error, IOError)
+        # Readers see the end of the file instead of the missing bytes
+        with handle.open() as reader:
+            reader.seek(2 * CHUNK_SIZE)
+            self.assertEqual(reader.read(10), b"")
+        self.assertNotIn(2, handle.done_chunks())
+
+    def test_unsaved_progress_does_not_stop_the_download(self):
+        body = self.upload()
+
+        with mock.patch.object(R2Downloader, "_save_progress", side_effect=OSError("no space left")):
+            handle = self.start_download()
+            self.assertEqual(handle.wait(timeout=30), self.destination)
+
+        self.assertEqual(self.destination.read_bytes(), body)
+        self.assertFalse(self.progress_path.exists())
+
+    def test_destination_depends_on_the_whole_key_and_the_etag(self):
+        paths = {
+            self.downloader.build_destination_path("a/match.mp4", '"1"', str(self.dir)),
+            self.downloader.build_destination_path("b/match.mp4", '"1"', str(self.dir)),
+            self.downloader.build_destination_path("a/match.mp4", '"2"', str(self.dir)),
+        }
+        self.assertEqual(len(paths), 3)
+        self.assertTrue(all(path.suffix == ".mp4" and path.name.startswith("match-") for path in paths))
+
+    def test_second_download_of_a_file_in_progress_keeps_its_bytes(self):
+        body = self.upload()
+        self.start_download().wait(timeout=30)
+        # Another job started but had not saved its progress yet
+        self.progress_path.unlink()
+
+        with mock.patch.object(R2Downloader, "_download_chunk", autospec=True,
+                               side_effect=lambda *args: None):
+            self.start_download().wait(timeout=30)
+
+        self.assertEqual(self.destination.read_bytes(), body)
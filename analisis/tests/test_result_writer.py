@@ -0,0 +1,24 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from analisis.infraestructure.result_writer import ResultWriter
+
+
+class ResultWriterTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp(prefix="analisis-results-"))
+        self.addCleanup(shutil.rmtree, self.dir, True)
+
+    def test_compression_must_match_the_format(self):
+        with self.assertRaisesRegex(ValueError, "snappy"):
+            ResultWriter(self.dir, format="arrow", compression="snappy")
+        with self.assertRaisesRegex(ValueError, "zip"):
+            ResultWriter(self.dir, format="parquet", compression="zip")
+        # The JSON file is never compressed
+        ResultWriter(self.dir, format="json", compression="snappy")
+
+    def test_codec_names_ignore_case(self):
+        self.assertEqual(ResultWriter(self.dir, format="Arrow", compression="LZ4").compression, "lz4")
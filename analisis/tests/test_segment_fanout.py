@@ -0,0 +1,155 @@
+import os
+import shutil
+import tempfile
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from unittest import mock
+
+import boto3
+from django.test import SimpleTestCase
+from moto import mock_aws
+
+from analisis.entities.interfaces import tracker_service_base
+from analisis.entities.utils.singleton import Singleton
+from analisis.infraestructure.segment_stitching import plan_segments
+from analisis.services.r2_downloader import R2Downloader
+from analisis.tasks import worker_setup
+from analisis.tasks.analysis import checkpointing, result_export
+from analisis.tasks.analysis.result_export import export_tracks
+from analisis.tasks import analysis_runner
+from analisis.tasks.analysis_runner import run_analysis
+from analisis.tasks.benchmark import MatchSpec, StubDetector, SyntheticMatch
+from analisis_service.celery import app
+
+ENDPOINT = "https://test.r2.cloudflarestorage.com"
+BUCKET = "videos"
+
+
+@contextmanager
+def eager_celery():
+    """Runs the tasks in this process, with in-memory broker and result backend."""
+    # The app reads the Django settings with the CELERY_ namespace
+    settings = {
+        "CELERY_BROKER_URL": "memory://",
+        "CELERY_RESULT_BACKEND": "cache+memory://",
+        "CELERY_TASK_ALWAYS_EAGER": True,
+    }
+    previous = {key: app.conf.get(key) for key in settings}
+    app.conf.update(settings)
+    # The backend is built once per thread from the configuration
+    app._local.__dict__.pop("backend", None)
+    try:
+        yield
+    finally:
+        app.conf.update(previous)
+        app._local.__dict__.pop("backend", None)
+
+
+class SegmentFanOutTests(SimpleTestCase):
+    """
+    Runs the whole job in eager mode with the in-memory broker, the stub
+    detector and a synthetic match served by a local S3 stand-in.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.work_dir = Path(tempfile.mkdtemp(prefix="analisis-fanout-"))
+        # Crowded matches make ByteTrack split tracks differently depending on
+        # where it starts; with few players both runs track the same people
+        cls.video = SyntheticMatch(MatchSpec(frames=300, players=8)).write_video(cls.work_dir / "match.mp4")
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.work_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        run_dir = Path(tempfile.mkdtemp(dir=self.work_dir))
+        # Downloads (./tmp) and default outputs (../res) stay in the run dir
+        (run_dir / "work").mkdir()
+        cwd = os.getcwd()
+        os.chdir(run_dir / "work")
+        self.addCleanup(os.chdir, cwd)
+
+        patches = [
+            mock.patch.dict(os.environ, {
+                "R2_BUCKET": BUCKET,
+                "R2_ACCESS_KEY_ID": "test",
+                "R2_SECRET_ACCESS_KEY": "test",
+                "S3_CLIENT_ACCOUNT_ENDPOINT": ENDPOINT,
+                "MOTO_S3_CUSTOM_ENDPOINTS": ENDPOINT,
+                "AWS_DEFAULT_REGION": "us-east-1",
+                "INFERENCE_BATCH_CALIBRATION": "False",
+                "DETECTION_CACHE_ENABLED": "False",
+                "RESULT_OUTPUT_DIR": str(run_dir / "results"),
+                "CHECKPOINT_DIR": str(run_dir / "checkpoints"),
+                "PLAYER_CROPS_DIR": str(run_dir / "crops"),
+                "SEGMENT_MIN_FRAMES": "100",
+                "SEGMENT_OVERLAP": "30",
+            }),
+            mock.patch.object(tracker_service_base, "YOLO", StubDetector),
+            # The stub needs no model file
+            mock.patch.object(worker_setup, "prepare_model", lambda **kwargs: None),
+            mock.patch.object(checkpointing, "_store", None),
+            mock.patch.object(result_export, "_crop_exporter", None),
+            eager_celery(),
+            mock_aws(),
+        ]
+        stack = ExitStack()
+        self.addCleanup(stack.close)
+        for patch in patches:
+            stack.enter_context(patch)
+        # The downloader keeps its client for the life of the process
+        Singleton._instances.pop(R2Downloader, None)
+        self.addCleanup(Singleton._instances.pop, R2Downloader, None)
+
+        s3 = boto3.client("s3", endpoint_url=ENDPOINT, region_name="us-east-1")
+        s3.create_bucket(Bucket=BUCKET)
+        s3.upload_file(str(self.video), BUCKET, "matches/match.mp4")
+
+    def analyze(self, fanout_segments: int) -> dict:
+        with mock.patch.dict(os.environ, {"FANOUT_SEGMENTS": str(fanout_segments)}):
+            return run_analysis.apply((f"{ENDPOINT}/{BUCKET}/matches/match.mp4",)).get()
+
+    def test_fan_out_matches_the_serial_job(self):
+        serial = self.analyze(1)
+        plans = []
+        with mock.patch.object(analysis_runner, "plan_segments",
+                               lambda *args: plans.append(plan_segments(*args)) or plans[-1]):
+            fanned_out = self.analyze(2)
+        self.assertEqual([len(plan) for plan in plans], [2])
+
+        self.assertEqual(fanned_out["summary"]["frames"], serial["summary"]["frames"])
+        self.assertEqual(fanned_out["summary"]["players"], serial["summary"]["players"])
+        self.assertEqual(fanned_out["result_file"]["rows"], serial["result_file"]["rows"])
+        self.assertEqual(fanned_out["summary"]["ball_frames"], serial["summary"]["ball_frames"])
+        # Team numbers come from an unseeded KMeans: compare the shares only
+        for fanned_out_share, serial_share in zip(
+                sorted(fanned_out["summary"]["possession"].values()),
+                sorted(serial["summary"]["possession"].values())):
+            self.assertAlmostEqual(fanned_out_share, serial_share, places=2)
+        self.assertIsNone(fanned_out["metrics"]["resumed_from"])
+
+    def test_resumed_job_exports_the_player_crops(self):
+        calls = []
+
+        def export_once(*args):
+            # The first delivery dies at the export, after the last checkpoint
+            calls.append(args)
+            if len(calls) == 1:
+                raise OSError("worker lost")
+            return export_tracks(*args)
+
+        with mock.patch.object(analysis_runner, "export_tracks", export_once), \
+                mock.patch.dict(os.environ, {"FANOUT_SEGMENTS": "1"}):
+            args = (f"{ENDPOINT}/{BUCKET}/matches/match.mp4",)
+            with self.assertRaises(OSError):
+                run_analysis.apply(args, task_id="job-1").get()
+            resumed = run_analysis.apply(args, task_id="job-1").get()
+
+        self.assertEqual(resumed["metrics"]["resumed_from"], "assignment")
+        player_images = resumed["player_images"]
+        self.assertEqual(Path(player_images["path"]).name, "job-1")
+        self.assertEqual(player_images["count"], len(list(Path(player_images["path"]).iterdir())))
+        self.assertGreaterEqual(player_images["count"], 8)
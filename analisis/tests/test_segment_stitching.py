@@ -0,0 +1,138 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from analisis.infraestructure.player_crops import PlayerCrop
+from analisis.infraestructure.segment_stitching import (Segment, SegmentTracks, TrackStitcher,
+                                                        match_track_ids, plan_segments,
+                                                        segment_tracks_from_arrays,
+                                                        segment_tracks_to_arrays)
+
+
+def make_tracks(rows):
+    """Track columns from (frame, track_id, x) rows; every box is 20x40 at (x, 100)."""
+    rows = list(rows)
+    return {
+        "frame": np.asarray([frame for frame, _, _ in rows], dtype=np.int64),
+        "track_id": np.asarray([track_id for _, track_id, _ in rows], dtype=np.int64),
+        "bbox": np.asarray([[x, 100, x + 20, 140] for _, _, x in rows], dtype=np.float32).reshape(-1, 4),
+    }
+
+
+def make_segment(segment, players, ball=(), camera_movement=None):
+    frames = (segment.stop or 100) - segment.start
+    if camera_movement is None:
+        camera_movement = np.column_stack([np.arange(segment.start, segment.start + frames), np.zeros(frames)])
+    return SegmentTracks(
+        segment=segment,
+        tracks={"players": make_tracks(players), "ball": make_tracks(ball)},
+        camera_movement=np.asarray(camera_movement, dtype=np.float32),
+        player_colors={},
+        player_crops={},
+        detected_frames=frames,
+        timing={})
+
+
+class PlanSegmentsTests(SimpleTestCase):
+    def test_segments_cover_the_video_once(self):
+        segments = plan_segments(1000, 4, 30)
+
+        self.assertEqual([segment.index for segment in segments], [0, 1, 2, 3])
+        self.assertEqual(segments[0].start, 0)
+        self.assertEqual(segments[0].core_start, 0)
+        self.assertIsNone(segments[-1].stop)
+        for previous, current in zip(segments, segments[1:]):
+            self.assertEqual(previous.stop, current.core_start)
+            self.assertEqual(current.core_start - current.start, 30)
+
+    def test_short_video_gets_fewer_segments(self):
+        # Each segment needs at least twice the overlap
+        self.assertEqual(len(plan_segments(100, 8, 30)), 1)
+        self.assertEqual(len(plan_segments(130, 8, 30)), 2)
+        self.assertEqual(plan_segments(10, 4, 30), [Segment(0, 0, 0, None)])
+
+
+class MatchTrackIdsTests(SimpleTestCase):
+    def test_matches_ids_on_the_overlap(self):
+        previous = make_tracks([(frame, 7, 0) for frame in range(40, 50)]
+                               + [(frame, 8, 300) for frame in range(40, 50)])
+        current = make_tracks([(frame, 1, 301) for frame in range(40, 60)]
+                              + [(frame, 2, 1) for frame in range(40, 60)])
+
+        self.assertEqual(match_track_ids(previous, current), {1: 8, 2: 7})
+
+    def test_boxes_below_the_threshold_are_not_matched(self):
+        previous = make_tracks([(frame, 7, 0) for frame in range(40, 50)])
+        current = make_tracks([(frame, 1, 15) for frame in range(40, 50)])
+
+        self.assertEqual(match_track_ids(previous, current, iou_threshold=0.5), {})
+
+    def test_each_previous_id_is_matched_once(self):
+        # Both current tracks overlap the same previous track; the one with
+        # more votes wins it
+        previous = make_tracks([(frame, 7, 0) for frame in range(40, 50)])
+        current = make_tracks([(frame, 1, 0) for frame in range(40, 47)]
+                              + [(frame, 2, 0) for frame in range(47, 50)])
+
+        self.assertEqual(match_track_ids(previous, current), {1: 7})
+
+
+class TrackStitcherTests(SimpleTestCase):
+    def setUp(self):
+        first = Segment(0, 0, 0, 50)
+        second = Segment(1, 40, 50, None)
+        self.segments = [
+            make_segment(first,
+                         players=[(frame, 3, 0) for frame in range(50)]
+                         + [(frame, 4, 300) for frame in range(50)],
+                         ball=[(frame, 1, 150) for frame in range(50)]),
+            make_segment(second,
+                         # 11 continues 3, 12 continues 4, 13 is new, 14 only
+                         # lives in the overlap and belongs to the first segment
+                         players=[(frame, 11, 1) for frame in range(40, 100)]
+                         + [(frame, 12, 301) for frame in range(40, 100)]
+                         + [(frame, 13, 600) for frame in range(60, 100)]
+                         + [(frame, 14, 900) for frame in range(40, 45)],
+                         ball=[(frame, 1, 150) for frame in range(40, 100)],
+                         camera_movement=np.column_stack([np.arange(40, 100), np.zeros(60)])),
+        ]
+
+    def test_joined_ids_continue_across_segments(self):
+        stitched = TrackStitcher().stitch(self.segments)
+
+        players = stitched.tracks["players"]
+        self.assertEqual(stitched.id_maps[0], {3: 1, 4: 2})
+        self.assertEqual(stitched.id_maps[1], {11: 1, 12: 2, 13: 3})
+        self.assertEqual(sorted(np.unique(players["track_id"]).tolist()), [1, 2, 3])
+        for track_id in (1, 2):
+            frames = players["frame"][players["track_id"] == track_id]
+            self.assertEqual(frames.tolist(), list(range(100)))
+
+    def test_only_owned_frames_are_kept(self):
+        stitched = TrackStitcher().stitch(self.segments)
+
+        for entity_type in ("players", "ball"):
+            frames = stitched.tracks[entity_type]["frame"]
+            # No frame of the overlap is counted twice
+            self.assertEqual(len(np.unique(np.column_stack(
+                [frames, stitched.tracks[entity_type]["track_id"]]), axis=0)), len(frames))
+        self.assertEqual(stitched.tracks["ball"]["track_id"].tolist(), [1] * 100)
+
+    def test_camera_movement_is_chained(self):
+        stitched = TrackStitcher().stitch(self.segments)
+
+        self.assertEqual(stitched.camera_movement.shape, (100, 2))
+        np.testing.assert_array_equal(stitched.camera_movement[:, 0], np.arange(100))
+
+    def test_arrays_roundtrip(self):
+        result = self.segments[1]._replace(
+            player_colors={12: np.array([1.0, 2.0, 3.0]), 11: np.array([4.0, 5.0, 6.0])},
+            player_crops={11: PlayerCrop(55, np.full((40, 20, 3), 7, dtype=np.uint8), 3.5)})
+
+        restored = segment_tracks_from_arrays(*segment_tracks_to_arrays(result))
+
+        self.assertEqual(restored.segment, result.segment)
+        self.assertEqual(list(restored.player_colors), [12, 11])
+        self.assertEqual(restored.player_crops[11].frame, 55)
+        np.testing.assert_array_equal(restored.player_crops[11].image, result.player_crops[11].image)
+        for name, values in result.tracks["players"].items():
+            np.testing.assert_array_equal(restored.tracks["players"][name], values)
@@ -0,0 +1,74 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from analisis.entities.collection.track_collection import TrackCollection
+from analisis.entities.utils.singleton import Singleton
+from analisis.infraestructure.speed_and_distance_estimator.speed_and_distance_estimator import \
+    SpeedAndDistanceEstimator
+
+FRAME_RATE = 10.0
+
+
+class SpeedAndDistanceTests(SimpleTestCase):
+    def setUp(self):
+        self.estimator = SpeedAndDistanceEstimator()
+
+    def test_constant_velocity(self):
+        # 1 m per frame at 10 FPS: 10 m/s
+        frames = np.arange(8)
+        positions = np.stack([frames.astype(np.float32), np.zeros(8, np.float32)], axis=1)
+
+        speed, distance = self.estimator.measure_speed_and_distance(
+            frames, np.ones(8, dtype=np.int64), positions, FRAME_RATE)
+
+        self.assertTrue(np.isnan(speed[0]))
+        np.testing.assert_allclose(speed[1:], 36.0, rtol=1e-5)
+        np.testing.assert_allclose(distance, np.arange(8.0))
+
+    def test_frame_gap_and_invalid_positions(self):
+        # Track 2 is lost in frames 3 and 4 and has no position in frame 5; the
+        # detections arrive interleaved with track 7, which stands still
+        frames = np.array([0, 0, 1, 1, 2, 2, 5, 6, 7])
+        track_ids = np.array([2, 7, 2, 7, 2, 7, 2, 2, 2])
+        positions = np.array(
+            [[0, 0], [5, 5], [1, 0], [5, 5], [2, 0], [5, 5], [np.nan, np.nan], [6, 0], [7, 0]],
+            dtype=np.float32)
+
+        speed, distance = self.estimator.measure_speed_and_distance(frames, track_ids, positions, FRAME_RATE)
+
+        track_2 = np.flatnonzero(track_ids == 2)
+        np.testing.assert_allclose(distance[track_2], [0, 1, 2, np.nan, 6, 7])
+        # Over the gap, 4 m in 0.4 s: still 36 km/h
+        np.testing.assert_allclose(speed[track_2], [np.nan, 36, 36, np.nan, 36, 36], rtol=1e-5)
+        track_7 = np.flatnonzero(track_ids == 7)
+        np.testing.assert_allclose(distance[track_7], [0, 0, 0])
+        np.testing.assert_allclose(speed[track_7], [np.nan, 0, 0])
+
+    def test_speed_is_averaged_over_the_window(self):
+        # 1 m per frame, then 2 m per frame from frame 5 on
+        frames = np.arange(12)
+        x = np.where(frames <= 5, frames, 5 + 2 * (frames - 5)).astype(np.float32)
+        positions = np.stack([x, np.zeros(12, np.float32)], axis=1)
+
+        speed, _ = self.estimator.measure_speed_and_distance(
+            frames, np.ones(12, dtype=np.int64), positions, FRAME_RATE)
+
+        # Frame 7 averages frames 2-7: 3 m at 1 m/frame and 2 steps at 2 m/frame
+        self.assertAlmostEqual(float(speed[7]), (3 + 4) / 0.5 * 3.6, places=3)
+        np.testing.assert_allclose(speed[10:], 72.0, rtol=1e-5)
+
+    def test_speeds_are_written_to_every_entity(self):
+        Singleton._instances.pop(TrackCollection, None)
+        self.addCleanup(Singleton._instances.pop, TrackCollection, None)
+        collection = TrackCollection()
+        for frame in range(3):
+            for entity_type in ("players", "ball"):
+                collection.update_tracks(
+                    entity_type=entity_type, frame_nums=frame, track_ids=[1],
+                    position_transformed=np.asarray([[frame, 0]], dtype=np.float32))
+
+        self.estimator.add_speed_and_distance_to_tracks(collection, frame_rate=FRAME_RATE)
+
+        for entity_type in ("players", "ball"):
+            np.testing.assert_allclose(collection.get_column(entity_type, "speed"), [np.nan, 36, 36], rtol=1e-5)
+            np.testing.assert_allclose(collection.get_column(entity_type, "distance"), [0, 1, 2])
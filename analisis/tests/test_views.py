@@ -0,0 +1,47 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+
+def job(state: str, result=None) -> mock.Mock:
+    return mock.Mock(
+        status=state,
+        result=result,
+        info=result,
+        failed=mock.Mock(return_value=state == "FAILURE"),
+        successful=mock.Mock(return_value=state == "SUCCESS"))
+
+
+class AnalysisResultViewTests(SimpleTestCase):
+    def get_result(self, analysis_job: mock.Mock):
+        with mock.patch("analisis.views.get_job", return_value=analysis_job):
+            return self.client.get(reverse("analysis-result", args=["job-1"]))
+
+    def test_failed_analysis_is_a_conflict(self):
+        response = self.get_result(job("FAILURE", ValueError("video sin frames")))
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json(), {
+            "job_id": "job-1",
+            "status": "FAILURE",
+            "error": "ValueError: video sin frames",
+        })
+
+    def test_running_analysis_is_accepted(self):
+        response = self.get_result(job("PROGRESS", {"stage": "tracking"}))
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["status"], "PROGRESS")
+
+    def test_finished_analysis(self):
+        response = self.get_result(job("SUCCESS", {"summary": {"frames": 10}}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["result"], {"summary": {"frames": 10}})
+
+    def test_result_file_of_a_failed_analysis_is_a_conflict(self):
+        with mock.patch("analisis.views.get_job", return_value=job("FAILURE", ValueError("x"))):
+            response = self.client.get(reverse("analysis-result-file", args=["job-1"]))
+
+        self.assertEqual(response.status_code, 409)
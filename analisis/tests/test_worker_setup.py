@@ -0,0 +1,55 @@
+import os
+from concurrent.futures import Future
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from analisis.tasks import worker_setup
+
+
+class FakePool:
+    """Runs nothing; records what would run in the spawned process."""
+    instances = []
+
+    def __init__(self, max_workers, mp_context, initializer):
+        self.start_method = mp_context.get_start_method()
+        self.submitted = []
+        FakePool.instances.append(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, fn):
+        self.submitted.append(fn)
+        future = Future()
+        future.set_result(None)
+        return future
+
+
+class PrepareModelFilesTests(SimpleTestCase):
+    def setUp(self):
+        FakePool.instances = []
+        for patch in (
+                mock.patch.object(worker_setup, "ProcessPoolExecutor", FakePool),
+                mock.patch.object(worker_setup, "prepare_model_files")):
+            self.addCleanup(patch.stop)
+            patch.start()
+
+    def test_export_runs_in_a_spawned_process(self):
+        with mock.patch.dict(os.environ, {"INFERENCE_BACKEND": "onnx"}):
+            worker_setup.prepare_model_files_isolated()
+
+        [pool] = FakePool.instances
+        self.assertEqual(pool.start_method, "spawn")
+        self.assertEqual(pool.submitted, [worker_setup.prepare_model_files])
+        worker_setup.prepare_model_files.assert_not_called()
+
+    def test_torchscript_only_downloads_here(self):
+        with mock.patch.dict(os.environ, {"INFERENCE_BACKEND": "torchscript"}):
+            worker_setup.prepare_model_files_isolated()
+
+        self.assertEqual(FakePool.instances, [])
+        worker_setup.prepare_model_files.assert_called_once_with()
@@ -1,6 +1,10 @@
 from django.urls import path
-from analisis.views import AnalyzeVideoView
+from analisis.views import AnalysisResultFileView, AnalysisResultView, AnalysisStatusView, AnalyzeVideoView, MetricsView
 
 urlpatterns = [
     path('analyze/', AnalyzeVideoView.as_view(), name='analyze-video'),
+    path('analyze/<str:job_id>/', AnalysisStatusView.as_view(), name='analysis-status'),
+    path('analyze/<str:job_id>/result/', AnalysisResultView.as_view(), name='analysis-result'),
+    path('analyze/<str:job_id>/result/file/', AnalysisResultFileView.as_view(), name='analysis-result-file'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
@@ -1,18 +1,143 @@
+from pathlib import Path
+
+from celery.result import AsyncResult
+from django.http import FileResponse, HttpResponse
+from django.urls import reverse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
+from analisis.infraestructure.metrics_spool import render_prometheus
 from analisis.serializers import VideoAnalyzerSerializer
+from analisis.tasks.analysis.job_metrics import get_metrics_spool
 from analisis.tasks.analysis_runner import run_analysis
 
+
+def get_job(job_id: str) -> AsyncResult:
+    return AsyncResult(job_id, app=run_analysis.app)
+
+
+def job_error(job: AsyncResult) -> str:
+    return f"{type(job.result).__name__}: {job.result}"
+
+
+RESULT_CONTENT_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+    "json": "application/json",
+}
+
+
 class AnalyzeVideoView(APIView):
     def post(self, request):
         serializer = VideoAnalyzerSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        if not serializer.is_valid():
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-        
-        video_url = request.data.get("video_url")
-        res = run_analysis(video_url)
 
-        return Response({"message": "Video recibido y validado correctamente."})
+        video_url = serializer.validated_data["video_url"]
+        options = dict(serializer.validated_data.get("options") or {})
+        job = run_analysis.delay(video_url, options)
+
+        return Response(
+            {
+                "message": "Video recibido y validado correctamente.",
+                "job_id": job.id,
+                "status": job.status,
+                "status_url": reverse("analysis-status", args=[job.id]),
+                "result_url": reverse("analysis-result", args=[job.id]),
+            },
+            status=status.HTTP_202_ACCEPTED)
+
+
+class AnalysisStatusView(APIView):
+    """
+    Estado de un análisis encolado.
+
+    Celery informa PENDING tanto para trabajos en cola como para IDs
+    desconocidos o cuyo resultado ya expiró.
+    """
+
+    def get(self, request, job_id: str):
+        job = get_job(job_id)
+        body = {"job_id": job_id, "status": job.status}
+
+        if job.status == "PROGRESS" and isinstance(job.info, dict):
+            body["stage"] = job.info.get("stage")
+        elif job.failed():
+            body["error"] = job_error(job)
+        elif job.successful():
+            body["result_url"] = reverse("analysis-result", args=[job_id])
+            body["file_url"] = reverse("analysis-result-file", args=[job_id])
+
+        return Response(body)
+
+
+class AnalysisResultView(APIView):
+    """
+    Resultado de un análisis. Un análisis fallido no es un error de la API:
+    responde 409 con el estado FAILURE y el error, igual que la descarga
+    del archivo.
+    """
+
+    def get(self, request, job_id: str):
+        job = get_job(job_id)
+
+        if job.failed():
+            return Response(
+                {"job_id": job_id, "status": job.status, "error": job_error(job)},
+                status=status.HTTP_409_CONFLICT)
+
+        if not job.successful():
+            return Response(
+                {
+                    "job_id": job_id,
+                    "status": job.status,
+                    "message": "El análisis aún no ha terminado.",
+                },
+                status=status.HTTP_202_ACCEPTED)
+
+        return Response({
+            "job_id": job_id,
+            "status": job.status,
+            "result": job.result,
+            "file_url": reverse("analysis-result-file", args=[job_id]),
+        })
+
+
+class AnalysisResultFileView(APIView):
+    """
+    Descarga el archivo con las detecciones de un análisis terminado. El
+    worker lo escribe en RESULT_OUTPUT_DIR, que debe ser visible para la API.
+    """
+
+    def get(self, request, job_id: str):
+        job = get_job(job_id)
+        if not job.successful():
+            return Response(
+                {"job_id": job_id, "status": job.status, "message": "El análisis aún no tiene resultado."},
+                status=status.HTTP_409_CONFLICT if job.failed() else status.HTTP_202_ACCEPTED)
+
+        result_file = (job.result or {}).get("result_file") or {}
+        path = Path(result_file.get("path", ""))
+        if not result_file or not path.is_file():
+            return Response(
+                {"job_id": job_id, "message": "El archivo de resultado no existe o ya fue eliminado."},
+                status=status.HTTP_404_NOT_FOUND)
+
+        return FileResponse(
+            open(path, "rb"),
+            as_attachment=True,
+            filename=path.name,
+            content_type=RESULT_CONTENT_TYPES.get(result_file.get("format"), "application/octet-stream"))
+
+
+class MetricsView(APIView):
+    """
+    Métricas de los workers en formato de texto de Prometheus: trabajos
+    terminados y tiempo, CPU, frames y RSS por etapa. Los workers las dejan
+    en METRICS_SPOOL_DIR, que debe ser visible para la API.
+    """
+
+    def get(self, request):
+        return HttpResponse(
+            render_prometheus(get_metrics_spool().collect()),
+            content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,4 @@
+# La app de Celery se carga junto con Django para que `shared_task` la use
+from .celery import app as celery_app
+
+__all__ = ('celery_app',)
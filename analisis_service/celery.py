@@ -0,0 +1,14 @@
+"""
+Aplicación Celery del proyecto.
+
+La configuración se lee de `django.conf:settings` con el prefijo `CELERY_`.
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'analisis_service.settings')
+
+app = Celery('analisis_service')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
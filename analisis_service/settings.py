@@ -103,6 +103,67 @@ R2_CONFIG = {
 }
 
 
+# Celery
+# Los análisis se encolan en el broker y su estado/resultado se guarda en el
+# backend de resultados, que consultan los endpoints /api/analyze/<id>/
+
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://localhost:6379/1')
+CELERY_RESULT_EXPIRES = config('CELERY_RESULT_EXPIRES', default=60 * 60 * 24, cast=int)
+CELERY_TASK_TRACK_STARTED = True
+CELERY_TASK_SERIALIZER = 'json'
+CELERY_RESULT_SERIALIZER = 'json'
+CELERY_ACCEPT_CONTENT = ['json']
+# Cada worker reserva una sola tarea a la vez: los segmentos de un análisis
+# repartido (FANOUT_SEGMENTS) quedan en la cola para cualquier nodo libre
+CELERY_WORKER_PREFETCH_MULTIPLIER = config('CELERY_WORKER_PREFETCH_MULTIPLIER', default=1, cast=int)
+# Cada proceso del pool carga y calienta el modelo antes de avisar que está
+# listo; con los 4 segundos por defecto Celery lo mataría y relanzaría en bucle
+CELERY_WORKER_PROC_ALIVE_TIMEOUT = config('CELERY_WORKER_PROC_ALIVE_TIMEOUT', default=300, cast=float)
+
+
+# Logging
+# Cada subsistema del análisis escribe en su logger "analisis.<subsistema>"
+# (ver analisis.infraestructure.structured_logging). LOG_LEVELS ajusta el
+# nivel de cada uno, ej: "tracking=DEBUG,camera=WARNING", y con
+# LOG_DEBUG_SAMPLE_EVERY=N solo se escribe uno de cada N eventos de debug.
+
+LOG_LEVEL = config('LOG_LEVEL', default='INFO').upper()
+LOG_LEVELS = {
+    f"analisis.{subsystem.strip()}": {'level': level.strip().upper()}
+    for subsystem, _, level in (
+        item.partition('=') for item in config('LOG_LEVELS', default='').split(',') if '=' in item)
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'structured': {
+            '()': 'analisis.infraestructure.structured_logging.StructuredFormatter',
+            'json': config('LOG_FORMAT', default='text') == 'json',
+        },
+    },
+    'filters': {
+        'debug_sampler': {
+            '()': 'analisis.infraestructure.structured_logging.DebugSampler',
+            'every': config('LOG_DEBUG_SAMPLE_EVERY', default=1, cast=int),
+        },
+    },
+    'handlers': {
+        'analisis': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'structured',
+            'filters': ['debug_sampler'],
+        },
+    },
+    'loggers': {
+        'analisis': {'handlers': ['analisis'], 'level': LOG_LEVEL, 'propagate': False},
+        **LOG_LEVELS,
+    },
+}
+
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators